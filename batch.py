@@ -0,0 +1,109 @@
+import os
+import sys
+import glob
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from read_cv import procesar_cvs
+from sources import FUENTES, resolver_fuentes, cargar_paso
+from utils import HISTORY_BASENAME, ruta_historial, get_history_manager, filtrar_por_ubicacion_estricta
+from ranking import rankear_ofertas
+import metrics
+import source_health
+import source_cursors
+import sinks
+
+# --- MODO BATCH (VARIOS CANDIDATOS) ---
+# 1. Analiza todos los CVs de un directorio en paralelo (respetando el RPM de Gemini).
+# 2. Descarga cada fuente UNA sola vez y reparte las ofertas crudas a los filtros
+#    de cada candidato. LinkedIn depende de la query, así que se descarga por
+#    consulta única (candidatos con la misma query comparten el scrapeo).
+# 3. Cada candidato tiene su propio historial: una oferta vista para uno sigue
+#    siendo nueva para otro.
+
+def nombre_candidato(ruta_cv):
+    return os.path.splitext(os.path.basename(ruta_cv))[0]
+
+def ruta_historial_candidato(candidato):
+    return ruta_historial(f"{HISTORY_BASENAME}_{candidato}")
+
+def cargar_candidatos(directorio_cvs):
+    """Analiza los PDFs del directorio y devuelve {candidato: filtros} (solo los exitosos)."""
+    rutas = sorted(glob.glob(os.path.join(directorio_cvs, "*.pdf")))
+    if not rutas:
+        print(f"❌ No hay CVs (.pdf) en: {directorio_cvs}")
+        return {}
+
+    print(f"👥 Analizando {len(rutas)} CVs en paralelo...")
+    with metrics.fuente("cv"):
+        filtros_por_ruta = procesar_cvs(rutas)
+
+    candidatos = {}
+    for ruta, filtros in filtros_por_ruta.items():
+        if filtros:
+            candidatos[nombre_candidato(ruta)] = filtros
+        else:
+            print(f"⚠️ Falló el análisis de {os.path.basename(ruta)}, se omite.")
+    return candidatos
+
+def buscar_para_candidatos(candidatos, fuentes=None, sink=None):
+    """
+    Corre cada fuente habilitada una vez para todos los candidatos.
+    Devuelve {candidato: [ofertas nuevas]} ordenadas por relevancia para cada perfil.
+    `sink(candidato, ofertas)` recibe cada lote nuevo.
+    """
+    resultados = {candidato: [] for candidato in candidatos}
+    source_cursors.usar_perfil(candidatos) # Un candidato nuevo arranca con descarga completa
+
+    for nombre in resolver_fuentes(fuentes):
+        fuente = FUENTES[nombre]
+        descargar = cargar_paso(nombre, "descargar")
+        filtrar = cargar_paso(nombre, "filtrar")
+        enriquecer = cargar_paso(nombre, "enriquecer")
+        if not descargar or not filtrar:
+            print(f"⚠️ {fuente['etiqueta']} no soporta modo batch, se omite.")
+            continue
+
+        print(f"\n[Batch] {fuente['etiqueta']}: una descarga para {len(candidatos)} candidatos...")
+        with metrics.fuente(nombre), source_health.corrida(nombre) as habilitada, \
+                source_cursors.corrida(nombre), metrics.timer("total"):
+            if not habilitada: # Breaker abierto: la fuente se salta sin pagar timeouts
+                continue
+            compartido = {}      # Cache del paso enriquecer (detalles / veredictos IA)
+            cache_consultas = {} # Solo para fuentes cuya descarga depende de los filtros
+            crudas = None if fuente["descarga_por_filtros"] else (descargar() or [])
+
+            for candidato, filtros in candidatos.items():
+                if fuente["descarga_por_filtros"]:
+                    crudas_candidato = descargar(filtros, cache_consultas) or []
+                else:
+                    crudas_candidato = crudas
+
+                ofertas = filtrar(crudas_candidato, filtros)
+                if fuente["filtro_geo"]:
+                    ofertas = filtrar_por_ubicacion_estricta(ofertas)
+
+                history = get_history_manager(ruta_historial_candidato(candidato))
+                nuevas = history.filter_new_offers(ofertas)
+                if nuevas and enriquecer:
+                    nuevas = enriquecer(nuevas, compartido)
+                print(f"   👤 {candidato}: {len(nuevas)} ofertas nuevas.")
+
+                if nuevas:
+                    history.save_offers(nuevas)
+                    resultados[candidato].extend(nuevas)
+                    sinks.emitir(nuevas, fuente=nombre, candidato=candidato)
+                    if sink:
+                        sink(candidato, nuevas)
+
+    for candidato, filtros in candidatos.items():
+        resultados[candidato] = rankear_ofertas(resultados[candidato], filtros)
+    return resultados
+
+def ejecutar_batch(directorio_cvs, fuentes=None, sink=None):
+    """Punto de entrada del modo batch: CVs de `directorio_cvs` contra las fuentes habilitadas."""
+    print("👥 INICIANDO AGENTE EN MODO BATCH (MULTI-CANDIDATO)")
+    print("=============================================")
+    candidatos = cargar_candidatos(directorio_cvs)
+    if not candidatos:
+        return {}
+    return buscar_para_candidatos(candidatos, fuentes, sink)
@@ -0,0 +1,44 @@
+import json
+import time
+
+import fixtures
+
+# --- GEMINI FALSO (SIN RED NI CUOTA) ---
+# Imita la interfaz usada por el repo: model.generate_content(prompt, ...) devuelve
+# un objeto con .text, .parts, .candidates y .prompt_feedback.
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+        self.candidates = []
+        self.prompt_feedback = None
+
+class FakeGenerativeModel:
+    """
+    Respuestas deterministas según el tipo de prompt:
+    - Perfilado de CV ("Headhunter")  -> filtros de fixtures.FILTROS_CV
+    - Viabilidad de oferta ("es_valida") -> válida salvo que mencione ciudadanía
+    - Cualquier otro (ej: extracción de stack) -> lista de tecnologías
+    `latencia` (segundos) simula el tiempo de respuesta de la API.
+    """
+
+    def __init__(self, model_name="fake-gemini", latencia=0.0):
+        self.model_name = model_name
+        self.latencia = latencia
+        self.llamadas = 0
+        self.caracteres_prompt = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.llamadas += 1
+        self.caracteres_prompt += len(prompt)
+        if self.latencia:
+            time.sleep(self.latencia)
+
+        if "Headhunter" in prompt:
+            return FakeResponse("```json\n" + json.dumps(fixtures.FILTROS_CV) + "\n```")
+        if "es_valida" in prompt:
+            ciudadania = "citizen" in prompt.lower()
+            return FakeResponse(json.dumps({"es_valida": not ciudadania,
+                                            "razon": "Requiere ciudadanía" if ciudadania else "OK"}))
+        return FakeResponse("Python, Django, AWS, PostgreSQL")
@@ -0,0 +1,89 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import fixtures
+
+# --- SERVIDOR HTTP LOCAL (STAND-IN DE LOS SITIOS REALES) ---
+# Sirve los fixtures bajo prefijos por sitio:
+#   /hn/v0/...            API de Hacker News (firebase)
+#   /wwr/<categoria>.rss  Feeds RSS de WWR
+#   /remoteok/api         API de RemoteOK
+#   /yc/jobs, /yc/item, /yc/detail/<id>   Listado y detalles de YC Jobs
+#   /wellfound/role       Página de Wellfound
+WWR_CATEGORIAS = ["remote-back-end-programming-jobs", "remote-full-stack-programming-jobs",
+                  "remote-devops-sysadmin-jobs"]
+
+class FixtureServer:
+    """Servidor en un hilo daemon. Usar como context manager: `with FixtureServer() as srv: srv.url`."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.hilo = None
+        self.rutas = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.httpd.server_address[1]}"
+
+    def _preparar_rutas(self):
+        base = self.url
+        rutas = {}
+        for ruta, payload in fixtures.hn_payloads().items():
+            rutas["/hn/v0" + ruta] = ("application/json", json.dumps(payload).encode())
+        for categoria in WWR_CATEGORIAS:
+            rutas[f"/wwr/{categoria}.rss"] = ("application/rss+xml", fixtures.wwr_feed(categoria).encode())
+        rutas["/remoteok/api"] = ("application/json", json.dumps(fixtures.remoteok_json()).encode())
+        rutas["/wellfound/role"] = ("text/html", fixtures.wellfound_html().encode())
+        # Listado paginado de YC: la página se identifica por el parámetro p
+        for pagina in range(3):
+            rutas[f"/yc/jobs#{pagina}"] = ("text/html", fixtures.yc_jobs_html(pagina, base + "/yc/").encode())
+        self.rutas = rutas
+
+    def _responder(self, handler):
+        partes = urlsplit(handler.path)
+        query = parse_qs(partes.query)
+        ruta = partes.path
+
+        if ruta == "/yc/jobs":
+            ruta = f"/yc/jobs#{query.get('p', ['0'])[0]}"
+        elif ruta == "/yc/item" or ruta.startswith("/yc/detail/"):
+            item_id = query.get("id", [ruta.rsplit("/", 1)[-1]])[0]
+            return 200, "text/html", fixtures.yc_detail_html(item_id).encode()
+
+        if ruta not in self.rutas:
+            return 404, "text/plain", b"not found"
+        tipo, cuerpo = self.rutas[ruta]
+        return 200, tipo, cuerpo
+
+    def __enter__(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, como los sitios reales
+
+            def do_GET(self):
+                estado, tipo, cuerpo = servidor._responder(self)
+                self.send_response(estado)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass # Silencioso
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self._preparar_rutas()
+        self.hilo = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
@@ -0,0 +1,200 @@
+import json
+import random
+import html
+from datetime import datetime, timedelta
+
+# --- FIXTURES OFFLINE PARA EL BENCHMARK ---
+# Payloads con la misma forma que las respuestas reales de cada sitio
+# (API de HN, RSS de WWR, JSON de RemoteOK, HTML de YC Jobs y Wellfound,
+# registros de jobspy). Se generan de forma determinista (semilla fija) para
+# que los resultados sean comparables entre commits sin versionar MBs de datos.
+SEMILLA = 1234
+FECHA_BASE = datetime(2026, 1, 15, 12, 0, 0)
+
+ROLES = ["Senior Backend Engineer", "Full Stack Developer", "DevOps Engineer", "Product Manager",
+         "Data Engineer", "Site Reliability Engineer", "Frontend Developer", "Project Manager"]
+STACK = ["Python", "Django", "React", "AWS", "Kubernetes", "Go", "PostgreSQL", "TypeScript",
+         "Terraform", "Jira", "SQL", "Node.js", "Rust", "GCP"]
+UBICACIONES = ["Remote (Worldwide)", "Remote - LATAM", "US only", "Remote (Europe only)",
+               "San Francisco, CA", "Anywhere", "Remote, United States", "Global"]
+EMPRESAS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Labs", "Wayne Tech", "Soylent"]
+
+FILTROS_CV = {
+    "keywords": "(Backend OR \"Full Stack\") AND (Python OR Django)",
+    "role_keywords": ["Backend Engineer", "Full Stack Developer", "DevOps Engineer"],
+    "keyword_list": ["Python", "Django", "AWS", "Kubernetes", "PostgreSQL"],
+    "target_locations": ["LATAM", "Remote", "United States"],
+    "is_remote": True,
+    "job_type": "fulltime",
+    "experience_level": "Senior",
+    "hours_old": 72,
+    "results_count": 50,
+}
+
+def _parrafo(rng, rol, empresa, ubicacion):
+    skills = ", ".join(rng.sample(STACK, 4))
+    return (f"{empresa} | {rol} | {ubicacion} | Full-time\n"
+            f"We are hiring a {rol} to work on our platform. Stack: {skills}. "
+            f"{'Remote friendly. ' if rng.random() < 0.7 else 'Onsite in our HQ. '}"
+            f"{'US citizen required. ' if rng.random() < 0.1 else ''}"
+            "You will design services, mentor engineers and own production systems. "
+            "Benefits: equity, health insurance, learning budget. Apply via our careers page.")
+
+def hn_payloads(n_comentarios=500, thread_id=40000000):
+    """Devuelve {ruta: objeto JSON} con el usuario whoishiring, el hilo y sus comentarios."""
+    rng = random.Random(SEMILLA)
+    kids = list(range(thread_id + 1, thread_id + 1 + n_comentarios))
+    rutas = {
+        "/user/whoishiring/submitted.json": [thread_id - 2, thread_id - 1, thread_id],
+        f"/item/{thread_id - 2}.json": {"id": thread_id - 2, "title": "Ask HN: Freelancer? Seeking freelancer?"},
+        f"/item/{thread_id - 1}.json": {"id": thread_id - 1, "title": "Ask HN: Who wants to be hired?"},
+        f"/item/{thread_id}.json": {"id": thread_id, "title": "Ask HN: Who is hiring? (January 2026)", "kids": kids},
+    }
+    for kid in kids:
+        texto = _parrafo(rng, rng.choice(ROLES), rng.choice(EMPRESAS), rng.choice(UBICACIONES))
+        item = {"id": kid, "by": f"user{kid % 997}", "time": 1768478400 + kid % 86400,
+                "text": "<p>" + html.escape(texto).replace("\n", "<p>") + "</p>"}
+        if rng.random() < 0.03:
+            item = {"id": kid, "deleted": True}
+        rutas[f"/item/{kid}.json"] = item
+    return rutas
+
+def wwr_feed(categoria, n_entradas=100):
+    """RSS 2.0 con la estructura de los feeds por categoría de WWR."""
+    rng = random.Random(f"{SEMILLA}-{categoria}")
+    items = []
+    for i in range(n_entradas):
+        empresa, rol = rng.choice(EMPRESAS), rng.choice(ROLES)
+        fecha = (FECHA_BASE - timedelta(hours=i)).strftime("%a, %d %b %Y %H:%M:%S +0000")
+        descripcion = html.escape("<p>" + _parrafo(rng, rol, empresa, rng.choice(UBICACIONES)) + "</p>")
+        items.append(f"""<item>
+<title>{empresa}: {rol}</title>
+<author>{empresa}</author>
+<region>Anywhere in the World</region>
+<description>{descripcion}</description>
+<pubDate>{fecha}</pubDate>
+<guid>https://weworkremotely.com/remote-jobs/{categoria}-{i}</guid>
+<link>https://weworkremotely.com/remote-jobs/{categoria}-{i}</link>
+</item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel>
+<title>We Work Remotely: {categoria}</title>
+<link>https://weworkremotely.com</link>
+{''.join(items)}
+</channel></rss>"""
+
+def remoteok_json(n_ofertas=300):
+    """Respuesta de la API de RemoteOK: primer elemento legal + ofertas."""
+    rng = random.Random(f"{SEMILLA}-rok")
+    data = [{"legal": "API Terms of Service: please link back to RemoteOK."}]
+    for i in range(n_ofertas):
+        rol = rng.choice(ROLES)
+        data.append({
+            "id": str(100000 + i),
+            "date": (FECHA_BASE - timedelta(minutes=17 * i)).isoformat() + "+00:00",
+            "company": rng.choice(EMPRESAS),
+            "position": rol,
+            "title": rol,
+            "tags": rng.sample([s.lower() for s in STACK], 3),
+            "location": rng.choice(["Worldwide", "LATAM", "United States", "US only", "Europe only", ""]),
+            "description": "<p>" + _parrafo(rng, rol, "Company", "Remote") + "</p>",
+            "url": f"https://remoteOK.com/remote-jobs/{100000 + i}",
+        })
+    return data
+
+def yc_jobs_html(pagina, base_url, filas_por_pagina=30, paginas=3):
+    """Página del listado news.ycombinator.com/jobs (filas athing + subtext + More)."""
+    rng = random.Random(f"{SEMILLA}-yc-{pagina}")
+    filas = []
+    primer_id = 45000000 - pagina * filas_por_pagina
+    for i in range(filas_por_pagina):
+        item_id = primer_id - i
+        empresa, rol = rng.choice(EMPRESAS), rng.choice(ROLES)
+        if rng.random() < 0.5: # Muchos títulos reales mencionan la tecnología
+            rol = f"{rng.choice(STACK)} {rol}"
+        lote = rng.choice(["W21", "S22", "W24", "S25"])
+        url = f"{base_url}detail/{item_id}" if i % 4 else f"item?id={item_id}"
+        filas.append(f"""<tr class="athing submission" id="{item_id}">
+<td align="right" valign="top" class="title"><span class="rank"></span></td><td></td>
+<td class="title"><span class="titleline"><a href="{url}" rel="nofollow">{empresa} (YC {lote}) Is Hiring a {rol} (Remote)</a></span></td></tr>
+<tr><td colspan="2"></td><td class="subtext"><span class="age" title="{(FECHA_BASE - timedelta(hours=i)).isoformat()} 1768478400"><a href="item?id={item_id}">{i + 1} hours ago</a></span></td></tr>
+<tr class="spacer" style="height:5px"></tr>""")
+    more = ""
+    if pagina < paginas - 1:
+        more = f'<tr><td colspan="2"></td><td class="title"><a href="jobs?next={primer_id - filas_por_pagina}&amp;p={pagina + 1}" class="morelink" rel="next">More</a></td></tr>'
+    return f"""<html><head><title>Jobs | Hacker News</title></head><body><center><table id="hnmain">
+<tr><td><a href="news">Hacker News</a> <a href="newest">new</a> | <a href="jobs">jobs</a></td></tr>
+<tr><td><table class="itemlist">{''.join(filas)}{more}</table></td></tr>
+</table></center></body></html>"""
+
+def yc_detail_html(item_id):
+    rng = random.Random(f"{SEMILLA}-ycd-{item_id}")
+    cuerpo = html.escape(_parrafo(rng, rng.choice(ROLES), rng.choice(EMPRESAS), rng.choice(UBICACIONES)))
+    return f"""<html><head><style>body {{ font-family: sans-serif }}</style><script>var x = 1;</script></head>
+<body><nav>Home | Companies | Jobs</nav><div class="toptext">{cuerpo}</div><footer>Y Combinator</footer></body></html>"""
+
+def wellfound_html(n_ofertas=200):
+    rng = random.Random(f"{SEMILLA}-wf")
+    links = []
+    for i in range(n_ofertas):
+        rol = rng.choice(ROLES)
+        if rng.random() < 0.5:
+            rol = f"{rng.choice(STACK)} {rol}"
+        slug = rol.lower().replace(" ", "-")
+        links.append(f'<div class="job"><a class="title" href="/jobs/{3000000 + i}-{slug}">{rol}</a>'
+                     f'<span class="company">{rng.choice(EMPRESAS)}</span></div>')
+    next_data = json.dumps({"props": {"pageProps": {"jobs": n_ofertas}}})
+    return (f'<html><body><script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+            f'{"".join(links)}</body></html>')
+
+def linkedin_registros(n_ofertas=200):
+    """Registros con las columnas que devuelve jobspy.scrape_jobs (muchas en None/NaN)."""
+    rng = random.Random(f"{SEMILLA}-li")
+    registros = []
+    for i in range(n_ofertas):
+        rol, empresa = rng.choice(ROLES), rng.choice(EMPRESAS)
+        registros.append({
+            "id": f"li-{4000000000 + i}",
+            "site": "linkedin",
+            "job_url": f"https://www.linkedin.com/jobs/view/{4000000000 + i}",
+            "job_url_direct": None,
+            "title": rol,
+            "company": empresa,
+            "location": rng.choice(UBICACIONES),
+            "date_posted": (FECHA_BASE - timedelta(days=i % 3)).date(),
+            "job_type": "fulltime",
+            "salary_source": None,
+            "interval": None,
+            "min_amount": float("nan"),
+            "max_amount": float("nan"),
+            "currency": None,
+            "is_remote": rng.random() < 0.8,
+            "job_level": rng.choice(["mid-senior level", "entry level", None]),
+            "job_function": None,
+            "listing_type": None,
+            "emails": None,
+            "description": _parrafo(rng, rol, empresa, rng.choice(UBICACIONES)) * 3,
+            "company_industry": None,
+            "company_url": f"https://www.linkedin.com/company/{empresa.lower()}",
+            "company_logo": None,
+            "company_url_direct": None,
+            "company_addresses": None,
+            "company_num_employees": None,
+            "company_revenue": None,
+            "company_description": None,
+        })
+    return registros
+
+def ofertas_historial(n_ofertas):
+    """Ofertas ya normalizadas (como en offers_history.json) para medir load/save."""
+    rng = random.Random(f"{SEMILLA}-hist-{n_ofertas}")
+    fuentes = ["HackerNews", "WeWorkRemotely", "RemoteOK", "YC Jobs", "Wellfound", "linkedin"]
+    return [{
+        "title": rng.choice(ROLES),
+        "company": rng.choice(EMPRESAS),
+        "location": rng.choice(UBICACIONES),
+        "description": _parrafo(rng, rng.choice(ROLES), rng.choice(EMPRESAS), rng.choice(UBICACIONES)),
+        "job_url": f"https://example.com/jobs/{i}",
+        "source": fuentes[i % len(fuentes)],
+        "date": (FECHA_BASE - timedelta(minutes=i)).isoformat(),
+    } for i in range(n_ofertas)]
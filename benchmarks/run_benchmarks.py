@@ -0,0 +1,332 @@
+"""
+Benchmark offline del agente: sin red real ni API de Gemini.
+
+Levanta un servidor HTTP local con los fixtures de cada sitio, reemplaza el
+modelo de Gemini por FakeGenerativeModel y mide:
+  - engine:<fuente>       throughput de descarga local + parseo + filtros de cada motor
+  - history:load|save:<N> JobHistoryManager con 1k, 10k y 100k ofertas
+  - cv:analizar           armado del prompt y parseo de la respuesta del CV
+  - rank:<N>              indexado BM25 + ranking de N ofertas contra el perfil del CV
+  - json:encoder|normalizado:<N>
+                          serializar N registros de jobspy con CustomJSONEncoder vs
+                          normalizar el DataFrame por columna + encoder en C
+  - filter:serial|paralelo:<N>
+                          keywords del perfil + filtro geo sobre N ofertas, en un proceso
+                          vs repartido en el pool de parallel_filter (escala con los núcleos)
+  - pipeline:main         main.main() completo (CV cacheado por fixture)
+
+Uso:
+    python benchmarks/run_benchmarks.py [--only engine,history] [--repeat 5]
+                                        [--output bench.json] [--compare bench_base.json]
+
+El JSON de salida incluye el commit, así se pueden comparar corridas entre commits.
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+sys.path.insert(0, AQUI)
+sys.path.insert(0, RAIZ)
+
+import fixtures
+from fake_llm import FakeGenerativeModel
+from fake_server import FixtureServer, WWR_CATEGORIAS
+
+import utils
+from sources import cargar_fuente, _modulos_cargados
+
+TAMANOS_HISTORIAL = [1_000, 10_000, 100_000]
+OFERTAS_NUEVAS_POR_SAVE = 100
+TAMANOS_RANKING = [1_000, 10_000]
+TAMANOS_JSON = [1_000, 10_000]
+TAMANOS_FILTRO = [10_000, 50_000]
+
+@contextlib.contextmanager
+def silencio():
+    """Oculta los prints de los motores mientras se mide."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+@contextlib.contextmanager
+def historial_temporal(ofertas_previas=None):
+    """Historial aislado en un directorio temporal, compartido por todos los motores."""
+    directorio = tempfile.mkdtemp(prefix="bench_hist_")
+    ruta = utils.ruta_historial(directorio=directorio)
+    if ofertas_previas:
+        utils.escribir_historial(ruta, ofertas_previas)
+    utils._history_managers.clear()
+    try:
+        with silencio():
+            utils._history_managers[None] = utils.JobHistoryManager(ruta)
+        yield ruta
+    finally:
+        utils._history_managers.clear()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+def medir(funcion, repeticiones, preparar=None):
+    """Ejecuta `funcion` (tras un warmup) y devuelve la lista de duraciones en segundos."""
+    duraciones = []
+    for i in range(repeticiones + 1):
+        contexto = preparar() if preparar else contextlib.nullcontext()
+        with contexto as estado:
+            inicio = time.perf_counter()
+            with silencio():
+                funcion(estado)
+            duracion = time.perf_counter() - inicio
+        if i > 0: # La primera corrida es warmup (imports, caches, conexiones)
+            duraciones.append(duracion)
+    return duraciones
+
+def configurar_llm(modelo_falso):
+    """Gemini falso en el cliente compartido y sin límite por minuto (se mide el código, no la cuota)."""
+    import llm_client
+    cliente = llm_client.get_client()
+    cliente.usar_backend(modelo_falso)
+    cliente.presupuesto.rpm = cliente.presupuesto.tpm = float("inf")
+    import stack_enrichment # El enriquecimiento en segundo plano no es parte de lo medido
+    stack_enrichment.HABILITADO = False
+
+def configurar_motores(url_servidor):
+    """Apunta cada motor al servidor local y reemplaza jobspy. Devuelve las fuentes disponibles."""
+    from http_scheduler import get_programador, host_de # Sin límites por host: se mide el código
+    import source_health # Estado de breakers fuera del directorio real de datos
+    import source_cursors # Cada repetición descarga el listado completo
+    estado = tempfile.mkdtemp(prefix="bench_health_")
+    source_health.HEALTH_FILE = os.path.join(estado, "source_health.json")
+    source_cursors.CURSORS_FILE = os.path.join(estado, "source_cursors.json")
+    source_cursors.ignorar()
+    for host in (host_de(url_servidor), "www.linkedin.com"):
+        get_programador().configurar_host(host, rps=float("inf"), rafaga=1, en_vuelo=64)
+    disponibles = {}
+    ajustes = {
+        "hn": lambda m: setattr(m, "HN_API_BASE", url_servidor + "/hn/v0"),
+        "wwr": lambda m: setattr(m, "WWR_FEEDS", [f"{url_servidor}/wwr/{c}.rss" for c in WWR_CATEGORIAS]),
+        "remoteok": lambda m: setattr(m, "REMOTEOK_API_URL", url_servidor + "/remoteok/api"),
+        "yc": lambda m: (setattr(m, "YC_BASE_URL", url_servidor + "/yc/"),
+                         setattr(m, "YC_JOBS_URL", url_servidor + "/yc/jobs")),
+        "wellfound": lambda m: setattr(m, "WELLFOUND_URL", url_servidor + "/wellfound/role"),
+        "linkedin": configurar_linkedin,
+    }
+    for nombre, ajustar in ajustes.items():
+        try:
+            funcion = cargar_fuente(nombre)
+        except ImportError as e:
+            print(f"   ⏭️ {nombre}: dependencia no instalada ({e.name}), se omite.")
+            continue
+        ajustar(sys.modules[funcion.__module__])
+        disponibles[nombre] = funcion
+    return disponibles
+
+def configurar_linkedin(modulo):
+    import pandas as pd
+    modulo.scrape_jobs = lambda **kw: pd.DataFrame(fixtures.linkedin_registros(kw.get("results_wanted") or 50))
+    import semantic # Caché de vectores fuera del directorio real de datos
+    semantic.VECTORS_CACHE_FILE = os.path.join(tempfile.mkdtemp(prefix="bench_vec_"), "semantic_vectors.npz")
+
+ITEMS_POR_FUENTE = {
+    "hn": 500, "wwr": 300, "remoteok": 300, "yc": 90, "wellfound": 200,
+    "linkedin": 50 * len(fixtures.FILTROS_CV["target_locations"]),
+}
+
+def bench_motores(motores, repeticiones):
+    resultados = {}
+    for nombre, buscar in motores.items():
+        duraciones = medir(lambda _: buscar(dict(fixtures.FILTROS_CV)), repeticiones, historial_temporal)
+        resultados[f"engine:{nombre}"] = resumen(duraciones, ITEMS_POR_FUENTE[nombre])
+    return resultados
+
+def bench_historial(repeticiones, tamanos=TAMANOS_HISTORIAL):
+    resultados = {}
+    nuevas = [dict(o, job_url=o["job_url"] + "-nueva") for o in fixtures.ofertas_historial(OFERTAS_NUEVAS_POR_SAVE)]
+    for n in tamanos:
+        previas = fixtures.ofertas_historial(n)
+
+        def preparar():
+            return historial_temporal(previas)
+
+        carga = medir(lambda ruta: utils.JobHistoryManager(ruta), repeticiones, preparar)
+        resultados[f"history:load:{n}"] = resumen(carga, n)
+
+        guardado = medir(lambda ruta: utils._history_managers[None].save_offers(list(nuevas)), repeticiones, preparar)
+        resultados[f"history:save:{n}"] = resumen(guardado, n + len(nuevas))
+    return resultados
+
+def bench_cv(repeticiones):
+    try:
+        import read_cv
+    except ImportError as e:
+        print(f"   ⏭️ cv: dependencia no instalada ({e.name}), se omite.")
+        return {}
+    texto = "\n".join(fixtures.ofertas_historial(40)[i]["description"] for i in range(40))
+    duraciones = medir(lambda _: read_cv.analizar_cv_para_busqueda(texto), repeticiones)
+    return {"cv:analizar": resumen(duraciones, 1)}
+
+def bench_ranking(repeticiones, tamanos=TAMANOS_RANKING):
+    import ranking
+    resultados = {}
+    for n in tamanos:
+        ofertas = fixtures.ofertas_historial(n)
+        duraciones = medir(lambda _: ranking.rankear_ofertas(ofertas, fixtures.FILTROS_CV), repeticiones)
+        resultados[f"rank:{n}"] = resumen(duraciones, n)
+    return resultados
+
+def bench_json(repeticiones, tamanos=TAMANOS_JSON):
+    try:
+        import pandas as pd
+    except ImportError as e:
+        print(f"   ⏭️ json: dependencia no instalada ({e.name}), se omite.")
+        return {}
+    resultados = {}
+    for n in tamanos:
+        df = pd.DataFrame(fixtures.linkedin_registros(n))
+
+        def con_encoder(_):
+            return "".join(json.dumps(r, ensure_ascii=False, cls=utils.CustomJSONEncoder) + "\n"
+                           for r in df.to_dict(orient='records'))
+
+        def normalizado(_):
+            return utils._serializar_ndjson(utils.normalizar_dataframe(df), normalizadas=True)
+
+        resultados[f"json:encoder:{n}"] = resumen(medir(con_encoder, repeticiones), n)
+        resultados[f"json:normalizado:{n}"] = resumen(medir(normalizado, repeticiones), n)
+    return resultados
+
+def bench_filtro(repeticiones, tamanos=TAMANOS_FILTRO):
+    import parallel_filter, replay
+    resultados = {}
+    procesos = parallel_filter.FILTRO_PROCESOS
+    for n in tamanos:
+        ofertas = fixtures.ofertas_historial(n)
+
+        def filtrar(_):
+            with silencio():
+                return utils.filtrar_por_ubicacion_estricta(replay.filtrar_por_perfil(ofertas, fixtures.FILTROS_CV))
+
+        for modo, minimo in (("serial", float("inf")), ("paralelo", 0)):
+            parallel_filter.MIN_OFERTAS_PARALELO = minimo
+            resultados[f"filter:{modo}:{n}"] = resumen(medir(filtrar, repeticiones), n)
+    parallel_filter.MIN_OFERTAS_PARALELO = 5000
+    print(f"   🧮 filter: {procesos} procesos")
+    return resultados
+
+def bench_pipeline(repeticiones):
+    try:
+        import main as modulo_main
+    except ImportError as e:
+        print(f"   ⏭️ pipeline: dependencia no instalada ({e.name}), se omite.")
+        return {}
+
+    cv_falso = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    cv_falso.close()
+    modulo_main.CV_FILE_PATH = cv_falso.name
+    modulo_main.procesar_cv = lambda ruta: dict(fixtures.FILTROS_CV)
+    fuentes = ",".join(m for m in ITEMS_POR_FUENTE if m in {n for n, _ in _fuentes_cargadas()})
+    try:
+        duraciones = medir(lambda _: modulo_main.main(fuentes), repeticiones, historial_temporal)
+    finally:
+        os.remove(cv_falso.name)
+    return {"pipeline:main": resumen(duraciones, sum(ITEMS_POR_FUENTE[f] for f in fuentes.split(",")))}
+
+def _fuentes_cargadas():
+    from sources import FUENTES
+    return [(nombre, f) for nombre, f in FUENTES.items() if f["modulo"] in _modulos_cargados]
+
+def resumen(duraciones, items):
+    mediana = statistics.median(duraciones)
+    return {
+        "runs": len(duraciones),
+        "median_s": round(mediana, 6),
+        "min_s": round(min(duraciones), 6),
+        "max_s": round(max(duraciones), 6),
+        "items": items,
+        "items_per_s": round(items / mediana, 1) if mediana else None,
+    }
+
+def commit_actual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True).strip()
+    except Exception:
+        return "desconocido"
+
+def imprimir_tabla(resultados, base=None):
+    print(f"\n{'benchmark':<28}{'mediana (s)':>14}{'min (s)':>12}{'items/s':>14}{'vs base':>10}")
+    print("-" * 78)
+    for nombre, r in resultados.items():
+        delta = ""
+        if base and nombre in base:
+            anterior = base[nombre]["median_s"]
+            delta = f"{(r['median_s'] - anterior) / anterior * 100:+.1f}%" if anterior else ""
+        print(f"{nombre:<28}{r['median_s']:>14.4f}{r['min_s']:>12.4f}{r['items_per_s'] or 0:>14.1f}{delta:>10}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del agente de empleo")
+    parser.add_argument("--only", default="engine,history,cv,rank,json,filter,pipeline",
+                        help="Grupos a correr separados por coma: engine, history, cv, rank, json, filter, pipeline")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones medidas por benchmark (más 1 de warmup)")
+    parser.add_argument("--history-sizes", default=",".join(str(n) for n in TAMANOS_HISTORIAL),
+                        help="Tamaños de historial a medir")
+    parser.add_argument("--output", help="Ruta donde guardar los resultados en JSON")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar medianas")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    grupos = {g.strip() for g in args.only.split(",")}
+    modelo_falso = FakeGenerativeModel()
+    resultados = {}
+
+    print(f"🏁 Benchmark offline (commit {commit_actual()}, {args.repeat} repeticiones)")
+    with FixtureServer() as servidor:
+        print(f"   🖥️ Servidor de fixtures en {servidor.url}")
+        configurar_llm(modelo_falso)
+        motores = configurar_motores(servidor.url)
+
+        if "engine" in grupos:
+            resultados.update(bench_motores(motores, args.repeat))
+        if "history" in grupos:
+            tamanos = [int(n) for n in args.history_sizes.split(",") if n]
+            resultados.update(bench_historial(args.repeat, tamanos))
+        if "cv" in grupos:
+            resultados.update(bench_cv(args.repeat))
+        if "rank" in grupos:
+            resultados.update(bench_ranking(args.repeat))
+        if "json" in grupos:
+            resultados.update(bench_json(args.repeat))
+        if "filter" in grupos:
+            resultados.update(bench_filtro(args.repeat))
+        if "pipeline" in grupos:
+            resultados.update(bench_pipeline(args.repeat))
+
+    base = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            base = json.load(f)["results"]
+    imprimir_tabla(resultados, base)
+
+    if args.output:
+        payload = {
+            "commit": commit_actual(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "llm_calls": modelo_falso.llamadas,
+            "results": resultados,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
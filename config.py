@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import argparse
+
+try:
+    import tomllib # Python 3.11+
+except ImportError:
+    tomllib = None
+
+# --- CONFIGURACIÓN EN CAPAS (ARCHIVO -> ENTORNO -> CLI) ---
+# Cada módulo declara sus valores por defecto donde los usa:
+#     HISTORY_DIR = config.ruta("storage.dir", "~/.local/share/agent-offers")
+# y la configuración solo guarda lo que se pisa, por capas (gana la última):
+# 1. Archivo TOML o JSON: --config RUTA, $AGENT_CONFIG, ./agent_config.toml,
+#    ./agent_config.json o ~/.config/agent-offers/config.toml. Las claves son
+#    siempre sección.clave: [storage] dir = "..." -> "storage.dir"; una tabla
+#    más adentro es el valor (dict) de esa clave ([http.host_limits."x.com"]).
+# 2. Entorno: AGENT_<CLAVE> con puntos como "_" (storage.dir -> AGENT_STORAGE_DIR).
+#    Las variables de antes siguen valiendo (ALIAS_ENTORNO).
+# 3. CLI: --set clave=valor (repetible) y las opciones propias de main.py.
+# Los valores de texto (entorno, --set) se convierten al tipo del default:
+# bool (1/true/yes/on), int, float, listas ("a,b" o JSON) y dicts (JSON).
+# Los dicts se mezclan con el default hasta dos niveles (ej: solo el rps de un host).
+# main.py carga la capa CLI antes de importar el resto: los módulos leen la
+# configuración al importarse. `python main.py --show-config` muestra el
+# resultado efectivo y de qué capa salió cada valor.
+ARCHIVOS_POR_DEFECTO = ("agent_config.toml", "agent_config.json", "~/.config/agent-offers/config.toml")
+ALIAS_ENTORNO = {
+    "AGENT_SOURCES": "sources.enabled",
+    "AGENT_METRICS": "metrics.enabled",
+    "AGENT_FILTER_PROCESSES": "filter.processes",
+    "AGENT_ARCHIVE": "archive.enabled",
+    "AGENT_SINKS": "sinks.targets",
+}
+VERDADEROS = ("1", "true", "yes", "on")
+
+_capas = []     # [(origen, {clave: valor})] en orden de prioridad creciente
+_usadas = {}    # clave -> (valor efectivo, origen) de cada valor pedido
+_archivo = None
+
+def _aplanar(datos):
+    planos = {}
+    for seccion, claves in datos.items():
+        if not isinstance(claves, dict):
+            raise ValueError(f"'{seccion}' debe ser una sección (ej: [{seccion}] clave = valor)")
+        for clave, valor in claves.items():
+            planos[f"{seccion}.{clave}"] = valor
+    return planos
+
+def _leer_archivo(ruta):
+    if ruta.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError(f"{ruta}: TOML necesita Python 3.11+ (o usar el mismo contenido en JSON)")
+        with open(ruta, 'rb') as f:
+            return _aplanar(tomllib.load(f))
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return _aplanar(json.load(f))
+
+def _buscar_archivo(ruta=None):
+    if ruta:
+        return ruta
+    if os.getenv("AGENT_CONFIG"):
+        return os.getenv("AGENT_CONFIG")
+    for candidato in ARCHIVOS_POR_DEFECTO:
+        candidato = os.path.expanduser(candidato)
+        if os.path.exists(candidato):
+            return candidato
+    return None
+
+def _capa_entorno():
+    valores = {}
+    for variable, clave in ALIAS_ENTORNO.items():
+        if os.getenv(variable):
+            valores[clave] = os.environ[variable]
+    return valores
+
+def cargar(ruta_archivo=None, asignaciones=()):
+    """Arma las capas: archivo (si hay), entorno y `asignaciones` ["clave=valor", ...] de la CLI."""
+    global _capas, _archivo
+    _archivo = _buscar_archivo(ruta_archivo)
+    capas = []
+    if _archivo:
+        try:
+            capas.append((f"archivo {_archivo}", _leer_archivo(os.path.expanduser(_archivo))))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Archivo de configuración inválido ({_archivo}): {e}")
+    capas.append(("entorno (alias)", _capa_entorno()))
+    capas.append(("entorno", {})) # AGENT_<CLAVE>: se resuelve al pedir cada clave
+    cli = {}
+    for asignacion in asignaciones:
+        clave, signo, valor = asignacion.partition("=")
+        if not signo or not clave.strip():
+            raise ValueError(f"--set inválido: '{asignacion}' (formato clave=valor)")
+        cli[clave.strip()] = valor
+    capas.append(("cli --set", cli))
+    _capas = capas
+    _usadas.clear()
+
+def cargar_cli(argv=None):
+    """Lee solo --config y --set de la línea de comandos (el resto lo parsea main.py)."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--config")
+    parser.add_argument("--set", action="append", default=[])
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    try:
+        cargar(args.config, args.set)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+def _convertir(clave, texto, defecto):
+    """Texto de entorno / --set -> tipo del valor por defecto."""
+    try:
+        if isinstance(defecto, bool):
+            return texto.strip().lower() in VERDADEROS
+        if isinstance(defecto, int):
+            return int(texto)
+        if isinstance(defecto, float):
+            return float(texto)
+        if isinstance(defecto, (list, tuple)):
+            texto = texto.strip()
+            return json.loads(texto) if texto.startswith("[") else [t.strip() for t in texto.split(",") if t.strip()]
+        if isinstance(defecto, dict) or defecto is None:
+            try:
+                return json.loads(texto)
+            except json.JSONDecodeError:
+                if defecto is None:
+                    return texto # Texto libre (ej: una ruta)
+                raise
+        return texto
+    except (ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Valor inválido para {clave}: {texto!r} ({e})")
+
+def valor(clave, defecto=None):
+    """Valor efectivo de `clave` (la capa más alta que la define) o `defecto`."""
+    resultado, origen = defecto, "default"
+    variable = "AGENT_" + clave.upper().replace(".", "_")
+    for nombre, valores in _capas:
+        if nombre == "entorno":
+            crudo = os.getenv(variable)
+            if crudo is None:
+                continue
+            nombre = f"entorno {variable}"
+        elif clave in valores:
+            crudo = valores[clave]
+        else:
+            continue
+        if isinstance(crudo, str) and not isinstance(defecto, str):
+            crudo = _convertir(clave, crudo, defecto)
+        if isinstance(defecto, dict) and isinstance(crudo, dict):
+            crudo = {**resultado, **{k: {**resultado[k], **v} if isinstance(v, dict) and isinstance(resultado.get(k), dict) else v
+                                     for k, v in crudo.items()}}
+        resultado, origen = crudo, nombre
+    _usadas[clave] = (resultado, origen)
+    return resultado
+
+def ruta(clave, defecto):
+    """Como valor(), expandiendo "~" (rutas de almacenamiento)."""
+    expandida = os.path.expanduser(valor(clave, defecto))
+    _usadas[clave] = (expandida, _usadas[clave][1])
+    return expandida
+
+def efectiva():
+    """{clave: (valor, origen)} de todo lo que pidieron los módulos importados hasta ahora."""
+    return dict(sorted(_usadas.items()))
+
+def archivo():
+    return _archivo
+
+cargar()
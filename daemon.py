@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import heapq
+import random
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from read_cv import procesar_cv, CV_FILE_PATH
+from sources import FUENTES, resolver_fuentes, cargar_fuente
+from replay import replay
+import config
+import metrics
+import source_health
+import source_cursors
+import sinks
+
+# --- MODO DAEMON (POLLING PROGRAMADO) ---
+# Un solo proceso de larga vida: los módulos de cada motor, la sesión HTTP, los
+# patrones compilados y el índice del historial quedan cargados entre ciclos.
+# Cada fuente se consulta con su propio intervalo (en segundos) más un jitter
+# para no golpear los sitios siempre en el mismo segundo.
+INTERVALOS_POR_DEFECTO = config.valor("daemon.intervals", {
+    "hn": 60 * 60,             # El hilo "Who is hiring" cambia poco: cada hora
+    "wwr": 30 * 60,
+    "remoteok": 15 * 60,       # La API se actualiza seguido
+    "yc": 30 * 60,
+    "wellfound": 60 * 60,
+    "linkedin": 6 * 60 * 60,   # Scraping caro y sensible a bloqueos
+})
+JITTER = config.valor("daemon.jitter", 0.1) # ±10% del intervalo
+
+def proxima_ejecucion(intervalo, jitter=JITTER, ahora=None):
+    """Timestamp de la siguiente consulta: ahora + intervalo ± jitter."""
+    ahora = time.time() if ahora is None else ahora
+    return ahora + intervalo * random.uniform(1 - jitter, 1 + jitter)
+
+class FiltrosCV:
+    """
+    Mantiene los filtros del CV en memoria y solo vuelve a procesar el CV
+    si el archivo cambió (por mtime) desde la última lectura.
+    `cambiaron` queda en True cuando un CV nuevo produjo filtros distintos.
+    """
+    def __init__(self, ruta_cv=CV_FILE_PATH):
+        self.ruta_cv = ruta_cv
+        self.mtime = None
+        self.filtros = None
+        self.cambiaron = False
+
+    def obtener(self):
+        try:
+            mtime = os.path.getmtime(self.ruta_cv)
+        except OSError:
+            print(f"⚠️ No se encuentra el CV en: {self.ruta_cv}. Usando filtros anteriores.")
+            return self.filtros
+
+        if self.filtros is None or mtime != self.mtime:
+            filtros = procesar_cv(self.ruta_cv)
+            if filtros:
+                self.cambiaron = self.filtros is not None and filtros != self.filtros
+                self.filtros = filtros
+                self.mtime = mtime
+        return self.filtros
+
+def ejecutar_daemon(fuentes=None, intervalos=None, sink=None, jitter=JITTER, al_terminar_ciclo=None):
+    """
+    Loop principal: consulta cada fuente habilitada según su intervalo y entrega
+    las ofertas nuevas al `sink` apenas se encuentran. Se detiene con Ctrl+C.
+    `al_terminar_ciclo` se llama después de cada consulta (ej: exportar métricas);
+    después las métricas se reinician, así cada reporte es el del último ciclo.
+    """
+    fuentes_activas = resolver_fuentes(fuentes)
+    intervalos = {**INTERVALOS_POR_DEFECTO, **(intervalos or {})}
+    filtros_cv = FiltrosCV()
+
+    print("🛰️ INICIANDO AGENTE EN MODO DAEMON")
+    print("=============================================")
+    for nombre in fuentes_activas:
+        print(f"   ⏱️ {FUENTES[nombre]['etiqueta']}: cada {intervalos[nombre] // 60} min")
+
+    # Primera pasada inmediata para todas las fuentes, en orden de registro
+    ahora = time.time()
+    cola = [(ahora + i, nombre) for i, nombre in enumerate(fuentes_activas)]
+    heapq.heapify(cola)
+
+    try:
+        while cola:
+            cuando, nombre = heapq.heappop(cola)
+            espera = cuando - time.time()
+            if espera > 0:
+                time.sleep(espera)
+
+            with metrics.fuente("cv"):
+                filtros = filtros_cv.obtener()
+            if filtros_cv.cambiaron:
+                # CV nuevo: lo ya guardado se re-evalúa al instante, sin esperar al scrapeo
+                filtros_cv.cambiaron = False
+                ofertas = replay(filtros)
+                sinks.emitir(ofertas, fuente="replay")
+                if ofertas and sink:
+                    sink(ofertas)
+            if filtros:
+                source_cursors.usar_perfil(filtros) # CV nuevo: cursores propios (descarga completa)
+                print(f"\n🔄 [{time.strftime('%H:%M:%S')}] Consultando {FUENTES[nombre]['etiqueta']}...")
+                try:
+                    ofertas = None
+                    with metrics.fuente(nombre), source_health.corrida(nombre) as habilitada:
+                        if habilitada:
+                            with source_cursors.corrida(nombre), metrics.timer("total"):
+                                ofertas = cargar_fuente(nombre)(filtros)
+                    sinks.emitir(ofertas, fuente=nombre)
+                    if ofertas and sink:
+                        sink(ofertas)
+                except Exception as e:
+                    print(f"❌ Error en la fuente {nombre}: {e}")
+                sinks.vaciar() # Entre ciclos puede pasar mucho tiempo: nada queda en los buffers
+                if al_terminar_ciclo:
+                    al_terminar_ciclo()
+                metrics.reiniciar() # Cada reporte describe su ciclo y las mediciones no crecen sin límite
+            else:
+                print("❌ Sin filtros de CV válidos, se reintenta en el próximo ciclo.")
+
+            heapq.heappush(cola, (proxima_ejecucion(intervalos[nombre], jitter), nombre))
+    except KeyboardInterrupt:
+        print("\n👋 Daemon detenido.")
+
+def parse_intervalos(valores):
+    """Convierte ["hn=600", "linkedin=21600"] en {"hn": 600, "linkedin": 21600}."""
+    intervalos = {}
+    for valor in valores or []:
+        nombre, _, segundos = valor.partition("=")
+        if nombre not in FUENTES or not segundos.isdigit():
+            raise ValueError(f"Intervalo inválido: '{valor}' (formato fuente=segundos)")
+        intervalos[nombre] = int(segundos)
+    return intervalos
@@ -1,15 +1,22 @@
 import os
 import sys
-import requests
 import html
 import re
-import json
 import time
+import contextvars
 import concurrent.futures
-from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils import get_http_session
+import config
+import metrics
+import parallel_filter
+import source_cursors
 
 # --- CONFIGURACIÓN API HACKER NEWS ---
 HN_API_BASE = "https://hacker-news.firebaseio.com/v0"
+HN_TIMEOUT = config.valor("hn.timeout", 10)
+HN_WORKERS = config.valor("hn.workers", 20) # Hilos para descargar los comentarios del hilo
 
 def get_latest_hiring_thread_id():
     """
@@ -18,11 +25,11 @@ def get_latest_hiring_thread_id():
     print("📡 Conectando a Hacker News para buscar el hilo de este mes...")
     try:
         # El usuario 'whoishiring' es el bot oficial que postea estos hilos
-        resp = requests.get(f"{HN_API_BASE}/user/whoishiring/submitted.json")
+        resp = get_http_session().get(f"{HN_API_BASE}/user/whoishiring/submitted.json", timeout=HN_TIMEOUT)
         submitted_ids = resp.json()[:30] # Revisamos los últimos 30 posts
 
         for item_id in submitted_ids:
-            item_resp = requests.get(f"{HN_API_BASE}/item/{item_id}.json")
+            item_resp = get_http_session().get(f"{HN_API_BASE}/item/{item_id}.json", timeout=HN_TIMEOUT)
             item = item_resp.json()
             title = item.get('title', '')
             
@@ -37,13 +44,16 @@ def get_latest_hiring_thread_id():
         print(f"❌ Error conectando a HN: {e}")
         return None, None
 
-def fetch_comment_details(comment_id):
+def fetch_comment_details(comment_id, fallidos=None):
     """
     Descarga un comentario individual y lo limpia.
+    Si la descarga falla y se pasa `fallidos` (lista), se anota ahí el id.
     """
     try:
-        resp = requests.get(f"{HN_API_BASE}/item/{comment_id}.json", timeout=10)
-        data = resp.json()
+        # Corre dentro del ThreadPool: la fuente se indica explícitamente
+        with metrics.timer("fetch", fuente="hn"):
+            resp = get_http_session().get(f"{HN_API_BASE}/item/{comment_id}.json", timeout=HN_TIMEOUT)
+            data = resp.json()
         
         if not data or 'text' not in data or data.get('deleted'):
             return None
@@ -60,91 +70,82 @@ def fetch_comment_details(comment_id):
             "url": f"https://news.ycombinator.com/item?id={comment_id}"
         }
     except:
+        if fallidos is not None:
+            fallidos.append(comment_id)
         return None
 
-def filtrar_oferta_hn(oferta, keywords, red_flags, filtros_extra={}):
+# Dealbreakers explícitos que indican presencialidad (Anti-Falsos Positivos)
+RE_DEALBREAKERS_HN = re.compile(
+    r"\bno remote\b|\bnot remote\b|\bonsite only\b|\boffice based\b|\bhybrid only\b|\bmust be in\b")
+RE_NUNCA = re.compile(r"(?!)") # Lista de keywords sin ninguna utilizable: nada matchea
+
+def _alternancia(terminos):
+    return re.compile("|".join(re.escape(t) for t in terminos)) if terminos else None
+
+def compilar_filtro_hn(keywords, red_flags, filtros_extra={}):
     """
-    Aplica filtros de texto básicos (Keywords y Red Flags).
+    Compila una sola vez los matchers del candidato (una alternancia por regla).
+    El resultado es picklable: se manda tal cual a los workers del filtrado paralelo.
     """
+    # Roles (Identidad) - "MUST HAVE": ej "Product Manager" (substring, en minúsculas)
+    roles = [r.lower() for r in filtros_extra.get('role_keywords', []) if r]
+
+    # Skills (Herramientas): lista limpia o el string viejo con operadores
+    keywords_clean = []
+    if isinstance(keywords, list):
+        keywords_clean = [k.strip().lower() for k in keywords]
+    elif isinstance(keywords, str):
+        keywords_clean = [k.strip().lower() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split()]
+    utilizables = [k for k in keywords_clean if len(k) > 1] # len > 1 para evitar "C" o "R" sueltos falsos
+
+    return {
+        "red_flags": _alternancia(red_flags),
+        "roles": _alternancia(roles),
+        "skills": _alternancia(utilizables) or (RE_NUNCA if keywords_clean else None),
+    }
+
+def cumple_filtro_hn(oferta, matcher):
+    """Predicado del filtrado (picklable): Remote obligatorio, sin red flags, rol y skill."""
     texto = oferta['text'].lower()
-    
-    # 1. Filtro "Remote" (Obligatorio en nuestra estrategia)
-    # 1. Filtro "Remote" MEJORADO (Anti-Falsos Positivos)
-    # Primero buscamos DEALBREAKERS explicitos que indican presencialidad
-    dealbreakers = [
-        r"\bno remote\b", r"\bnot remote\b", r"\bonsite only\b", 
-        r"\boffice based\b", r"\bhybrid only\b", r"\bmust be in\b"
-    ]
-    
-    for db in dealbreakers:
-        if re.search(db, texto):
-            return False
 
-    # Luego validamos que DIGA remote
-    if "remote" not in texto:
+    # 1. Filtro "Remote": sin dealbreakers de presencialidad y que DIGA remote
+    if RE_DEALBREAKERS_HN.search(texto) or "remote" not in texto:
         return False
 
     # 2. Filtro de Red Flags (Ciudadanía, etc)
-    for flag in red_flags:
-        if flag in texto:
-            return False
-            
-    # 3. Filtro de ROLES (Identidad) - "MUST HAVE"
-    # Si definimos roles explícitos (ej: "Product Manager"), la oferta DEBE tener al menos uno.
-    role_keywords = filtros_extra.get('role_keywords', [])
-    if role_keywords:
-        role_found = False
-        for role in role_keywords:
-            # Búsqueda de palabra completa para evitar falsos positivos parciales (ej: "Manager" en "Managerial")
-            # Usamos boundaries \b si es posible, o in simple.
-            # Dado que los roles pueden ser "Product Manager", 'in' está bien.
-            if role.lower() in texto:
-                role_found = True
-                break
-        
-        if not role_found:
-             return False
+    if matcher["red_flags"] and matcher["red_flags"].search(texto):
+        return False
 
-    # 4. Filtro de SKILLS (Herramientas) - "NICE TO HAVE" / Validación Secundaria
-    # Ya sabemos que es el ROL correcto, ahora vemos si usa las TECNOLOGÍAS correctas.
-    # Si la lista de keywords está vacía, pasa. Si no, verificamos coincidencia.
-    keywords_clean = []
-    
-    if isinstance(keywords, list):
-        keywords_clean = [k.strip().lower() for k in keywords]
-    elif isinstance(keywords, str):
-         keywords_clean = [k.strip().lower() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split()]
-    
-    if keywords_clean:
-         found = False
-         for k in keywords_clean:
-             if len(k) > 1 and k in texto: # len > 1 para evitar "C" o "R" sueltos falsos
-                 found = True
-                 break
-         
-         if not found:
-             return False
+    # 3. Filtro de ROLES: si hay roles explícitos, la oferta DEBE tener al menos uno
+    if matcher["roles"] and not matcher["roles"].search(texto):
+        return False
+
+    # 4. Filtro de SKILLS: si hay keywords, al menos una tecnología del perfil
+    if matcher["skills"] and not matcher["skills"].search(texto):
+        return False
 
     return True
 
-def buscar_ofertas_hackernews(filtros_json):
+def filtrar_oferta_hn(oferta, keywords, red_flags, filtros_extra={}):
     """
-    Función principal orquestadora para HN.
+    Aplica filtros de texto básicos (Keywords y Red Flags) a una oferta suelta.
+    Para lotes usar compilar_filtro_hn + cumple_filtro_hn (compila una sola vez).
     """
-    print("\n🍊 INICIANDO MOTOR HACKER NEWS (La Cueva de los Ingenieros)...")
-    
-    # Adapter: Intentamos usar la lista limpia, si no, el string antiguo
-    keywords = filtros_json.get("keyword_list", [])
-    if not keywords:
-        keywords = filtros_json.get("keywords", "")
-    
-    # Definimos Red Flags específicas para texto libre
-    red_flags = [
-        "us citizen", "u.s. citizen", "citizenship required", 
-        "must reside in usa", "must reside in the us", 
-        "onsite in", "on-site in" # Si es on-site no nos sirve
-    ]
+    return cumple_filtro_hn(oferta, compilar_filtro_hn(keywords, red_flags, filtros_extra))
+
+# Red Flags específicas para texto libre
+RED_FLAGS_HN = [
+    "us citizen", "u.s. citizen", "citizenship required", 
+    "must reside in usa", "must reside in the us", 
+    "onsite in", "on-site in" # Si es on-site no nos sirve
+]
 
+def descargar_ofertas_hackernews():
+    """
+    Descarga (sin filtrar) los comentarios del hilo "Who is hiring?" del mes
+    posteriores al cursor (comment id más alto ya descargado de ese hilo).
+    Se puede compartir entre varios candidatos (modo batch).
+    """
     # 1. Obtener el hilo madre
     thread_id, thread_title = get_latest_hiring_thread_id()
     if not thread_id:
@@ -152,20 +153,34 @@ def buscar_ofertas_hackernews(filtros_json):
 
     # 2. Obtener lista de comentarios (IDs)
     try:
-        resp = requests.get(f"{HN_API_BASE}/item/{thread_id}.json")
+        resp = get_http_session().get(f"{HN_API_BASE}/item/{thread_id}.json", timeout=HN_TIMEOUT)
         all_kids_ids = resp.json().get('kids', [])
         print(f"   📦 El hilo tiene {len(all_kids_ids)} comentarios/ofertas totales.")
     except Exception as e:
         print(f"❌ Error obteniendo comentarios: {e}")
         return []
 
-    ofertas_crudas = []
+    # Los comment ids son crecientes: solo se piden los posteriores al cursor de este hilo
+    cursor = source_cursors.leer("hn")
+    hasta = cursor["hasta"] if cursor and cursor.get("hilo") == thread_id else 0
+    omitidos = sum(1 for kid_id in all_kids_ids if kid_id <= hasta)
+    if omitidos:
+        all_kids_ids = [kid_id for kid_id in all_kids_ids if kid_id > hasta]
+        metrics.incr("cursor_omitidas", omitidos)
+        print(f"      ⏩ {omitidos} comentarios ya procesados en corridas anteriores.")
+    if not all_kids_ids:
+        return []
+    fallidos = []
+
+    comentarios = []
     print("   🚀 Descargando ofertas en paralelo (esto será rápido)...")
     
     # 3. Descarga Paralela (ThreadPool)
-    # Usamos 20 hilos simultáneos para volar
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [executor.submit(fetch_comment_details, kid_id) for kid_id in all_kids_ids]
+    # 20 hilos; el ritmo real y las peticiones en vuelo los limita el programador HTTP
+    with concurrent.futures.ThreadPoolExecutor(max_workers=HN_WORKERS) as executor:
+        # Cada tarea conserva el contexto (fuente actual) para métricas y salud de la fuente
+        futures = [executor.submit(contextvars.copy_context().run, fetch_comment_details, kid_id, fallidos)
+                   for kid_id in all_kids_ids]
         
         for i, future in enumerate(concurrent.futures.as_completed(futures)):
             if i % 100 == 0 and i > 0:
@@ -173,24 +188,57 @@ def buscar_ofertas_hackernews(filtros_json):
             
             result = future.result()
             if result:
-                # Filtrado preliminar inmediato para no guardar basura
-                if filtrar_oferta_hn(result, keywords, red_flags, filtros_json):
-                    # Formateamos para que parezca una oferta estandarizada
-                    ofertas_crudas.append({
-                        "title": f"HN Offer by {result['by']}", # HN no tiene títulos, usamos el autor
-                        "company": "Startup (See Description)", # A deducir por IA luego
-                        "location": "Remote (Verificado en texto)",
-                        "description": result['text'], # AQUÍ ESTÁ EL ORO
-                        "job_url": result['url'],
-                        "source": "HackerNews"
-                    })
+                comentarios.append(result)
+
+    # El cursor avanza hasta justo antes del primer comentario que falló (se reintenta la próxima vez)
+    nuevo_hasta = min(fallidos) - 1 if fallidos else max(all_kids_ids)
+    if nuevo_hasta > hasta:
+        source_cursors.proponer("hn", {"hilo": thread_id, "hasta": nuevo_hasta})
+    metrics.incr("ofertas_crudas", len(comentarios))
+    return comentarios
+
+def filtrar_ofertas_hackernews(comentarios, filtros_json):
+    """Aplica los filtros del candidato a los comentarios descargados y los estandariza."""
+    # Adapter: Intentamos usar la lista limpia, si no, el string antiguo
+    keywords = filtros_json.get("keyword_list", [])
+    if not keywords:
+        keywords = filtros_json.get("keywords", "")
+
+    ofertas_crudas = []
+    with metrics.timer("filter"):
+        # Filtrado preliminar para no guardar basura (en paralelo si el lote es grande)
+        matcher = compilar_filtro_hn(keywords, RED_FLAGS_HN, filtros_json)
+        for result in parallel_filter.filtrar(cumple_filtro_hn, comentarios, (matcher,), campos=("text",)):
+            # Formateamos para que parezca una oferta estandarizada
+            ofertas_crudas.append({
+                "title": f"HN Offer by {result['by']}", # HN no tiene títulos, usamos el autor
+                "company": "Startup (See Description)", # A deducir por IA luego
+                "location": "Remote (Verificado en texto)",
+                "description": result['text'], # AQUÍ ESTÁ EL ORO
+                "job_url": result['url'],
+                "source": "HackerNews"
+            })
+
+    metrics.incr("ofertas_filtradas", len(ofertas_crudas))
+    return ofertas_crudas
+
+def buscar_ofertas_hackernews(filtros_json):
+    """
+    Función principal orquestadora para HN.
+    """
+    print("\n🍊 INICIANDO MOTOR HACKER NEWS (La Cueva de los Ingenieros)...")
 
+    comentarios = descargar_ofertas_hackernews()
+    if not comentarios:
+        return []
+
+    ofertas_crudas = filtrar_ofertas_hackernews(comentarios, filtros_json)
     print(f"   💎 Se encontraron {len(ofertas_crudas)} ofertas potenciales en HN después del filtrado básico.")
     
     # 4. Deduplicación Histórica y Guardado
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-    history = JobHistoryManager()
+    from utils import get_history_manager, filtrar_por_ubicacion_estricta
+    history = get_history_manager()
     
     # NUEVO: Filtro Estricto de Ubicación
     ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_crudas)
@@ -205,27 +253,6 @@ def buscar_ofertas_hackernews(filtros_json):
 
     return ofertas_nuevas
 
-def guardar_en_archivo(ofertas):
-    if not ofertas:
-        print("⚠️ No hay ofertas de HN para guardar.")
-        return
-
-    # Ruta consistente con el módulo de LinkedIn
-    ruta_base = "/Users/josemiguelrozobaez/documents/develop/agent-offers/"
-    os.makedirs(ruta_base, exist_ok=True)
-    
-    # Prefijo HN para distinguir
-    nombre_archivo = "HN_" + datetime.now().strftime("%d%b%H%M") + ".json"
-    ruta_completa = os.path.join(ruta_base, nombre_archivo)
-    
-    try:
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            json.dump(ofertas, f, indent=4, ensure_ascii=False)
-        print(f"\n💾 ARCHIVO HN GUARDADO EXITOSAMENTE:")
-        print(f"   📂 {ruta_completa}")
-    except Exception as e:
-        print(f"❌ Error guardando archivo HN: {e}")
-
 # --- TEST ---
 if __name__ == "__main__":
     filtros_test = {
@@ -0,0 +1,297 @@
+import os
+import re
+import json
+import tempfile
+import threading
+
+from ranking import tokenizar
+from utils import (base_historial, ruta_historial, bloqueo_archivo, recorrer_historial, leer_en_offsets,
+                   leer_stacks, clave_contenido, fusionar_stacks)
+
+# --- ÍNDICE INVERTIDO DEL HISTORIAL (término -> ids de oferta) ---
+# El id de una oferta es el offset en bytes de su línea en el NDJSON (descomprimido):
+# no cambia con los appends ni si una línea corrupta se saltea al leer, y una
+# consulta lee solo las líneas que matchean (seek + una línea, ver utils.leer_en_offsets).
+# El índice guarda la cantidad de ofertas, sus offsets y hasta qué byte del archivo
+# indexó: si el historial solo creció se indexa lo agregado; si se reescribió
+# (otro inode, más chico) o el índice falta o es de otra versión, se reconstruye.
+# El índice vive junto al historial: offers_history.ndjson -> offers_history.index.json.
+# Lo indexado después se agrega a offers_history.index.log (un delta por línea,
+# append-only): guardar ofertas no reescribe el índice entero. Al cargar se aplica
+# el log sobre el índice; cuando el log pasa LOG_MAX_PROPORCION del tamaño del
+# índice (o al reconstruir) se compacta: índice completo nuevo y log vacío.
+# El stack extraído por la IA se indexa aparte con prefijo: "stack:python". Vive en
+# el archivo lateral de stacks (utils.ruta_stacks); el índice guarda hasta qué
+# byte lo incorporó y lee solo lo que se agregó después.
+INDEX_VERSION = 4
+CAMPOS_INDEXADOS = ('title', 'company', 'location', 'description')
+PREFIJO_STACK = "stack:"
+LOG_MAX_PROPORCION = 0.5
+
+_indices = {}
+_lock = threading.Lock()
+
+def ruta_indice(history_file):
+    return base_historial(history_file) + ".index.json"
+
+def _terminos_oferta(oferta):
+    terminos = set(tokenizar(" ".join(str(oferta.get(campo) or "") for campo in CAMPOS_INDEXADOS)))
+    for tecnologia in oferta.get('stack') or ():
+        terminos.update(PREFIJO_STACK + t for t in tokenizar(tecnologia))
+    return terminos
+
+class HistoryIndex:
+    def __init__(self, history_file):
+        self.history_file = history_file
+        self.index_file = ruta_indice(history_file)
+        self.log_file = base_historial(history_file) + ".index.log"
+        self._vaciar()
+        self._cargar()
+
+    def _vaciar(self):
+        self.docs = 0          # Ofertas indexadas
+        self.offsets = []      # Id (offset) de cada una, en orden
+        self.inodo = None      # Archivo del historial indexado...
+        self.bytes = 0         # ...y hasta qué byte (en disco) se leyó
+        self.fin = 0           # Offset (descomprimido) donde empieza el próximo append
+        self.stacks_bytes = 0  # Bytes del archivo lateral de stacks ya indexados
+        self.stacks = None     # {clave_contenido: stack} para completar resultados (se carga al usarse)
+        self.postings = {}
+        self._tamanio_indice = 0 # Bytes del índice completo en disco (umbral de compactación del log)
+
+    def _cargar(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            self.offsets = data["offsets"]
+            self.docs = len(self.offsets)
+            self.inodo, self.bytes, self.fin = data["inode"], data["bytes"], data["fin"]
+            self.stacks_bytes = data["stacks_bytes"]
+            self.postings = {t: set(ids) for t, ids in data["postings"].items()}
+            self._tamanio_indice = os.path.getsize(self.index_file)
+        except Exception as e:
+            print(f"⚠️ Índice del historial ilegible ({e}), se reconstruirá.")
+            self._vaciar()
+            return
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        self._aplicar(json.loads(linea))
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        break # Append interrumpido: lo que sigue se vuelve a indexar del historial
+
+    def guardar(self):
+        """Escribe el índice completo (compactación) y vacía el log de deltas."""
+        data = {"version": INDEX_VERSION, "docs": self.docs, "inode": self.inodo, "bytes": self.bytes,
+                "fin": self.fin, "stacks_bytes": self.stacks_bytes, "offsets": self.offsets,
+                "postings": {t: sorted(ids) for t, ids in self.postings.items()}}
+        directorio = os.path.dirname(self.index_file) or "."
+        fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(self.index_file) + ".", suffix=".tmp", dir=directorio)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_file, self.index_file)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        self._tamanio_indice = os.path.getsize(self.index_file)
+        open(self.log_file, 'w').close()
+
+    def _aplicar(self, delta):
+        """Incorpora un delta (del log o recién indexado). Aplicarlo dos veces no cambia nada."""
+        for termino, ids in delta.get("postings", {}).items():
+            self.postings.setdefault(termino, set()).update(ids)
+        ultimo = self.offsets[-1] if self.offsets else -1
+        self.offsets.extend(doc for doc in delta.get("offsets", ()) if doc > ultimo)
+        self.docs = len(self.offsets)
+        for campo, atributo in (("inode", "inodo"), ("bytes", "bytes"), ("fin", "fin"), ("stacks_bytes", "stacks_bytes")):
+            if campo in delta:
+                setattr(self, atributo, delta[campo])
+
+    def _registrar(self, delta):
+        """Aplica el delta y lo agrega al log; compacta cuando el log crece más que LOG_MAX_PROPORCION del índice."""
+        self._aplicar(delta)
+        delta = dict(delta, postings={t: sorted(ids) for t, ids in delta.get("postings", {}).items()})
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(delta, ensure_ascii=False, separators=(',', ':')) + "\n")
+        if os.path.getsize(self.log_file) > self._tamanio_indice * LOG_MAX_PROPORCION:
+            self.guardar()
+
+    def _indexar(self, desde, base, stacks=None):
+        """
+        Indexa las líneas del historial desde el byte `desde` (ids desde `base`).
+        Devuelve el delta: {"offsets": ids nuevos, "postings": {término: ids}, "fin": offset siguiente}.
+        """
+        delta = {"offsets": [], "postings": {}}
+        def lineas():
+            delta["fin"] = yield from recorrer_historial(self.history_file, desde, base)
+        for doc, oferta in lineas():
+            delta["offsets"].append(doc)
+            for termino in _terminos_oferta(oferta):
+                delta["postings"].setdefault(termino, set()).add(doc)
+            stack = stacks.get(clave_contenido(oferta)) if stacks else None
+            if stack is not None:
+                self._indexar_stack(delta["postings"], doc, stack)
+        return delta
+
+    @staticmethod
+    def _indexar_stack(postings, doc, stack):
+        for tecnologia in stack:
+            for token in tokenizar(tecnologia):
+                postings.setdefault(PREFIJO_STACK + token, set()).add(doc)
+
+    def _firma(self):
+        try:
+            st = os.stat(self.history_file)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def reconstruir(self):
+        self._vaciar()
+        inodo, tamanio = self._firma()
+        # Desde cero los stacks se asocian por contenido (no por el doc con que se
+        # guardaron): sirve aunque el historial se haya reescrito
+        registros, stacks_bytes = leer_stacks(self.history_file)
+        self.stacks = {r['key']: r['stack'] for r in registros}
+        delta = self._indexar(0, 0, self.stacks)
+        self._aplicar(dict(delta, inode=inodo, bytes=tamanio, stacks_bytes=stacks_bytes))
+        self.guardar()
+        print(f"🗂️ Índice del historial reconstruido: {self.docs} ofertas, {len(self.postings)} términos.")
+
+    def sincronizar(self):
+        """
+        Con el lock del historial tomado: incorpora lo que cambió desde la última vez
+        sin releer lo ya indexado (appends desde self.bytes, stacks nuevos). Lo nuevo
+        va al log de deltas, no se reescribe el índice entero.
+        Devuelve los ids de las ofertas nuevas.
+        """
+        inodo, tamanio = self._firma()
+        if inodo != self.inodo or tamanio < self.bytes:
+            self.reconstruir()
+            return list(self.offsets)
+        nuevos = []
+        if tamanio > self.bytes:
+            delta = self._indexar(self.bytes, self.fin)
+            nuevos = delta["offsets"]
+            self._registrar(dict(delta, bytes=tamanio))
+        self.agregar_stacks()
+        return nuevos
+
+    def agregar_stacks(self):
+        """Indexa los stacks agregados al archivo lateral desde la última vez."""
+        registros, fin = leer_stacks(self.history_file, self.stacks_bytes)
+        if fin < self.stacks_bytes: # El archivo lateral se borró o se truncó
+            self.reconstruir()
+            return
+        if not registros:
+            return
+        postings = {}
+        for r in registros:
+            if r.get('doc') is not None and r['doc'] < self.fin:
+                self._indexar_stack(postings, r['doc'], r['stack'])
+            if self.stacks is not None:
+                self.stacks[r['key']] = r['stack']
+        self._registrar({"postings": postings, "stacks_bytes": fin})
+
+    def stacks_por_clave(self):
+        if self.stacks is None:
+            self.stacks = {r['key']: r['stack'] for r in leer_stacks(self.history_file)[0]}
+        return self.stacks
+
+    def ids_termino(self, termino):
+        """
+        Ids que contienen todos los tokens de `termino` (frases = AND de sus palabras).
+        Con prefijo "stack:" se busca solo en el stack extraído (ej: stack:kubernetes).
+        """
+        prefijo = ""
+        if termino.lower().startswith(PREFIJO_STACK):
+            prefijo, termino = PREFIJO_STACK, termino[len(PREFIJO_STACK):]
+        tokens = [prefijo + t for t in tokenizar(termino)]
+        if not tokens:
+            return None # Stopword o símbolo: no restringe
+        ids = set(self.postings.get(tokens[0], ()))
+        for token in tokens[1:]:
+            ids &= self.postings.get(token, set())
+        return ids
+
+    def buscar(self, consulta):
+        """
+        Búsqueda booleana: términos separados por espacio = AND, `OR` separa alternativas,
+        `-termino` o `NOT termino` excluye, "frases entre comillas" exigen todas sus palabras.
+        Ej: 'kubernetes latam', 'python OR golang -senior', '"machine learning" NOT intern',
+        'stack:rust latam'.
+        Devuelve los ids ordenados.
+        """
+        resultado = set()
+        for alternativa in re.split(r"\s+OR\s+", consulta.strip()):
+            incluidos, excluidos = None, set()
+            partes = re.findall(r'-?"[^"]*"|\S+', alternativa)
+            negar = False
+            for parte in partes:
+                if parte == "AND":
+                    continue
+                if parte == "NOT":
+                    negar = True
+                    continue
+                if parte.startswith("-") and len(parte) > 1:
+                    negar, parte = True, parte[1:]
+                ids = self.ids_termino(parte.strip('"'))
+                if ids is not None:
+                    if negar:
+                        excluidos |= ids
+                    else:
+                        incluidos = ids if incluidos is None else incluidos & ids
+                negar = False
+            if incluidos is None:
+                incluidos = set(self.offsets) if excluidos else set()
+            resultado |= incluidos - excluidos
+        return sorted(resultado)
+
+def get_index(history_file):
+    """Índice compartido por archivo de historial (se mantiene en memoria entre ciclos)."""
+    with _lock:
+        indice = _indices.get(history_file)
+        if indice is None:
+            indice = HistoryIndex(history_file)
+            _indices[history_file] = indice
+        return indice
+
+def indexar_nuevas(history_file, n):
+    """
+    Llamado por JobHistoryManager.save_offers tras el append (con el lock del historial
+    tomado). Devuelve los ids de las `n` ofertas recién agregadas (None si no se pudieron indexar).
+    """
+    indice = get_index(history_file)
+    with _lock:
+        nuevos = indice.sincronizar()[-n:]
+    return [None] * (n - len(nuevos)) + nuevos
+
+def indexar_stacks(history_file):
+    """Llamado por JobHistoryManager.save_stacks tras agregar al archivo lateral (con el lock tomado)."""
+    indice = get_index(history_file)
+    with _lock:
+        indice.sincronizar()
+
+def indice_sincronizado(history_file):
+    """Índice al día con el historial; toma el lock del historial (sin appends a medio escribir)."""
+    indice = get_index(history_file)
+    with bloqueo_archivo(base_historial(history_file)), _lock:
+        indice.sincronizar()
+    return indice
+
+def buscar_en_historial(consulta, history_file=None):
+    """Devuelve las ofertas del historial que cumplen la consulta booleana."""
+    if history_file is None:
+        history_file = ruta_historial()
+    indice = indice_sincronizado(history_file)
+    with _lock:
+        ids = indice.buscar(consulta)
+        stacks = indice.stacks_por_clave()
+    return fusionar_stacks(leer_en_offsets(history_file, ids), stacks)
@@ -0,0 +1,188 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+import config
+import metrics
+import source_health
+import response_archive
+
+# --- PROGRAMADOR HTTP POR HOST (CORTESÍA CON CADA SITIO) ---
+# Todas las peticiones de los motores pasan por aquí (get_http_session devuelve
+# una SesionProgramada). Para cada host:
+# - Token bucket: `rps` peticiones por segundo con ráfagas de hasta `rafaga`.
+# - Máximo `en_vuelo` peticiones simultáneas (aunque el motor use más hilos).
+# - Frenado automático: un 429/403 divide el ritmo por 2 (hasta RPS_MINIMO) y
+#   pausa el host (Retry-After si viene, si no PAUSA_FRENADO); tras
+#   EXITOS_PARA_ACELERAR respuestas buenas seguidas el ritmo vuelve a subir.
+# Los hosts sin entrada (o los límites que falten) salen de LIMITES_POR_DEFECTO. jobspy (LinkedIn) hace su
+# propio HTTP: su motor pide turno() al host de LinkedIn antes de cada búsqueda.
+LIMITES_POR_DEFECTO = config.valor("http.default_limits", {"rps": 2.0, "rafaga": 4, "en_vuelo": 4})
+LIMITES_HOST = config.valor("http.host_limits", {
+    "hacker-news.firebaseio.com": {"rps": 50.0, "rafaga": 50, "en_vuelo": 20}, # API de Firebase, generosa
+    "news.ycombinator.com": {"rps": 4.0, "rafaga": 8, "en_vuelo": 8},
+    "remoteok.com": {"rps": 0.5, "rafaga": 1, "en_vuelo": 1},
+    "weworkremotely.com": {"rps": 1.0, "rafaga": 3, "en_vuelo": 2},
+    "wellfound.com": {"rps": 0.5, "rafaga": 1, "en_vuelo": 1},       # Cloudflare: ir despacio
+    "www.linkedin.com": {"rps": 1 / 6.5, "rafaga": 1, "en_vuelo": 1}, # ~ las pausas de 5-8 s de antes
+})
+ESTADOS_FRENADO = (429, 403)
+FACTOR_FRENADO = 0.5
+RPS_MINIMO = 0.05
+PAUSA_FRENADO = config.valor("http.backoff_pause", 30.0) # Segundos sin pedir nada al host tras un 429/403 sin Retry-After
+PAUSA_MAXIMA = config.valor("http.backoff_pause_max", 300.0)
+EXITOS_PARA_ACELERAR = config.valor("http.successes_to_speed_up", 20)
+FACTOR_ACELERACION = 1.25
+
+def host_de(url):
+    return (urlsplit(url).hostname or "").lower()
+
+def _segundos_retry_after(valor):
+    try:
+        return min(PAUSA_MAXIMA, max(0.0, float(valor)))
+    except (TypeError, ValueError):
+        return None # Retry-After con fecha HTTP: se usa PAUSA_FRENADO
+
+class PoliticaHost:
+    """Token bucket + semáforo de peticiones en vuelo + frenado adaptativo de un host."""
+
+    def __init__(self, host, rps, rafaga, en_vuelo):
+        self.host = host
+        self.rps_base = float(rps)
+        self.rps = float(rps)
+        self.capacidad = float(rafaga)
+        self.tokens = float(rafaga)
+        self.max_en_vuelo = en_vuelo
+        self.frenadas = 0
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._exitos = 0
+        self._lock = threading.Lock()
+        self._en_vuelo = threading.BoundedSemaphore(en_vuelo)
+
+    def _esperar_token(self):
+        if math.isinf(self.rps_base):
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.rps)
+                self._ultimo = ahora
+                espera = self._pausa_hasta - ahora
+                if espera <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    espera = (1 - self.tokens) / self.rps
+            time.sleep(espera)
+
+    @contextmanager
+    def turno(self):
+        """Bloquea hasta que el host admite otra petición y la cuenta como en vuelo."""
+        with self._en_vuelo:
+            with metrics.timer("http_espera"):
+                self._esperar_token()
+            yield
+
+    def registrar(self, estado, retry_after=None):
+        """Ajusta el ritmo según el código HTTP de la respuesta."""
+        with self._lock:
+            if estado in ESTADOS_FRENADO:
+                self.frenadas += 1
+                self._exitos = 0
+                self.rps = max(RPS_MINIMO, self.rps * FACTOR_FRENADO)
+                self.tokens = 0.0
+                pausa = _segundos_retry_after(retry_after)
+                self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + (PAUSA_FRENADO if pausa is None else pausa))
+                frenado = True
+            else:
+                frenado = False
+                if estado < 400 and self.rps < self.rps_base:
+                    self._exitos += 1
+                    if self._exitos >= EXITOS_PARA_ACELERAR:
+                        self.rps = min(self.rps_base, self.rps * FACTOR_ACELERACION)
+                        self._exitos = 0
+        if frenado:
+            metrics.incr("http_frenadas")
+            print(f"   🐢 {self.host} respondió {estado}: bajando a {self.rps:.2f} req/s.")
+
+    def estado(self):
+        return {"rps": round(self.rps, 3), "rps_base": self.rps_base,
+                "en_vuelo_max": self.max_en_vuelo, "frenadas": self.frenadas}
+
+class Programador:
+    def __init__(self):
+        self._politicas = {}
+        self._lock = threading.Lock()
+
+    def politica(self, url_o_host):
+        host = host_de(url_o_host) if "://" in url_o_host else url_o_host.lower()
+        with self._lock:
+            politica = self._politicas.get(host)
+            if politica is None:
+                politica = PoliticaHost(host, **dict(LIMITES_POR_DEFECTO, **LIMITES_HOST.get(host, {})))
+                self._politicas[host] = politica
+            return politica
+
+    def configurar_host(self, host, **limites):
+        """Cambia los límites de un host (ej: benchmarks contra el servidor local)."""
+        with self._lock:
+            LIMITES_HOST[host] = dict(LIMITES_HOST.get(host, LIMITES_POR_DEFECTO), **limites)
+            self._politicas.pop(host, None)
+
+    def estado(self):
+        with self._lock:
+            return {host: p.estado() for host, p in self._politicas.items()}
+
+_programador = Programador()
+metrics.registrar_seccion("http_hosts", _programador.estado)
+
+def get_programador():
+    return _programador
+
+class FalloReciente(requests.exceptions.ConnectionError):
+    """La URL falló hace menos de NEGATIVE_TTL segundos: no se vuelve a pedir todavía."""
+
+class SesionProgramada(requests.Session):
+    """
+    requests.Session cuyas peticiones esperan su turno en la política del host.
+    Cada resultado alimenta la salud de la fuente en curso (source_health): los
+    GET que fallan (red o status >= 400, salvo 429) entran a la caché negativa.
+    Con response_archive activo cada respuesta se archiva; en modo reproducción
+    se contesta desde el archivo y no se toca la red.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get("params"):
+            url = requests.Request(method, url, params=kwargs.pop("params")).prepare().url
+        if response_archive.reproduciendo():
+            return response_archive.reproducir(method, url)
+
+        cacheable = method.upper() == "GET"
+        error = source_health.fallo_reciente(url) if cacheable else None
+        if error is not None:
+            metrics.incr("http_cache_negativa")
+            source_health.registrar_fallo(error)
+            raise FalloReciente(f"{url} falló hace poco ({error}); se reintenta pasado el TTL")
+
+        politica = _programador.politica(url)
+        try:
+            with politica.turno():
+                resp = super().request(method, url, *args, **kwargs)
+        except requests.RequestException as e:
+            source_health.registrar_fallo(e, url if cacheable else None)
+            raise
+        politica.registrar(resp.status_code, resp.headers.get("Retry-After"))
+        metrics.incr("http_peticiones")
+        if response_archive.ENABLED:
+            response_archive.archivar(url, resp.content, resp.status_code, resp.headers, resp.encoding, method)
+        if resp.status_code < 400:
+            source_health.registrar_exito()
+        else:
+            source_health.registrar_fallo(f"HTTP {resp.status_code}",
+                                          url if cacheable and resp.status_code != 429 else None)
+        return resp
@@ -1,44 +1,89 @@
 from jobspy import scrape_jobs
-import pandas as pd
+import re
 import os
 import sys
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
 import time
-import random
-from datetime import datetime
+import hashlib
+from dotenv import load_dotenv
+from functools import partial
+from urllib.parse import urlencode
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import metrics
+from semantic import compuerta_semantica, es_aceptable_sin_ia
+from llm_client import get_client, ErrorLLM
+from prompt_prep import preparar_descripcion, boilerplate_por_empresa
+from utils import normalizar_dataframe
+import parallel_filter
+from http_scheduler import get_programador
+import source_health
+import source_cursors
+import response_archive
 
 # --- CONFIGURACIÓN ---
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+LINKEDIN_MODEL_NAME = 'gemini-1.5-flash'
+VIABILIDAD_MAX_TOKENS = 400 # Solo ubicación / elegibilidad / requisitos de la oferta
+
+# El ritmo entre búsquedas lo pone el programador HTTP (host de LinkedIn; jobspy
+# hace su propio HTTP, así que se pide turno antes de cada búsqueda).
+# El ritmo de las llamadas a Gemini lo controla el presupuesto del cliente LLM.
+LINKEDIN_HOST = "www.linkedin.com"
 
 # --- 1. MOTOR DE BÚSQUEDA (SOLO LINKEDIN) ---
+def url_archivo_linkedin(keywords, location, is_remote, job_type, cantidad):
+    """Clave de una búsqueda de jobspy en el archivo de respuestas (sin hours_old: lo decide el cursor)."""
+    consulta = {"search_term": keywords, "location": location, "is_remote": is_remote,
+                "job_type": job_type, "results_wanted": cantidad}
+    return response_archive.PREFIJO_JOBSPY + "linkedin?" + urlencode(consulta)
+
 def ejecutar_busqueda_avanzada(keywords, location, is_remote, job_type, hours_old, cantidad):
     """
-    Busca estrictamente en LinkedIn.
+    Busca estrictamente en LinkedIn. Devuelve None si el scrapeo falló.
     """
-    print(f"   ➤ Scrapeando LinkedIn: {keywords} en {location}...")
+    print(f"   ➤ Scrapeando LinkedIn: {keywords} en {location} (últimas {hours_old} h)...")
+    politica = get_programador().politica(LINKEDIN_HOST)
+    url_archivo = url_archivo_linkedin(keywords, location, is_remote, job_type, cantidad)
+
+    if response_archive.reproduciendo():
+        crudo = response_archive.contenido(url_archivo)
+        if crudo is None:
+            print("      ❌ Búsqueda no archivada en la corrida reproducida.")
+            return None
+        registros = json.loads(crudo)
+        print(f"      📼 Encontradas (archivo): {len(registros)}")
+        metrics.incr("ofertas_crudas", len(registros))
+        return registros
     
     try:
-        jobs_df = scrape_jobs(
-            site_name=["linkedin"], # <--- SOLO LINKEDIN
-            search_term=keywords,
-            location=location,
-            results_wanted=cantidad,
-            hours_old=hours_old, 
-            is_remote=is_remote,
-            job_type=job_type,  
-            linkedin_fetch_description=True
-        )
+        with politica.turno(), metrics.timer("fetch"):
+            jobs_df = scrape_jobs(
+                site_name=["linkedin"], # <--- SOLO LINKEDIN
+                search_term=keywords,
+                location=location,
+                results_wanted=cantidad,
+                hours_old=hours_old, 
+                is_remote=is_remote,
+                job_type=job_type,  
+                linkedin_fetch_description=True
+            )
+        source_health.registrar_exito()
         print(f"      ✅ Encontradas: {len(jobs_df)}")
-        return jobs_df.to_dict(orient='records')
+        metrics.incr("ofertas_crudas", len(jobs_df))
+        with metrics.timer("parse"):
+            # Fechas/NaN/numpy se normalizan aquí, por columna, y no valor por valor al guardar
+            registros = normalizar_dataframe(jobs_df)
+        if response_archive.ENABLED:
+            response_archive.archivar(url_archivo, json.dumps(registros, ensure_ascii=False, default=str),
+                                      encoding="utf-8")
+        return registros
     except Exception as e:
         print(f"      ❌ Error scraping {location}: {e}")
-        return []
+        source_health.registrar_fallo(e)
+        if "429" in str(e) or "403" in str(e): # jobspy no expone la respuesta: se mira el mensaje
+            politica.registrar(429 if "429" in str(e) else 403)
+        return None
 
 # --- 2. FILTROS DE LIMPIEZA (PYTHON PURO) ---
 def limpiar_y_deduplicar(todas_las_ofertas):
@@ -67,33 +112,32 @@ def limpiar_y_deduplicar(todas_las_ofertas):
     print(f"   📉 Reducido a {len(ofertas_unicas)} ofertas únicas.")
     return ofertas_unicas
 
+RED_FLAGS_LINKEDIN = [
+    "security clearance", "top secret", "us citizenship required", 
+    "only us citizens", "must reside in the us", "must live in",
+    "gmt-5 only" 
+]
+RE_RED_FLAGS_LINKEDIN = re.compile("|".join(re.escape(f) for f in RED_FLAGS_LINKEDIN))
+
 def pre_filtro_palabras_clave(ofertas):
-    ofertas_limpias = []
-    red_flags = [
-        "security clearance", "top secret", "us citizenship required", 
-        "only us citizens", "must reside in the us", "must live in",
-        "gmt-5 only" 
-    ]
-    
     print("🛡️ Ejecutando Pre-Filtro de palabras prohibidas...")
-    for oferta in ofertas:
-        desc = str(oferta.get('description', '')).lower()
-        
-        if any(flag in desc for flag in red_flags):
-            continue
-            
-        ofertas_limpias.append(oferta)
+    # Predicado genérico de parallel_filter: los workers no necesitan importar jobspy
+    ofertas_limpias = parallel_filter.filtrar(parallel_filter.sin_coincidencias, ofertas,
+                                              (("description",), RE_RED_FLAGS_LINKEDIN), ("description",))
         
     print(f"   ✅ Quedan {len(ofertas_limpias)} candidatas para la IA.")
     return ofertas_limpias
 
 # --- 3. FILTRO DE INTELIGENCIA (GEMINI) ---
-def analizar_viabilidad_oferta(oferta):
+def analizar_viabilidad_oferta(oferta, boilerplate=None):
     descripcion = oferta.get('description', '')
     titulo = oferta.get('title', '')
     
-    if not descripcion or len(descripcion) < 50: 
+    if not descripcion or not isinstance(descripcion, str) or len(descripcion) < 50: 
         return True 
+    
+    # `boilerplate` (de boilerplate_por_empresa) quita el texto institucional repetido
+    descripcion = preparar_descripcion(oferta, VIABILIDAD_MAX_TOKENS, boilerplate)
         
     print(f"   🤖 IA Analizando: {titulo}...")
     
@@ -112,12 +156,12 @@ def analizar_viabilidad_oferta(oferta):
     1. Requiere ciudadanía explícita.
     2. Residencia física obligatoria fuera de Colombia (sin relocation).
     
-    OFERTA:
-    {descripcion[:3000]}
+    OFERTA (extracto):
+    {descripcion}
     """
     
     try:
-        response = model.generate_content(prompt)
+        response = get_client().generar(prompt, LINKEDIN_MODEL_NAME)
         texto = response.text.replace("```json", "").replace("```", "").strip()
         analisis = json.loads(texto)
         
@@ -126,81 +170,128 @@ def analizar_viabilidad_oferta(oferta):
         else:
             print(f"      ⛔ {analisis.get('razon')}")
             return False
-    except:
+    except ErrorLLM as e:
+        # Ante la duda (IA caída o sin cuota) no descartamos la oferta
+        print(f"      ⚠️ IA no disponible para '{titulo}', se conserva: {e}")
         return True
+    except Exception as e:
+        print(f"      ⚠️ Respuesta IA inválida para '{titulo}', se conserva: {e}")
+        return True
+
+# --- 4. ORQUESTADOR PRINCIPAL ---
+def clave_cursor_linkedin(keywords, location, is_remote, job_type):
+    """Cursor por búsqueda: cambiar keywords/ubicación empieza con la ventana completa."""
+    consulta = json.dumps([keywords, location, is_remote, job_type], ensure_ascii=False)
+    return "linkedin:" + hashlib.sha1(consulta.encode('utf-8')).hexdigest()[:12]
 
-# --- 4. FUNCIÓN DE GUARDADO ---
-def sanitizar_datos(data):
+def descargar_ofertas_linkedin(filtros_json, cache_consultas=None):
     """
-    Reemplaza valores NaN/Infinity de floats a None para que sea JSON válido.
+    Cosecha LinkedIn para cada ubicación objetivo del candidato.
+    `hours_old` del perfil es el tope: cada búsqueda pide solo las horas
+    transcurridas desde su última corrida exitosa (cursor).
+    `cache_consultas` (dict) reutiliza resultados de consultas idénticas entre candidatos.
     """
-    if isinstance(data, list):
-        return [sanitizar_datos(item) for item in data]
-    elif isinstance(data, dict):
-        return {k: sanitizar_datos(v) for k, v in data.items()}
-    elif isinstance(data, float):
-        if pd.isna(data): # Chequea NaN de pandas o math
-            return None
-    return data
+    cache_consultas = {} if cache_consultas is None else cache_consultas
+    keywords = filtros_json.get("keywords", "")
+    locations = filtros_json.get("target_locations", ["Remote"])
+    is_remote = filtros_json.get("is_remote", True)
+    job_type = filtros_json.get("job_type", "fulltime")
+    horas_maximas = filtros_json.get("hours_old", 72)
+    cantidad = filtros_json.get("results_count", 30) 
+    
+    todas_las_ofertas_crudas = []
+    
+    for loc in locations:
+        clave = clave_cursor_linkedin(keywords, loc, is_remote, job_type)
+        hours_old = source_cursors.horas_desde_ultima(clave, horas_maximas)
+        consulta = (keywords, loc, is_remote, job_type, hours_old, cantidad)
+        if consulta not in cache_consultas:
+            inicio = time.time() # Lo publicado durante el scrapeo entra en la próxima ventana
+            resultado = ejecutar_busqueda_avanzada(*consulta)
+            if resultado is not None:
+                source_cursors.proponer(clave, {"ultima_corrida": inicio})
+            cache_consultas[consulta] = resultado or []
+        todas_las_ofertas_crudas.extend(cache_consultas[consulta])
 
-def guardar_en_archivo(ofertas):
-    if not ofertas:
-        print("⚠️ No hay ofertas para guardar.")
-        return
+    return todas_las_ofertas_crudas
 
-    # Limpiamos los datos antes de guardar
-    ofertas_limpias = sanitizar_datos(ofertas)
+def descargar_archivadas_linkedin():
+    """
+    Replay: todas las búsquedas de jobspy de la corrida reproducida, sea cual sea
+    su consulta (las keywords/ubicaciones de los filtros actuales pueden ser otras).
+    """
+    registros = []
+    for crudo in response_archive.contenidos(response_archive.PREFIJO_JOBSPY):
+        registros.extend(json.loads(crudo))
+    metrics.incr("ofertas_crudas", len(registros))
+    return registros
 
-    # ⚠️ AJUSTA TU RUTA AQUÍ SI ES NECESARIO
-    ruta_base = "/Users/josemiguelrozobaez/documents/develop/agent-offers/"
-    os.makedirs(ruta_base, exist_ok=True)
-    
-    nombre_archivo = datetime.now().strftime("%d%b%H%M") + ".json"
-    ruta_completa = os.path.join(ruta_base, nombre_archivo)
-    
-    try:
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            json.dump(ofertas_limpias, f, indent=4, ensure_ascii=False)
-        print(f"\n💾 ARCHIVO GUARDADO EXITOSAMENTE:")
-        print(f"   📂 {ruta_completa}")
-    except Exception as e:
-        print(f"❌ Error guardando archivo: {e}")
+def filtrar_ofertas_linkedin(todas_las_ofertas_crudas, filtros_json=None):
+    """
+    Limpieza, deduplicación, pre-filtro de palabras prohibidas y compuerta
+    semántica contra el perfil del CV (todo zero-token).
+    """
+    with metrics.timer("filter"):
+        ofertas_unicas = limpiar_y_deduplicar(todas_las_ofertas_crudas)
+        ofertas_candidatas = pre_filtro_palabras_clave(ofertas_unicas)
+    if filtros_json:
+        ofertas_candidatas = compuerta_semantica(ofertas_candidatas, filtros_json)
+    metrics.incr("ofertas_filtradas", len(ofertas_candidatas))
+    return ofertas_candidatas
+
+def clave_veredicto(oferta):
+    """Huella del contenido evaluado: ofertas sin job_url no comparten veredicto."""
+    campos = ('job_url', 'title', 'company', 'location', 'description')
+    texto = "\n".join(str(oferta.get(campo) or '') for campo in campos)
+    return hashlib.sha1(texto.encode('utf-8', 'replace')).hexdigest()
+
+def filtrar_con_ia(ofertas, veredictos=None):
+    """
+    Pasa por Gemini solo las ofertas en zona gris de la compuerta semántica y
+    devuelve las viables ya sanitizadas (sin NaNs).
+    `veredictos` (dict clave_veredicto -> bool) evita analizar dos veces la misma oferta
+    entre candidatos en modo batch.
+    """
+    veredictos = {} if veredictos is None else veredictos
+    print(f"\n🧠 Iniciando Análisis IA sobre {len(ofertas)} ofertas...")
+    locales = [es_aceptable_sin_ia(oferta) for oferta in ofertas]
+    aceptadas_local = sum(locales)
+
+    # Las ofertas en zona gris se analizan en paralelo (el cliente LLM respeta la cuota)
+    claves = [clave_veredicto(oferta) for oferta in ofertas]
+    pendientes = {}
+    for oferta, local, clave in zip(ofertas, locales, claves):
+        if not local and clave not in veredictos and clave not in pendientes:
+            pendientes[clave] = oferta
+    analizar = partial(analizar_viabilidad_oferta, boilerplate=boilerplate_por_empresa(ofertas))
+    veredictos.update(zip(pendientes, get_client().mapear(analizar, pendientes.values())))
+
+    ofertas_finales = [oferta for oferta, local, clave in zip(ofertas, locales, claves)
+                       if local or veredictos[clave]]
+
+    if aceptadas_local:
+        metrics.incr("llm_evitadas", aceptadas_local)
+        print(f"   ⚡ {aceptadas_local} ofertas aceptadas sin IA (muy cercanas al perfil, sin restricción geográfica).")
+
+    return ofertas_finales # Ya normalizadas al ingresar (normalizar_dataframe): sin NaN
 
-# --- 5. ORQUESTADOR PRINCIPAL ---
 def buscar_ofertas_desde_json(filtros_json):
     print("\n🚀 INICIANDO PROCESO BATCH (SOLO LINKEDIN)")
     
     # IMPORTAR GESTOR DE HISTORIAL
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-    history = JobHistoryManager()
+    from utils import get_history_manager, filtrar_por_ubicacion_estricta
+    history = get_history_manager()
 
-    keywords = filtros_json.get("keywords", "")
-    locations = filtros_json.get("target_locations", ["Remote"])
-    is_remote = filtros_json.get("is_remote", True)
-    job_type = filtros_json.get("job_type", "fulltime")
-    hours_old = filtros_json.get("hours_old", 72) 
-    cantidad = filtros_json.get("results_count", 30) 
-    
-    todas_las_ofertas_crudas = []
-    
     # 1. COSECHA
-    for i, loc in enumerate(locations):
-        resultados = ejecutar_busqueda_avanzada(
-            keywords, loc, is_remote, job_type, hours_old, cantidad
-        )
-        todas_las_ofertas_crudas.extend(resultados)
-        
-        if i < len(locations) - 1:
-            time.sleep(random.uniform(5, 8))
+    todas_las_ofertas_crudas = descargar_ofertas_linkedin(filtros_json)
 
     if not todas_las_ofertas_crudas:
         print("❌ No se encontraron ofertas crudas.")
         return []
 
     # 2. LIMPIEZA & PRE-FILTRO
-    ofertas_unicas = limpiar_y_deduplicar(todas_las_ofertas_crudas)
-    ofertas_candidatas = pre_filtro_palabras_clave(ofertas_unicas)
+    ofertas_candidatas = filtrar_ofertas_linkedin(todas_las_ofertas_crudas, filtros_json)
     
     # --- DEDUPLICACIÓN HISTÓRICA ---
     ofertas_nuevas = history.filter_new_offers(ofertas_candidatas)
@@ -211,25 +302,15 @@ def buscar_ofertas_desde_json(filtros_json):
         return []
 
     # 3. ANÁLISIS IA (Solo sobre las nuevas)
-    print(f"\n🧠 Iniciando Análisis IA sobre {len(ofertas_nuevas)} ofertas...")
-    ofertas_finales = []
-    
-    for oferta in ofertas_nuevas:
-        es_viable = analizar_viabilidad_oferta(oferta)
-        if es_viable:
-            ofertas_finales.append(oferta)
-        time.sleep(2) 
+    ofertas_finales = filtrar_con_ia(ofertas_nuevas)
 
     # 4. GUARDADO FINAL
     print(f"\n🎉 PROCESO TERMINADO: {len(ofertas_finales)} ofertas válidas.")
     
-    # IMPORTANTE: Limpiar NaNs antes de guardar
-    ofertas_limpias = sanitizar_datos(ofertas_finales)
-    
     # Guardamos en el historial global
-    history.save_offers(ofertas_limpias)
+    history.save_offers(ofertas_finales)
     
-    return ofertas_limpias
+    return ofertas_finales
 
 # --- TEST ---
 if __name__ == "__main__":
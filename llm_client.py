@@ -0,0 +1,311 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from collections import deque
+from functools import partial
+
+from dotenv import load_dotenv
+
+import config
+import metrics
+
+# --- CLIENTE LLM COMPARTIDO (GEMINI) ---
+# Todas las llamadas a Gemini del repo pasan por aquí:
+# - Presupuesto por minuto compartido por hilos y corrutinas: LLM_RPM llamadas
+#   y LLM_TPM tokens (estimados antes de la llamada, ajustados con usage_metadata).
+# - Máximo LLM_MAX_CONCURRENCIA llamadas en vuelo.
+# - Reintentos con backoff exponencial + jitter; si el error trae retry-after
+#   (header o "retry in Ns" / retry_delay de Gemini) se respeta y se pausa a
+#   TODOS los llamadores, no solo al que recibió el 429.
+# - Métricas: timer "llm" y contadores llm_llamadas, llm_reintentos, llm_errores,
+#   llm_tokens_entrada, llm_tokens_salida.
+# - Backend intercambiable (usar_backend): cualquier objeto con
+#   generate_content(prompt, **kwargs); BackendFalso sirve para correr offline.
+load_dotenv()
+
+LLM_RPM = config.valor("llm.rpm", 10)
+LLM_TPM = config.valor("llm.tpm", 250_000)
+LLM_MAX_CONCURRENCIA = config.valor("llm.max_concurrency", 4)
+LLM_MAX_REINTENTOS = config.valor("llm.max_retries", 4)
+BACKOFF_BASE = config.valor("llm.backoff_base", 2.0)   # segundos: 2, 4, 8, 16... (+ jitter)
+BACKOFF_MAX = config.valor("llm.backoff_max", 60.0)
+VENTANA = 60.0       # El presupuesto se mide en ventanas deslizantes de un minuto
+
+RE_RETRY_SEGUNDOS = re.compile(r"retry in ([\d.]+)\s*s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+CODIGOS_REINTENTABLES = {408, 429, 500, 502, 503, 504}
+# Respaldo por texto, solo para errores de cuota que llegan sin tipo ni código
+# (ej: envueltos por el SDK en una excepción genérica)
+MARCAS_CUOTA = ("quota", "resource exhausted", "resourceexhausted")
+_tipos_reintentables = None
+
+class ErrorLLM(Exception):
+    """La llamada falló después de agotar los reintentos (o con un error no reintentable)."""
+
+def estimar_tokens(texto):
+    """Aproximación barata (~4 caracteres por token), suficiente para el presupuesto."""
+    return len(texto) // 4 + 1
+
+def _tokens_respuesta(response, prompt):
+    uso = getattr(response, "usage_metadata", None)
+    entrada = getattr(uso, "prompt_token_count", None) or estimar_tokens(prompt)
+    salida = getattr(uso, "candidates_token_count", None)
+    if salida is None:
+        try:
+            salida = estimar_tokens(response.text or "")
+        except Exception:
+            salida = 0
+    return entrada, salida
+
+def retry_after(error):
+    """Segundos sugeridos por el servidor para reintentar (o None)."""
+    segundos = getattr(error, "retry_after", None)
+    if segundos is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        segundos = headers.get("retry-after") or headers.get("Retry-After")
+    if segundos is None:
+        match = RE_RETRY_SEGUNDOS.search(str(error))
+        if match:
+            segundos = match.group(1) or match.group(2)
+    try:
+        return float(segundos) if segundos is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _tipos_error_reintentables():
+    """Excepciones transitorias por tipo; google.api_core y requests se importan recién aquí."""
+    global _tipos_reintentables
+    if _tipos_reintentables is None:
+        tipos = [TimeoutError, ConnectionError]
+        try:
+            from google.api_core import exceptions as google_exceptions
+            tipos += [google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+                      google_exceptions.DeadlineExceeded, google_exceptions.InternalServerError,
+                      google_exceptions.TooManyRequests, google_exceptions.BadGateway,
+                      google_exceptions.GatewayTimeout]
+        except ImportError:
+            pass
+        try:
+            import requests
+            tipos += [requests.Timeout, requests.ConnectionError]
+        except ImportError:
+            pass
+        _tipos_reintentables = tuple(tipos)
+    return _tipos_reintentables
+
+def codigo_http(error):
+    """Status HTTP del error (GoogleAPICallError.code, response.status_code de requests) o None."""
+    for codigo in (getattr(error, "code", None), getattr(error, "status_code", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(codigo, int) and not isinstance(codigo, bool):
+            return codigo
+    return None
+
+def es_reintentable(error):
+    """Por tipo de excepción o status HTTP; el texto solo se mira para errores de cuota."""
+    if isinstance(error, _tipos_error_reintentables()):
+        return True
+    codigo = codigo_http(error)
+    if codigo is not None:
+        return codigo in CODIGOS_REINTENTABLES
+    texto = f"{type(error).__name__} {error}".lower()
+    return any(marca in texto for marca in MARCAS_CUOTA)
+
+class Presupuesto:
+    """Ventana deslizante de llamadas y tokens por minuto + pausa global tras un 429."""
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._llamadas = deque() # (timestamp, tokens)
+        self._tokens = 0
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora):
+        while self._llamadas and ahora - self._llamadas[0][0] >= VENTANA:
+            self._tokens -= self._llamadas.popleft()[1]
+
+    def reservar(self, tokens):
+        """Bloquea hasta que haya cupo para una llamada de `tokens` y la registra."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._purgar(ahora)
+                espera = self._pausa_hasta - ahora
+                if espera <= 0:
+                    cabe_rpm = len(self._llamadas) < self.rpm
+                    cabe_tpm = not self._llamadas or self._tokens + tokens <= self.tpm
+                    if cabe_rpm and cabe_tpm:
+                        self._llamadas.append([ahora, tokens])
+                        self._tokens += tokens
+                        return self._llamadas[-1]
+                    espera = self._llamadas[0][0] + VENTANA - ahora
+            time.sleep(max(espera, 0.01))
+
+    def ajustar(self, reserva, tokens_reales):
+        """Corrige la reserva con los tokens reales (entrada + salida) de la respuesta."""
+        with self._lock:
+            if any(r is reserva for r in self._llamadas): # Por identidad: dos reservas iguales no son la misma
+                self._tokens += tokens_reales - reserva[1]
+                reserva[1] = tokens_reales
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+class BackendFalso:
+    """
+    Backend offline: `responder(prompt) -> str` arma la respuesta (por defecto "{}").
+    `errores` es una lista de excepciones que se lanzan en las primeras llamadas
+    (para probar reintentos) y `latencia` simula el tiempo de la API.
+    """
+
+    class Respuesta:
+        def __init__(self, text):
+            self.text = text
+            self.parts = [text] if text else []
+            self.candidates = []
+            self.prompt_feedback = None
+
+    def __init__(self, responder=None, latencia=0.0, errores=()):
+        self.responder = responder or (lambda prompt: "{}")
+        self.latencia = latencia
+        self.errores = list(errores)
+        self.llamadas = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.llamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.errores:
+            raise self.errores.pop(0)
+        return self.Respuesta(self.responder(prompt))
+
+def _backend_gemini(nombre_modelo):
+    import google.generativeai as genai
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if api_key:
+        genai.configure(api_key=api_key)
+    return genai.GenerativeModel(nombre_modelo)
+
+def _archivar_respuesta(prompt, response):
+    """Con el archivo de respuestas activo, guarda el texto para poder reproducir sin red."""
+    import response_archive
+    if not response_archive.ENABLED:
+        return
+    try:
+        texto = response.text
+    except Exception:
+        return # Respuesta bloqueada / sin texto: no hay nada que reproducir
+    response_archive.archivar(response_archive.clave_llm(prompt), texto or "", encoding="utf-8")
+
+class ClienteLLM:
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_concurrencia=LLM_MAX_CONCURRENCIA,
+                 max_reintentos=LLM_MAX_REINTENTOS, fabrica_backend=_backend_gemini):
+        self.presupuesto = Presupuesto(rpm, tpm)
+        self.max_concurrencia = max_concurrencia
+        self.max_reintentos = max_reintentos
+        self.fabrica_backend = fabrica_backend
+        self.backend_fijo = None
+        self._backends = {}
+        self._lock = threading.Lock()
+        self._en_vuelo = threading.BoundedSemaphore(max_concurrencia)
+        self._executor = None
+
+    def usar_backend(self, backend):
+        """Reemplaza el backend para todos los modelos (None vuelve a Gemini)."""
+        self.backend_fijo = backend
+
+    def _backend(self, modelo):
+        if self.backend_fijo is not None:
+            return self.backend_fijo
+        with self._lock:
+            if modelo not in self._backends:
+                self._backends[modelo] = self.fabrica_backend(modelo)
+            return self._backends[modelo]
+
+    def generar(self, prompt, modelo="gemini-flash-latest", **kwargs):
+        """Llamada bloqueante con presupuesto, límite de concurrencia y reintentos. Lanza ErrorLLM."""
+        backend = self._backend(modelo)
+        for intento in range(self.max_reintentos + 1):
+            reserva = self.presupuesto.reservar(estimar_tokens(prompt))
+            try:
+                with self._en_vuelo:
+                    metrics.incr("llm_llamadas")
+                    with metrics.timer("llm"):
+                        response = backend.generate_content(prompt, **kwargs)
+            except Exception as e:
+                if not es_reintentable(e) or intento == self.max_reintentos:
+                    metrics.incr("llm_errores")
+                    raise ErrorLLM(str(e)) from e
+                espera = retry_after(e)
+                if espera is None:
+                    espera = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento) * random.uniform(0.8, 1.2)
+                else:
+                    self.presupuesto.pausar(espera)
+                metrics.incr("llm_reintentos")
+                print(f"⚠️ LLM: {str(e)[:80]}. Reintentando en {espera:.1f}s... (Intento {intento + 1}/{self.max_reintentos})")
+                time.sleep(espera)
+                continue
+
+            entrada, salida = _tokens_respuesta(response, prompt)
+            self.presupuesto.ajustar(reserva, entrada + salida)
+            metrics.incr("llm_tokens_entrada", entrada)
+            metrics.incr("llm_tokens_salida", salida)
+            _archivar_respuesta(prompt, response)
+            return response
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrencia, thread_name_prefix="llm")
+            return self._executor
+
+    def mapear(self, funcion, items):
+        """
+        Aplica `funcion` (que llama a generar) sobre `items` en paralelo, respetando
+        el presupuesto. Devuelve los resultados en el mismo orden; cada tarea
+        conserva el contexto (fuente actual de métricas) del llamador.
+        """
+        executor = self._get_executor()
+        futuros = [executor.submit(contextvars.copy_context().run, funcion, item) for item in items]
+        return [f.result() for f in futuros]
+
+    def generar_lote(self, prompts, modelo="gemini-flash-latest", **kwargs):
+        """Varias llamadas concurrentes; los fallos vuelven como ErrorLLM en su posición."""
+        def una(prompt):
+            try:
+                return self.generar(prompt, modelo, **kwargs)
+            except ErrorLLM as e:
+                return e
+        return self.mapear(una, prompts)
+
+    async def generar_async(self, prompt, modelo="gemini-flash-latest", **kwargs):
+        loop = asyncio.get_running_loop()
+        tarea = partial(contextvars.copy_context().run, self.generar, prompt, modelo, **kwargs)
+        return await loop.run_in_executor(self._get_executor(), tarea)
+
+    async def generar_lote_async(self, prompts, modelo="gemini-flash-latest", **kwargs):
+        return await asyncio.gather(*(self.generar_async(p, modelo, **kwargs) for p in prompts),
+                                    return_exceptions=True)
+
+_cliente = None
+_lock_cliente = threading.Lock()
+
+def get_client():
+    """Cliente compartido por todo el proceso (un solo presupuesto por API key)."""
+    global _cliente
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = ClienteLLM()
+        return _cliente
+
+def usar_backend(backend):
+    """Atajo para tests/benchmarks: get_client().usar_backend(backend)."""
+    get_client().usar_backend(backend)
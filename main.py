@@ -1,33 +1,40 @@
 import os
 import sys
 import json
+import argparse
+import config
+if __name__ == "__main__":
+    config.cargar_cli() # --config / --set antes de importar los módulos que leen la configuración
 from read_cv import procesar_cv, CV_FILE_PATH
-from linkedin_offers import buscar_ofertas_desde_json
-# INTEGRACIÓN: Importamos el módulo de Hacker News
+# INTEGRACIÓN: Los motores se importan bajo demanda desde el registro de fuentes
 sys.path.append(os.path.dirname(os.path.abspath(__file__))) # Asegurar path
-from importlib import import_module
-hacker_news = import_module("hacker-news")
-buscar_ofertas_hackernews = hacker_news.buscar_ofertas_hackernews
-wwr = import_module("wwr")
-buscar_ofertas_wwr = wwr.buscar_ofertas_wwr
-remote_ok = import_module("remote-ok")
-buscar_ofertas_remoteok = remote_ok.buscar_ofertas_remoteok
-ycombinator = import_module("ycombinator")
-buscar_ofertas_yc = ycombinator.buscar_ofertas_yc
-wellfound = import_module("wellfound")
-buscar_ofertas_wellfound = wellfound.buscar_ofertas_wellfound
+from sources import FUENTES, resolver_fuentes, cargar_fuente, listar_fuentes
+from ranking import IndiceBM25, rankear
+from stack_enrichment import esperar as esperar_enriquecimiento
+import metrics
+import source_health
+import source_cursors
+import response_archive
+import sinks
 
-def main():
+def main(fuentes=None, top_k=None):
     print("🚀 INICIANDO AGENTE DE BÚSQUEDA DE EMPLEO v1.0")
     print("=============================================")
     
+    try:
+        fuentes_activas = resolver_fuentes(fuentes)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
     # 1. Obtener filtros del CV
     print("\n[Paso 1] Analizando CV para definir estrategia...")
     if not os.path.exists(CV_FILE_PATH):
          print(f"❌ Error: No se encuentra el archivo de CV en: {CV_FILE_PATH}")
          return
 
-    filtros = procesar_cv(CV_FILE_PATH)
+    with metrics.fuente("cv"):
+        filtros = procesar_cv(CV_FILE_PATH)
     
     if not filtros:
         print("❌ Falló el análisis del CV. Abortando.")
@@ -35,56 +42,228 @@ def main():
 
     print("\n✅ Filtros generados con éxito:")
     print(json.dumps(filtros, indent=2, ensure_ascii=False))
+    source_cursors.usar_perfil(filtros)
 
-    # 2. Buscar ofertas (SELECCIONAR MOTOR)
-    ofertas = []
-    
-    
-    
-    # --- MOTOR 2: HACKER NEWS ---
-    print("\n[Paso 2b] Buscando ofertas en Hacker News...")
-    ofertas_hn = buscar_ofertas_hackernews(filtros)
-    ofertas.extend(ofertas_hn)
-    
-    # --- MOTOR 3: WE WORK REMOTELY ---
-    print("\n[Paso 2c] Buscando ofertas en We Work Remotely...")
-    ofertas_wwr = buscar_ofertas_wwr(filtros)
-    ofertas.extend(ofertas_wwr)
+    # 2. Buscar ofertas (MOTORES HABILITADOS, en orden de registro)
+    # El índice de ranking se va construyendo a medida que llega cada motor
+    indice = IndiceBM25()
+    print(f"\n🔌 Fuentes habilitadas: {', '.join(fuentes_activas)}")
 
-    # --- MOTOR 4: REMOTE OK ---
-    print("\n[Paso 2d] Buscando ofertas en RemoteOK...")
-    ofertas_rok = buscar_ofertas_remoteok(filtros)
-    ofertas.extend(ofertas_rok)
+    for nombre in fuentes_activas:
+        print(f"\n[Paso 2] Buscando ofertas en {FUENTES[nombre]['etiqueta']}...")
+        with metrics.fuente(nombre), source_health.corrida(nombre) as habilitada:
+            if habilitada: # Breaker abierto: la fuente se salta sin pagar timeouts
+                with source_cursors.corrida(nombre), metrics.timer("total"):
+                    buscar = cargar_fuente(nombre)
+                    nuevas = buscar(filtros)
+                indice.agregar(nuevas)
+                sinks.emitir(nuevas, fuente=nombre) # En vivo: no espera al resto de las fuentes
     
-    # --- MOTOR 5: Y COMBINATOR ---
-    print("\n[Paso 2e] Buscando ofertas en Y Combinator Jobs...")
-    ofertas_yc = buscar_ofertas_yc(filtros)
-    ofertas.extend(ofertas_yc)
-    
-    # --- MOTOR 6: WELLFOUND ---
-    print("\n[Paso 2f] Buscando ofertas en Wellfound...")
-    ofertas_wf = buscar_ofertas_wellfound(filtros)
-    ofertas.extend(ofertas_wf)
+    # 3. Ranking local contra el perfil del CV (mejores primero)
+    with metrics.fuente("ranking"):
+        ofertas = rankear(indice, filtros, top_k)
 
-    # --- MOTOR 1: LINKEDIN (COMENTADO POR AHORA) ---
-    print("\n[Paso 2] Buscando ofertas en LinkedIn...")
-    ofertas_linkedin = buscar_ofertas_desde_json(filtros)
-    ofertas.extend(ofertas_linkedin)
-    
     print("\n\n🎉 RESUMEN FINAL")
     print("=============================================")
-    print(f"Total de ofertas encontradas: {len(ofertas)}")
-    
+    print(f"Total de ofertas encontradas: {len(indice)}")
+    if top_k is not None and len(ofertas) < len(indice):
+        print(f"Mostrando las {len(ofertas)} más relevantes:")
+    imprimir_ofertas(ofertas)
+    return ofertas
+
+def imprimir_ofertas(ofertas):
+    """Muestra las ofertas en consola (formato del resumen final)."""
     for i, oferta in enumerate(ofertas, 1):
         titulo = oferta.get('title', 'Sin título')
         empresa = oferta.get('company', 'Empresa confidencial')
         ubicacion = oferta.get('location', 'Ubicación desconocida')
         url = oferta.get('job_url', '#')
+        score = f" [{oferta['score']}]" if 'score' in oferta else ""
         
-        print(f"\n{i}. {titulo}")
+        print(f"\n{i}. {titulo}{score}")
         print(f"   🏢 {empresa} | 📍 {ubicacion}")
         print(f"   🔗 {url}")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agente de búsqueda de empleo")
+    parser.add_argument("--sources", default=None,
+                        help="Fuentes a usar separadas por coma (ej: hn,wwr). Por defecto: sources.enabled ($AGENT_SOURCES) o todas.")
+    parser.add_argument("--list-sources", action="store_true", help="Lista las fuentes disponibles y sale.")
+    parser.add_argument("--metrics-report", metavar="RUTA",
+                        help="Activa la instrumentación y guarda el reporte JSON de la corrida en RUTA.")
+    parser.add_argument("--metrics-prom", metavar="RUTA",
+                        help="Activa la instrumentación y guarda la exposición en formato Prometheus en RUTA.")
+    parser.add_argument("--batch", metavar="DIRECTORIO",
+                        help="Modo multi-candidato: analiza todos los CVs (.pdf) del directorio y busca para cada uno.")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Modo servicio: consulta cada fuente periódicamente según su intervalo.")
+    parser.add_argument("--interval", action="append", metavar="FUENTE=SEGUNDOS",
+                        help="Intervalo de polling para una fuente en modo daemon (repetible). Ej: --interval hn=600")
+    parser.add_argument("--search", metavar="CONSULTA",
+                        help='Busca en el historial con el índice invertido y sale. Ej: --search "kubernetes latam -senior"')
+    parser.add_argument("--replay", action="store_true",
+                        help="Re-evalúa las corridas archivadas y el historial con los filtros actuales del CV, sin red.")
+    parser.add_argument("--export-parquet", metavar="RUTA",
+                        help="Exporta el historial a Parquet (análisis con pandas/duckdb) y sale.")
+    parser.add_argument("--top", type=int, default=None, metavar="K",
+                        help="Muestra solo las K ofertas más relevantes según el ranking local.")
+    parser.add_argument("--config", metavar="RUTA",
+                        help="Archivo de configuración TOML o JSON (por defecto: $AGENT_CONFIG o ./agent_config.toml si existe).")
+    parser.add_argument("--set", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Pisa un valor de la configuración (repetible). Ej: --set storage.dir=~/ofertas --set hn.workers=8")
+    parser.add_argument("--show-config", action="store_true",
+                        help="Muestra la configuración efectiva (valor y origen de cada clave) y sale.")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignora los cursores 'desde la última corrida' y descarga el listado completo de cada fuente.")
+    parser.add_argument("--archive", action="store_true",
+                        help="Guarda las respuestas crudas de cada motor (comprimidas) para reproducirlas sin red. También: $AGENT_ARCHIVE=1.")
+    parser.add_argument("--from-archive", nargs="?", const="", default=None, metavar="CORRIDA",
+                        help="Corre el pipeline desde una corrida archivada (la última si no se indica), sin red.")
+    parser.add_argument("--list-archive", action="store_true", help="Lista las corridas archivadas y sale.")
+    parser.add_argument("--sink", action="append", metavar="DESTINO",
+                        help="Emite las ofertas nuevas en vivo (repetible): jsonl[:RUTA] (stdout si no hay RUTA), csv:RUTA, "
+                             "sqlite:RUTA o webhook:URL. También: sinks.targets ($AGENT_SINKS separado por comas).")
+    parser.add_argument("--sink-batch", type=int, default=None, metavar="N",
+                        help="Ofertas por escritura en cada sink (por defecto: jsonl 1, csv 50, sqlite 100, webhook 20).")
+    parser.add_argument("--sink-flush", type=float, default=None, metavar="SEGUNDOS",
+                        help="Antigüedad máxima de una oferta en el buffer de un sink antes de escribirse (por defecto 5).")
+    return parser.parse_args(argv)
+
+def preparar_reproduccion(corrida=None):
+    """
+    Modo --from-archive: HTTP, jobspy y Gemini se contestan desde una corrida
+    archivada. Historial, cursores y breakers van a un directorio temporal:
+    cada reproducción parte de cero y da el mismo resultado (regresión de filtros, perf).
+    """
+    import shutil
+    import tempfile
+    import utils
+    import read_cv
+    import stack_enrichment
+    from llm_client import usar_backend
+    response_archive.activar_reproduccion(corrida)
+    response_archive.habilitar(False) # Lo reproducido no se vuelve a archivar
+    usar_backend(response_archive.backend_llm())
+    directorio = tempfile.mkdtemp(prefix="agent_from_archive_")
+    # Las cachés de CV y de stack se copian: lo que en la corrida grabada fue un
+    # acierto de caché (sin llamada a Gemini archivada) lo sigue siendo, y las originales no se tocan
+    for origen in (os.path.join(read_cv.directorio_cache(), read_cv.CV_CACHE_FILE),
+                   os.path.join(read_cv.directorio_cache(), read_cv.PAGES_CACHE_FILE),
+                   stack_enrichment.ruta_cache()):
+        if os.path.exists(origen):
+            shutil.copy2(origen, directorio)
+    # Todo lo que se resuelve desde HISTORY_DIR (historial, índice, cursores,
+    # breakers, cachés) pasa al directorio temporal
+    utils.HISTORY_DIR = directorio
+    read_cv.CACHE_DIR = None
+    stack_enrichment.STACK_CACHE_FILE = None
+    source_cursors.CURSORS_FILE = None
+    source_health.HEALTH_FILE = None
+    source_cursors.ignorar()
+    print(f"   🧪 Historial y estado de esta reproducción en {directorio}")
+
+def mostrar_configuracion():
+    """Importa todos los módulos configurables (los motores que se puedan) e imprime la configuración efectiva."""
+    import importlib
+    for nombre in ("utils", "read_cv", "llm_client", "http_scheduler", "parallel_filter", "semantic",
+                   "stack_enrichment", "source_health", "source_cursors", "response_archive", "sinks", "daemon"):
+        try:
+            importlib.import_module(nombre)
+        except ImportError as e:
+            print(f"⚠️ {nombre}: no se pudo importar ({e}); sus claves no se listan.")
+    for nombre in FUENTES:
+        try:
+            cargar_fuente(nombre)
+        except ImportError as e:
+            print(f"⚠️ {nombre}: no se pudo importar ({e}); sus claves no se listan.")
+    try:
+        resolver_fuentes()
+    except ValueError as e:
+        print(f"⚠️ {e}")
+    print(f"⚙️ Archivo de configuración: {config.archivo() or '(ninguno)'}")
+    efectiva = config.efectiva()
+    ancho = max(map(len, efectiva))
+    for clave, (valor, origen) in efectiva.items():
+        print(f"   {clave.ljust(ancho)} = {json.dumps(valor, ensure_ascii=False)}  [{origen}]")
+
+def exportar_metricas(args):
+    """Escribe los reportes de métricas pedidos por CLI (si los hay)."""
+    if args.metrics_report:
+        metrics.guardar_reporte(args.metrics_report)
+    if args.metrics_prom:
+        metrics.guardar_prometheus(args.metrics_prom)
+
 if __name__ == "__main__":
-    import sys
-    main()
+    args = parse_args()
+    if args.metrics_report or args.metrics_prom:
+        metrics.habilitar()
+    if args.full:
+        source_cursors.ignorar()
+    if args.archive:
+        response_archive.habilitar()
+    try:
+        sinks.configurar(args.sink or sinks.DESTINOS, args.sink_batch, args.sink_flush)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.from_archive is not None:
+        try:
+            preparar_reproduccion(args.from_archive or None)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    if args.show_config:
+        mostrar_configuracion()
+    elif args.list_sources:
+        listar_fuentes()
+    elif args.list_archive:
+        for corrida in response_archive.corridas():
+            print(corrida)
+    elif args.search:
+        from history_index import buscar_en_historial
+        resultados = buscar_en_historial(args.search)
+        print(f"🔎 {len(resultados)} ofertas del historial cumplen: {args.search}")
+        imprimir_ofertas(resultados[:args.top] if args.top is not None else resultados)
+    elif args.export_parquet:
+        from utils import exportar_parquet, ruta_historial
+        try:
+            exportar_parquet(ruta_historial(), args.export_parquet)
+        except ImportError as e:
+            print(f"❌ No se pudo exportar a Parquet (instala pandas y pyarrow): {e}")
+    elif args.replay:
+        from replay import replay
+        filtros = procesar_cv(CV_FILE_PATH) if os.path.exists(CV_FILE_PATH) else None
+        if filtros:
+            ofertas = replay(filtros, top_k=args.top)
+            imprimir_ofertas(ofertas)
+            sinks.emitir(ofertas, fuente="replay")
+        else:
+            print("❌ Sin filtros de CV válidos para el replay.")
+        exportar_metricas(args)
+    elif args.batch:
+        from batch import ejecutar_batch
+        try:
+            resultados = ejecutar_batch(args.batch, args.sources)
+        except ValueError as e:
+            print(f"❌ {e}")
+            resultados = {}
+        for candidato, ofertas in resultados.items():
+            print(f"\n\n🎉 RESUMEN {candidato}: {len(ofertas)} ofertas")
+            print("=============================================")
+            imprimir_ofertas(ofertas[:args.top] if args.top is not None else ofertas)
+        esperar_enriquecimiento()
+        exportar_metricas(args)
+    elif args.daemon:
+        from daemon import ejecutar_daemon, parse_intervalos
+        try:
+            ejecutar_daemon(args.sources, parse_intervalos(args.interval), sink=imprimir_ofertas,
+                            al_terminar_ciclo=lambda: exportar_metricas(args))
+        except ValueError as e:
+            print(f"❌ {e}")
+    else:
+        main(args.sources, args.top)
+        esperar_enriquecimiento()
+        exportar_metricas(args)
+    sinks.cerrar()
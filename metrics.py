@@ -0,0 +1,154 @@
+import json
+import math
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import config
+
+# --- INSTRUMENTACIÓN (TIEMPOS Y CONTADORES POR FUENTE / ETAPA) ---
+# Etapas usadas en el pipeline: fetch, parse, filter, geo, dedupe, llm, persist.
+# Desactivado por defecto: timer() devuelve un context manager vacío compartido
+# e incr() sale en la primera línea, así el costo apagado es despreciable.
+ENABLED = config.valor("metrics.enabled", False)
+
+_fuente_actual = contextvars.ContextVar("fuente_actual", default="global")
+_lock = threading.Lock()
+_tiempos = {}     # (fuente, etapa) -> [segundos, ...]
+_contadores = {}  # (fuente, nombre) -> int
+_secciones = {}   # nombre -> función que devuelve un dict extra para el reporte
+
+class _NoOp:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoOp()
+
+class _Timer:
+    __slots__ = ("clave", "inicio")
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.inicio = 0.0
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracion = time.perf_counter() - self.inicio
+        with _lock:
+            _tiempos.setdefault(self.clave, []).append(duracion)
+        return False
+
+def habilitar(activo=True):
+    """Activa (o desactiva) la recolección de métricas en runtime."""
+    global ENABLED
+    ENABLED = activo
+
+def reiniciar():
+    """Borra todas las mediciones (útil entre ciclos del daemon o benchmarks)."""
+    with _lock:
+        _tiempos.clear()
+        _contadores.clear()
+
+@contextmanager
+def fuente(nombre):
+    """Marca la fuente actual: timers y contadores sin `fuente` explícita se atribuyen a ella."""
+    token = _fuente_actual.set(nombre)
+    try:
+        yield
+    finally:
+        _fuente_actual.reset(token)
+
+def fuente_actual():
+    return _fuente_actual.get()
+
+def registrar_seccion(nombre, funcion):
+    """Agrega al reporte JSON una sección calculada al generarlo (ej: estado de los breakers)."""
+    _secciones[nombre] = funcion
+
+def timer(etapa, fuente=None):
+    """Context manager que mide la duración de una etapa. Ej: `with timer("fetch"): ...`"""
+    if not ENABLED:
+        return _NOOP
+    return _Timer((fuente or _fuente_actual.get(), etapa))
+
+def incr(nombre, n=1, fuente=None):
+    """Suma `n` al contador `nombre` de la fuente actual."""
+    if not ENABLED:
+        return
+    clave = (fuente or _fuente_actual.get(), nombre)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + n
+
+def percentil(valores_ordenados, p):
+    """Percentil por nearest-rank sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+def reporte():
+    """Devuelve el reporte de la corrida como dict serializable a JSON."""
+    with _lock:
+        tiempos = {k: sorted(v) for k, v in _tiempos.items()}
+        contadores = dict(_contadores)
+
+    etapas = []
+    for (nombre_fuente, etapa), valores in sorted(tiempos.items()):
+        etapas.append({
+            "source": nombre_fuente,
+            "stage": etapa,
+            "count": len(valores),
+            "total_s": round(sum(valores), 6),
+            "p50_s": round(percentil(valores, 50), 6),
+            "p95_s": round(percentil(valores, 95), 6),
+            "max_s": round(valores[-1], 6),
+        })
+
+    datos = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": etapas,
+        "counters": [
+            {"source": f, "name": n, "value": v} for (f, n), v in sorted(contadores.items())
+        ],
+    }
+    for nombre, funcion in list(_secciones.items()):
+        datos[nombre] = funcion()
+    return datos
+
+def guardar_reporte(ruta):
+    """Escribe el reporte JSON de la corrida en `ruta`."""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(reporte(), f, indent=2, ensure_ascii=False)
+    print(f"📊 Reporte de métricas guardado: {ruta}")
+
+def exposicion_prometheus():
+    """Reporte en formato de texto de Prometheus (summary por etapa + counters)."""
+    datos = reporte()
+    lineas = [
+        "# HELP agent_stage_seconds Duración de cada etapa del pipeline por fuente.",
+        "# TYPE agent_stage_seconds summary",
+    ]
+    for e in datos["stages"]:
+        etiquetas = f'source="{e["source"]}",stage="{e["stage"]}"'
+        lineas.append(f'agent_stage_seconds{{{etiquetas},quantile="0.5"}} {e["p50_s"]}')
+        lineas.append(f'agent_stage_seconds{{{etiquetas},quantile="0.95"}} {e["p95_s"]}')
+        lineas.append(f'agent_stage_seconds_sum{{{etiquetas}}} {e["total_s"]}')
+        lineas.append(f'agent_stage_seconds_count{{{etiquetas}}} {e["count"]}')
+
+    lineas.append("# HELP agent_events_total Contadores del pipeline por fuente.")
+    lineas.append("# TYPE agent_events_total counter")
+    for c in datos["counters"]:
+        lineas.append(f'agent_events_total{{source="{c["source"]}",name="{c["name"]}"}} {c["value"]}')
+    return "\n".join(lineas) + "\n"
+
+def guardar_prometheus(ruta):
+    """Escribe la exposición Prometheus (para el textfile collector de node_exporter)."""
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(exposicion_prometheus())
@@ -0,0 +1,85 @@
+import os
+import pickle
+import hashlib
+import threading
+import multiprocessing
+import concurrent.futures
+
+import config
+
+# --- FILTRADO EN PARALELO (POOL DE PROCESOS) ---
+# Los filtros de texto (keywords, red flags, geo) son Python puro y CPU-bound:
+# con hilos no escalan por el GIL. Para lotes grandes (replay del historial,
+# pulls grandes de LinkedIn) las ofertas se reparten en shards entre procesos.
+# - El predicado es una función de módulo: predicado(oferta, *args) -> bool.
+#   `args` lleva los matchers ya compilados (regex): viajan una sola vez, en el
+#   initializer de cada worker; los shards solo llevan ofertas. El pool se
+#   reutiliza mientras el predicado y sus matchers no cambien (misma huella:
+#   mismo CV entre candidatos/ciclos); si cambian se levanta uno nuevo.
+# - Los workers arrancan con "forkserver" ("spawn" donde no existe): el proceso
+#   principal ya tiene hilos vivos (HN, LLM, HTTP) y un fork copiaría sus locks.
+# - Solo viajan al worker los `campos` que el predicado lee, y vuelve una
+#   máscara de bools: las ofertas originales nunca se copian de vuelta.
+# - El orden del resultado es el de entrada (executor.map conserva el orden).
+# Con lotes chicos o con FILTRO_PROCESOS=1 corre en el proceso actual.
+FILTRO_PROCESOS = config.valor("filter.processes", 0) or os.cpu_count() or 1 # 0: un proceso por CPU
+MIN_OFERTAS_PARALELO = config.valor("filter.min_parallel", 5000) # Con menos, levantar/alimentar procesos no compensa
+SHARDS_POR_PROCESO = 4      # Shards más chicos = mejor reparto si hay ofertas más largas
+
+_pool = None
+_huella_pool = None
+_lock = threading.Lock()
+_predicado_worker = None # En cada worker: (predicado, args) recibidos en el initializer
+
+def _contexto():
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+def _inicializar_worker(carga):
+    global _predicado_worker
+    _predicado_worker = pickle.loads(carga)
+
+def _get_pool(huella, carga):
+    """Pool cuyos workers ya tienen el predicado `carga` (se reutiliza mientras la huella no cambie)."""
+    global _pool, _huella_pool
+    with _lock:
+        if _pool is not None and _huella_pool != huella:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=FILTRO_PROCESOS, mp_context=_contexto(),
+                                                           initializer=_inicializar_worker, initargs=(carga,))
+            _huella_pool = huella
+        return _pool
+
+def _evaluar_shard(shard):
+    """Worker: evalúa el shard con el predicado y los matchers del initializer."""
+    predicado, args = _predicado_worker
+    return [bool(predicado(oferta, *args)) for oferta in shard]
+
+def mascara(predicado, ofertas, args=(), campos=None):
+    """Lista de bools (uno por oferta, en orden) con el resultado del predicado."""
+    ofertas = list(ofertas)
+    if FILTRO_PROCESOS <= 1 or len(ofertas) < MIN_OFERTAS_PARALELO:
+        return [bool(predicado(oferta, *args)) for oferta in ofertas]
+
+    if campos:
+        ofertas = [{campo: oferta[campo] for campo in campos if campo in oferta} for oferta in ofertas]
+    carga = pickle.dumps((predicado, tuple(args)))
+    huella = hashlib.sha1(carga).hexdigest()
+    tamano = -(-len(ofertas) // (FILTRO_PROCESOS * SHARDS_POR_PROCESO))
+    shards = [ofertas[i:i + tamano] for i in range(0, len(ofertas), tamano)]
+    resultado = []
+    for parcial in _get_pool(huella, carga).map(_evaluar_shard, shards):
+        resultado.extend(parcial)
+    return resultado
+
+def filtrar(predicado, ofertas, args=(), campos=None):
+    """Las ofertas (los mismos objetos) para las que el predicado da True, en orden."""
+    ofertas = list(ofertas)
+    return [oferta for oferta, ok in zip(ofertas, mascara(predicado, ofertas, args, campos)) if ok]
+
+def sin_coincidencias(oferta, campos, patron):
+    """Predicado genérico: ninguno de `campos` (en minúsculas) matchea `patron`."""
+    texto = " ".join(str(oferta.get(campo) or '') for campo in campos).lower()
+    return not patron.search(texto)
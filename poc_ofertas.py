@@ -1,11 +1,14 @@
 from jobspy import scrape_jobs
 import os
+import sys
 import feedparser
-import google.generativeai as genai
 from dotenv import load_dotenv
 from jobspy import scrape_jobs
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from stack_enrichment import extraer_stacks, clave_contenido
+
 # --- PASO 1: CONFIGURACIÓN INICIAL ---
 # Cargamos el token del archivo .env
 load_dotenv()
@@ -15,10 +18,8 @@ if not api_key:
     print("❌ ERROR CRÍTICO: No encontré la GOOGLE_API_KEY en tu archivo .env")
     exit() # Detiene el script aquí si no hay llave
 
-# Configuramos Gemini
+# Gemini se usa a través de la etapa de enriquecimiento (lotes + caché + cliente compartido)
 print("✅ Llave encontrada. Conectando con Gemini...")
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('gemini-flash-latest')
 
 # --- PASO 2: DESCARGAR OFERTAS ---
 RSS_URL = "https://weworkremotely.com/categories/remote-programming-jobs.rss"
@@ -33,33 +34,24 @@ if feed.bozo:
 print(f"✅ Descarga exitosa. Hay {len(feed.entries)} ofertas disponibles.")
 print("--- 🧠 INICIANDO ANÁLISIS CON IA (Solo las primeras 3) ---")
 
-# --- PASO 3: BUCLE DE ANÁLISIS ---
-# Recorremos solo las primeras 3 ofertas para no saturar la pantalla
-for i, oferta in enumerate(feed.entries[:1]):
-    titulo = oferta.title
+# --- PASO 3: ANÁLISIS (un solo prompt por lote, resultados cacheados) ---
+# Analizamos solo las primeras 3 ofertas para no saturar la pantalla
+ofertas = []
+for entrada in feed.entries[:3]:
     # A veces la descripción viene en 'summary' o 'description', tomamos la que haya
-    contenido = oferta.get('summary', '') or oferta.get('description', '')
-
-    print(f"\n🔎 [{i+1}] Analizando oferta: {titulo}")
-    
-    # Preparamos el mensaje para Gemini
-    prompt = f"""
-    Actúa como un reclutador experto. Lee la siguiente oferta de trabajo y extrae SOLO las tecnologías requeridas (Lenguajes, Frameworks, Cloud).
-    Devuelve la respuesta como una lista simple separada por comas. No uses Markdown ni introducciones.
-    
-    OFERTA:
-    Título: {titulo}
-    Descripción: {contenido}
-    """
-
-    try:
-        # Aquí enviamos la data a Google
-        response = model.generate_content(prompt)
-        
+    contenido = entrada.get('summary', '') or entrada.get('description', '')
+    ofertas.append({"title": entrada.title, "description": contenido})
+
+# Aquí enviamos la data a Google (solo lo que no esté en caché)
+stacks = extraer_stacks(ofertas)
+
+for i, oferta in enumerate(ofertas):
+    print(f"\n🔎 [{i+1}] Analizando oferta: {oferta['title']}")
+    stack = stacks.get(clave_contenido(oferta))
+    if stack is None:
+        print("❌ Error con Gemini en esta oferta.")
+    else:
         # Mostramos el resultado
-        print(f"🤖 STACK DETECTADO: {response.text.strip()}")
-        
-    except Exception as e:
-        print(f"❌ Error con Gemini en esta oferta: {e}")
+        print(f"🤖 STACK DETECTADO: {', '.join(stack)}")
 
     print("-" * 50)
\ No newline at end of file
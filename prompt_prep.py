@@ -0,0 +1,121 @@
+import re
+import html
+import hashlib
+
+import metrics
+from llm_client import estimar_tokens
+
+# --- PREPARACIÓN DE PROMPTS (MENOS TOKENS POR LLAMADA) ---
+# Antes de mandar una descripción a Gemini:
+# 1. Se limpia (tags HTML, entidades, espacios/saltos repetidos).
+# 2. Se parte en frases, se eliminan las duplicadas dentro de la oferta y las que
+#    se repiten en otras ofertas de la misma empresa (boilerplate: "About us",
+#    EEO, beneficios...). Las frases de ubicación/elegibilidad nunca se tratan
+#    como boilerplate: son justo lo que Gemini tiene que evaluar.
+# 3. Se conservan solo las frases relevantes, en su orden original: las de
+#    ubicación/elegibilidad, las que piden algo concreto ("3+ years", "required")
+#    y las que están bajo un título de requisitos ("Requirements:", "About you")
+#    hasta el próximo título conocido ("Benefits", "About us"...).
+# 4. Se recorta al presupuesto de tokens del prompt, cortando entre frases.
+# Cada alternativa va entre \b: "residen" no debe matchear "president", ni "office" a "officer".
+SECCIONES = {
+    "ubicacion": r"remote(?:ly)?|remoto|locat(?:ion|ed)|based in|anywhere|worldwide|latam|latin america|"
+                 r"time ?zones?|utc|gmt|est|pst|hybrid|on-?site|office|country|countries|regions?",
+    "elegibilidad": r"visas?|sponsor\w*|citizens?(?:hip)?|authori[sz]ed|eligib\w*|relocat\w*|residen\w*|reside[sd]?|"
+                    r"work permit|right to work|green card|clearance|contractors?|employer of record|eor",
+    "requisitos": r"require(?:d|ments?)|qualifications?|must[- ]haves?|proficien\w*|\d+\+?\s*(?:years|yrs|años)",
+}
+def _con_limites(patron):
+    return f"\\b(?:{patron})\\b"
+
+RE_SECCIONES = re.compile("|".join(_con_limites(p) for p in SECCIONES.values()), re.IGNORECASE)
+RE_CRITICAS = re.compile(f"{_con_limites(SECCIONES['ubicacion'])}|{_con_limites(SECCIONES['elegibilidad'])}", re.IGNORECASE)
+# Títulos de sección (una línea corta, con o sin ":"): abren o cierran el bloque de requisitos
+RE_TITULO_REQUISITOS = re.compile(
+    r"^(?:requirements?|qualifications?|(?:minimum|basic|preferred) qualifications|responsibilities|"
+    r"what you(?:'ll| will)? (?:need|bring|do)|what we(?:'re| are) looking for|about you|you have|"
+    r"must[- ]haves?|nice to haves?|skills(?: and experience)?|experience|requisitos)\b[^.!?]{0,30}$", re.IGNORECASE)
+RE_TITULO_OTRO = re.compile(
+    r"^(?:about (?:us|the (?:company|team|role))|who we are|benefits|perks|what we offer|compensation|"
+    r"salary|how to apply|our (?:culture|values|mission)|equal opportunity|beneficios)\b[^.!?]{0,30}$", re.IGNORECASE)
+
+RE_TAGS = re.compile(r"<[^>]+>")
+RE_ESPACIOS = re.compile(r"[ \t\r\f\v\u00a0]+")
+RE_SALTOS = re.compile(r"\n\s*\n+")
+RE_FRASES = re.compile(r"(?<=[.!?])\s+|\n+")
+
+MIN_CARACTERES_FRASE = 3
+
+def limpiar_texto(texto):
+    """Quita HTML y colapsa espacios; conserva los saltos de línea simples."""
+    texto = html.unescape(RE_TAGS.sub(" ", str(texto or "")))
+    texto = RE_ESPACIOS.sub(" ", texto)
+    return RE_SALTOS.sub("\n", texto).strip()
+
+def frases(texto):
+    return [f.strip(" -*•\t") for f in RE_FRASES.split(texto) if len(f.strip(" -*•\t")) >= MIN_CARACTERES_FRASE]
+
+def _huella(frase):
+    return hashlib.sha1(frase.lower().encode('utf-8')).hexdigest()[:16]
+
+def boilerplate_por_empresa(ofertas):
+    """
+    {empresa: {huellas de frases}} con las frases que aparecen en 2+ ofertas de la
+    misma empresa dentro del lote (texto institucional repetido).
+    """
+    vistas = {}
+    repetidas = {}
+    for oferta in ofertas:
+        empresa = str(oferta.get('company') or '').strip().lower()
+        if not empresa:
+            continue
+        conteo = vistas.setdefault(empresa, {})
+        unicas = {_huella(f) for f in frases(limpiar_texto(oferta.get('description', ''))) if not RE_CRITICAS.search(f)}
+        for huella in unicas:
+            conteo[huella] = conteo.get(huella, 0) + 1
+            if conteo[huella] == 2:
+                repetidas.setdefault(empresa, set()).add(huella)
+    return repetidas
+
+def recortar_a_tokens(texto, max_tokens):
+    """Recorta al presupuesto de tokens sin partir frases (salvo que la primera ya no quepa)."""
+    if estimar_tokens(texto) <= max_tokens:
+        return texto
+    limite = max_tokens * 4
+    corte = texto.rfind("\n", 0, limite)
+    if corte < limite // 2:
+        corte = texto.rfind(". ", 0, limite) + 1
+    return texto[:corte if corte > 0 else limite].rstrip()
+
+def preparar_descripcion(oferta, max_tokens, boilerplate=None):
+    """Descripción compacta para el prompt: limpia, sin boilerplate, solo secciones relevantes."""
+    original = str(oferta.get('description') or '')
+    empresa = str(oferta.get('company') or '').strip().lower()
+    repetidas = (boilerplate or {}).get(empresa, set())
+
+    todas, vistas = [], set()
+    for frase in frases(limpiar_texto(original)):
+        huella = _huella(frase)
+        if huella not in vistas and huella not in repetidas:
+            vistas.add(huella)
+            todas.append(frase)
+    relevantes, en_requisitos = [], False
+    for frase in todas:
+        if RE_TITULO_REQUISITOS.match(frase):
+            en_requisitos = True
+        elif RE_TITULO_OTRO.match(frase):
+            en_requisitos = False
+        if en_requisitos or RE_SECCIONES.search(frase):
+            relevantes.append(frase)
+    relevantes = relevantes or todas
+    texto = recortar_a_tokens("\n".join(relevantes), max_tokens)
+
+    metrics.incr("llm_tokens_recortados", max(0, estimar_tokens(original) - estimar_tokens(texto)))
+    return texto
+
+def preparar_texto_cv(texto_cv, max_tokens):
+    """El CV es relevante completo: solo se limpia (los PDFs traen muchos espacios) y se recorta."""
+    limpio = limpiar_texto(texto_cv)
+    texto = recortar_a_tokens(limpio, max_tokens)
+    metrics.incr("llm_tokens_recortados", max(0, estimar_tokens(str(texto_cv or '')) - estimar_tokens(texto)))
+    return texto
@@ -0,0 +1,129 @@
+import re
+import math
+import heapq
+
+import metrics
+from utils import RE_GEO_GREEN
+
+# --- RANKING LOCAL (BM25, ZERO-TOKEN) ---
+# Ordena la lista final contra los filtros del CV sin llamar a la IA.
+# El índice se construye de forma incremental: cada motor agrega sus ofertas
+# al terminar y el puntaje se calcula recorriendo solo las posting lists de
+# los términos de la consulta (milisegundos para miles de ofertas).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+PESO_ROL = 2.0           # Términos de role_keywords (identidad del puesto)
+PESO_SKILLS = 1.0        # Términos de keyword_list
+BONUS_ROL_TITULO = 3.0   # Un rol completo aparece literal en el título
+BONUS_SENIORITY = 1.0    # El título menciona el seniority inferido del CV
+BONUS_GEO = 1.0          # Remoto y con green flag geográfica (LATAM / Worldwide...)
+
+RE_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+# Palabras que no aportan al ranking (inglés/español más frecuentes en ofertas)
+STOPWORDS = frozenset("""
+a an and are as at be by de del el en es for from in is la las los of on or our
+the to un una we with y you your
+""".split())
+
+SENIORITY = ("intern", "junior", "jr", "mid", "senior", "sr", "lead", "staff", "principal", "head")
+
+def tokenizar(texto):
+    """Minúsculas + tokens alfanuméricos (conserva 'c++', 'c#', 'node.js')."""
+    return [t for t in RE_TOKEN.findall(str(texto or "").lower()) if t not in STOPWORDS]
+
+def texto_oferta(oferta):
+    return f"{oferta.get('title', '')} {oferta.get('location', '')} {oferta.get('description', '')}"
+
+class IndiceBM25:
+    """Índice invertido en memoria (término -> [(doc, tf)]) sobre título + ubicación + descripción."""
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.ofertas = []
+        self.longitudes = []
+        self.postings = {}
+        self.total_tokens = 0
+
+    def agregar(self, ofertas):
+        """Indexa nuevas ofertas; las ya indexadas no se recalculan."""
+        for oferta in ofertas:
+            doc = len(self.ofertas)
+            tokens = tokenizar(texto_oferta(oferta))
+            frecuencias = {}
+            for token in tokens:
+                frecuencias[token] = frecuencias.get(token, 0) + 1
+            for token, tf in frecuencias.items():
+                self.postings.setdefault(token, []).append((doc, tf))
+            self.ofertas.append(oferta)
+            self.longitudes.append(len(tokens))
+            self.total_tokens += len(tokens)
+
+    def __len__(self):
+        return len(self.ofertas)
+
+    def puntuar(self, terminos, peso=1.0, scores=None):
+        """Suma al vector `scores` (uno por doc) el BM25 de `terminos`."""
+        n = len(self.ofertas)
+        if scores is None:
+            scores = [0.0] * n
+        if not n:
+            return scores
+        promedio = self.total_tokens / n or 1.0
+        for termino in set(terminos):
+            posting = self.postings.get(termino)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc, tf in posting:
+                norma = self.k1 * (1 - self.b + self.b * self.longitudes[doc] / promedio)
+                scores[doc] += peso * idf * tf * (self.k1 + 1) / (tf + norma)
+        return scores
+
+def _bonus(oferta, roles, niveles, remoto):
+    titulo = str(oferta.get('title', '')).lower()
+    bonus = 0.0
+    if any(rol in titulo for rol in roles):
+        bonus += BONUS_ROL_TITULO
+    if niveles and niveles.intersection(tokenizar(titulo)):
+        bonus += BONUS_SENIORITY
+    if remoto and RE_GEO_GREEN.search(f"{titulo} {oferta.get('location', '')}"):
+        bonus += BONUS_GEO
+    return bonus
+
+def rankear(indice, filtros_json, top_k=None):
+    """
+    Devuelve las ofertas del índice ordenadas por relevancia (mayor primero),
+    con el puntaje en `score`. Empates conservan el orden de llegada.
+    """
+    with metrics.timer("rank"):
+        roles = [str(r).lower() for r in filtros_json.get('role_keywords', []) if r]
+        skills = [str(k).lower() for k in filtros_json.get('keyword_list', []) if k]
+        niveles = set(tokenizar(filtros_json.get('experience_level', ''))).intersection(SENIORITY)
+        remoto = bool(filtros_json.get('is_remote', True))
+
+        scores = indice.puntuar([t for rol in roles for t in tokenizar(rol)], PESO_ROL)
+        indice.puntuar([t for skill in skills for t in tokenizar(skill)], PESO_SKILLS, scores)
+        for doc, oferta in enumerate(indice.ofertas):
+            scores[doc] += _bonus(oferta, roles, niveles, remoto)
+
+        orden = range(len(scores))
+        if top_k is not None and top_k < len(scores):
+            docs = heapq.nlargest(top_k, orden, key=lambda d: (scores[d], -d))
+        else:
+            docs = sorted(orden, key=lambda d: (-scores[d], d))
+
+    ranking = []
+    for doc in docs:
+        oferta = indice.ofertas[doc]
+        oferta['score'] = round(scores[doc], 3)
+        ranking.append(oferta)
+    return ranking
+
+def rankear_ofertas(ofertas, filtros_json, top_k=None):
+    """Atajo: indexa `ofertas` y las devuelve ordenadas (top_k primero)."""
+    indice = IndiceBM25()
+    indice.agregar(ofertas)
+    return rankear(indice, filtros_json, top_k)
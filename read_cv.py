@@ -1,37 +1,192 @@
 # motor_cv.py
 import os
 import json
-import google.generativeai as genai
-from pypdf import PdfReader
 import time
 import hashlib
+import tempfile
+import threading
+import multiprocessing
+import concurrent.futures
 from dotenv import load_dotenv
 
-# Configuración inicial (Solo carga si se ejecuta este archivo, o se re-configura al importar)
+import config
+import metrics
+import utils
+from llm_client import get_client, ErrorLLM
+from prompt_prep import preparar_texto_cv
+
+# Configuración inicial: Gemini se usa a través del cliente compartido (llm_client),
+# que crea el modelo la primera vez que se llama (importar este módulo no arrastra
+# google.generativeai si hay caché).
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-    # Usamos el modelo rápido y capaz que ya validamos
-    model = genai.GenerativeModel('gemini-flash-latest')
+CV_MODEL_NAME = 'gemini-flash-latest' # El modelo rápido y capaz que ya validamos
+CV_PROMPT_MAX_TOKENS = 2000 # ~8000 caracteres de CV ya limpio
+CV_PROMPT_VERSION = "v2" # Subir al cambiar el prompt de analizar_cv_para_busqueda (invalida la caché)
+
+CV_FILE_PATH = config.ruta("storage.cv_file", os.path.join(utils.HISTORY_DIR, "cv.pdf"))
+
+CACHE_DIR = config.valor("storage.cache_dir", None) # None: HISTORY_DIR (resuelto al usarse)
+CV_CACHE_FILE = "cv_analysis_cache.json"
+CV_CACHE_MAX = config.valor("cache.cv_max", 50) # Entradas (CV x prompt x modelo) en la caché LRU de análisis
+CV_HASH_ALGO = config.valor("cache.cv_hash_algo", "md5") # "md5" (compatible con cachés previas), "blake2b" o "xxh64" (requiere xxhash)
+HASH_CHUNK_SIZE = 1024 * 1024 # Lectura en bloques de 1 MB: PDFs grandes no se cargan enteros en memoria
+PAGES_CACHE_FILE = "cv_pages_cache.json"
+PAGES_CACHE_MAX = config.valor("cache.pages_max", 2000) # Páginas guardadas como máximo (se descartan las más viejas)
+MIN_PAGINAS_PARALELO = config.valor("concurrency.cv_min_parallel_pages", 4) # Con menos páginas, el costo de levantar procesos no compensa
+
+CV_BATCH_WORKERS = config.valor("concurrency.cv_batch_workers", 4)
+
+_pool_paginas = None
+_lock_pool = threading.Lock()
+_lock_cache = threading.Lock() # Serializa los read-modify-write de los archivos de caché
+
+def _get_pool_paginas():
+    """
+    Pool de procesos compartido (se reutiliza entre CVs en corridas batch).
+    Se crea desde los hilos de procesar_cvs: con fork el hijo heredaría locks
+    tomados por otros hilos, así que arranca por forkserver (spawn en Windows).
+    """
+    global _pool_paginas
+    with _lock_pool:
+        if _pool_paginas is None:
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool_paginas = concurrent.futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context(metodo))
+        return _pool_paginas
+
+def directorio_cache():
+    """Directorio de las cachés de CV: storage.cache_dir o HISTORY_DIR (sigue a --from-archive)."""
+    return os.path.expanduser(CACHE_DIR) if CACHE_DIR else utils.HISTORY_DIR
+
+def _huella_objeto(obj, memo, en_curso=frozenset()):
+    """
+    Digest de un objeto PDF con sus referencias resueltas (fuentes, ToUnicode,
+    Form XObjects anidados...). `memo` guarda el de cada objeto indirecto: los
+    recursos compartidos entre páginas se hashean una sola vez por PDF.
+    """
+    from pypdf.generic import IndirectObject, DictionaryObject, ArrayObject, StreamObject
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref not in memo:
+            if ref in en_curso: # Referencia circular
+                return repr(ref).encode()
+            memo[ref] = _huella_objeto(obj.get_object(), memo, en_curso | {ref})
+        return memo[ref]
+    h = hashlib.sha1()
+    if isinstance(obj, DictionaryObject):
+        for clave in sorted(obj):
+            if clave != "/Parent": # Sube al árbol de páginas: no es parte del contenido
+                h.update(clave.encode() + _huella_objeto(obj.raw_get(clave), memo, en_curso))
+        if isinstance(obj, StreamObject):
+            h.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            h.update(b"[" + _huella_objeto(item, memo, en_curso))
+    else:
+        h.update(repr(obj).encode())
+    return h.digest()
 
-CV_FILE_PATH = r"/Users/josemiguelrozobaez/downloads/xime2.pdf"
-# CV_FILE_PATH = r"/Users/josemiguelrozobaez/downloads/cvJose.pdf"
+def _hash_pagina(page, memo):
+    """
+    Hash del content stream de la página y de sus /Resources resueltos: el mismo
+    stream ("/Fm0 Do", o dos CVs de la misma plantilla) con otras fuentes u
+    otros XObjects da otro texto, y por lo tanto otra clave.
+    """
+    contenido = page.get_contents()
+    datos = contenido.get_data() if contenido is not None else b""
+    recursos = page.raw_get("/Resources") if "/Resources" in page else None
+    return hashlib.sha1(datos + _huella_objeto(recursos, memo)).hexdigest()
+
+def _extraer_paginas(ruta_pdf, indices):
+    """Worker: abre el PDF en el proceso hijo y extrae el texto de las páginas pedidas."""
+    from pypdf import PdfReader
+    reader = PdfReader(ruta_pdf)
+    return [(i, reader.pages[i].extract_text() or "") for i in indices]
+
+def _cargar_cache_paginas(ruta_cache):
+    if not os.path.exists(ruta_cache):
+        return {}
+    try:
+        with open(ruta_cache, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _guardar_cache_paginas(ruta_cache, nuevas):
+    # Releemos bajo lock y mezclamos: otro hilo pudo guardar páginas mientras extraíamos
+    with _lock_cache:
+        cache = _cargar_cache_paginas(ruta_cache)
+        for clave, texto in nuevas.items():
+            cache.pop(clave, None) # Re-inserta al final (más reciente)
+            cache[clave] = texto
+        _escribir_cache_paginas(ruta_cache, cache)
 
+def _escribir_cache_paginas(ruta_cache, cache):
+    # dict conserva orden de inserción: recortamos las entradas más antiguas
+    sobrantes = len(cache) - PAGES_CACHE_MAX
+    if sobrantes > 0:
+        for clave in list(cache)[:sobrantes]:
+            del cache[clave]
+    try:
+        _escribir_json_atomico(ruta_cache, cache)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar caché de páginas: {e}")
+
+def _escribir_json_atomico(ruta, data, indent=None):
+    """Escribe en un temporal único del mismo directorio y lo renombra (nunca deja el JSON a medias)."""
+    directorio = os.path.dirname(ruta) or "."
+    os.makedirs(directorio, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=".tmp", dir=directorio)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(temp_file, ruta)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
 
-def extraer_texto_pdf(ruta_pdf):
+def extraer_texto_pdf(ruta_pdf, usar_cache=True):
     """
     Lee un archivo PDF y devuelve todo su contenido como un string de texto plano.
+    Cada página se cachea por el hash de su contenido y recursos: al re-analizar un CV editado
+    solo se extraen las páginas que cambiaron. Las páginas pendientes se reparten en
+    un pool de procesos cuando son suficientes para compensar el arranque.
     """
     if not os.path.exists(ruta_pdf):
         return None
 
     try:
+        from pypdf import PdfReader
         reader = PdfReader(ruta_pdf)
-        texto_completo = ""
-        for page in reader.pages:
-            texto_completo += page.extract_text() + "\n"
-        return texto_completo
+        memo = {}
+        hashes = [_hash_pagina(page, memo) for page in reader.pages]
+
+        ruta_cache = os.path.join(directorio_cache(), PAGES_CACHE_FILE)
+        cache = _cargar_cache_paginas(ruta_cache) if usar_cache else {}
+        textos = [cache.get(h) for h in hashes]
+        pendientes = [i for i, texto in enumerate(textos) if texto is None]
+
+        if pendientes:
+            if len(pendientes) < MIN_PAGINAS_PARALELO:
+                resultados = [(i, reader.pages[i].extract_text() or "") for i in pendientes]
+            else:
+                n_workers = min(len(pendientes), os.cpu_count() or 1)
+                lotes = [pendientes[k::n_workers] for k in range(n_workers)]
+                resultados = []
+                for parcial in _get_pool_paginas().map(_extraer_paginas, [ruta_pdf] * len(lotes), lotes):
+                    resultados.extend(parcial)
+
+            for i, texto in resultados:
+                textos[i] = texto
+
+            if usar_cache:
+                _guardar_cache_paginas(ruta_cache, {hashes[i]: textos[i] for i in pendientes})
+
+        if len(pendientes) < len(hashes):
+            print(f"⚡ Páginas desde caché: {len(hashes) - len(pendientes)}/{len(hashes)}")
+
+        # Un solo join (evita la concatenación cuadrática página por página)
+        return "".join(texto + "\n" for texto in textos)
     except Exception as e:
         print(f"❌ Error leyendo el PDF: {e}")
         return None
@@ -50,7 +205,7 @@ def analizar_cv_para_busqueda(texto_cv):
     Analiza el siguiente CV y define la estrategia de búsqueda más agresiva para conseguir trabajo REMOTO o con Relocation en mercados de moneda fuerte (USD/EUR).
 
     TEXTO DEL CV:
-    {texto_cv[:8000]}
+    {preparar_texto_cv(texto_cv, CV_PROMPT_MAX_TOKENS)}
 
     TAREA:
     Genera un objeto JSON con los filtros óptimos.
@@ -99,11 +254,12 @@ def analizar_cv_para_busqueda(texto_cv):
         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
     ]
 
-    import time
+    # Cuota (429), backoff y presupuesto por minuto los maneja el cliente compartido;
+    # aquí solo se reintenta si la respuesta llega vacía o no es JSON.
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = model.generate_content(prompt, safety_settings=safety_settings)
+            response = get_client().generar(prompt, CV_MODEL_NAME, safety_settings=safety_settings)
             
             # Verificación robusta antes de acceder a .text
             if not response.parts:
@@ -116,27 +272,47 @@ def analizar_cv_para_busqueda(texto_cv):
             # Limpieza de bloques de código markdown si Gemini los pone
             texto_limpio = response.text.replace("```json", "").replace("```", "").strip()
             return json.loads(texto_limpio)
+        except ErrorLLM as e:
+            print(f"❌ Error analizando con IA: {e}")
+            return {}
         except Exception as e:
-            if "429" in str(e):
-                wait_time = (attempt + 1) * 20 # 20s, 40s, 60s
-                print(f"⚠️ Quota excedida (429). Reintentando en {wait_time}s... (Intento {attempt+1}/{max_retries})")
-                time.sleep(wait_time)
-            else:
-                print(f"❌ Error analizando con IA: {e}")
-                # No retornamos {} inmediatamente, intentamos de nuevo si quedan intentos
-                if attempt == max_retries - 1:
-                    return {}
+            print(f"❌ Error analizando con IA: {e}")
+            # No retornamos {} inmediatamente, intentamos de nuevo si quedan intentos
+            if attempt == max_retries - 1:
+                return {}
     
     print("❌ Se agotaron los reintentos. No se pudo analizar el CV.")
     return {}
 
-def calculate_file_hash(filepath):
-    """Calcula el MD5 del archivo para detectar cambios."""
-    hasher = hashlib.md5()
+def _nuevo_hasher(algoritmo):
+    """Devuelve (hasher, algoritmo efectivo); xxh64 cae a blake2b si falta xxhash."""
+    if algoritmo == "xxh64":
+        try:
+            import xxhash
+            return xxhash.xxh64(), algoritmo
+        except ImportError:
+            print("⚠️ xxhash no está instalado, usando blake2b.")
+            algoritmo = "blake2b"
+    return hashlib.new(algoritmo), algoritmo
+
+def calculate_file_hash(filepath, algoritmo=None):
+    """
+    Calcula el hash del archivo para detectar cambios, leyendo en bloques
+    (memoria constante). Con un algoritmo distinto de MD5 el resultado lleva prefijo
+    ("blake2b:...") para no confundirse con claves de caché anteriores.
+    """
+    algoritmo = algoritmo or CV_HASH_ALGO
+    hasher, algoritmo = _nuevo_hasher(algoritmo)
     with open(filepath, 'rb') as f:
-        buf = f.read()
-        hasher.update(buf)
-    return hasher.hexdigest()
+        for bloque in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(bloque)
+    if algoritmo == "md5":
+        return hasher.hexdigest()
+    return f"{algoritmo}:{hasher.hexdigest()}"
+
+def clave_cache_cv(file_hash):
+    """Clave de la caché de análisis: mismo CV, mismo prompt y mismo modelo."""
+    return f"{file_hash}|{CV_PROMPT_VERSION}|{CV_MODEL_NAME}"
 
 def procesar_cv(ruta_cv):
     """
@@ -147,26 +323,23 @@ def procesar_cv(ruta_cv):
         print(f"⚠️ No encontré '{ruta_cv}'.")
         return None
 
-    # --- 1. Lógica de Caché ---
-    cache_dir = "/Users/josemiguelrozobaez/documents/develop/agent-offers"
-    cache_file = os.path.join(cache_dir, "cv_analysis_cache.json")
+    # --- 1. Lógica de Caché (LRU por CV + versión de prompt + modelo) ---
+    cache_file = os.path.join(directorio_cache(), CV_CACHE_FILE)
     
-    current_hash = calculate_file_hash(ruta_cv)
-    filtros_cachados = None
+    clave = clave_cache_cv(calculate_file_hash(ruta_cv))
     
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-                if cache_data.get("file_hash") == current_hash:
-                    print("⚡ CACHÉ DETECTADO: El CV no ha cambiado. Usando filtros guardados.")
-                    return cache_data.get("filters")
-        except Exception as e:
-            print(f"⚠️ Error leyendo caché: {e}")
+    try:
+        filtros_cachados = _consultar_cache_cv(cache_file, clave)
+        if filtros_cachados:
+            print(f"⚡ CACHÉ DETECTADO: El CV no ha cambiado ({os.path.basename(ruta_cv)}). Usando filtros guardados.")
+            return filtros_cachados
+    except Exception as e:
+        print(f"⚠️ Error leyendo caché: {e}")
 
     # --- 2. Análisis Real (Si no hay caché válido) ---
     print(f"📖 Leyendo PDF: {ruta_cv}...")
-    texto = extraer_texto_pdf(ruta_cv)
+    with metrics.timer("parse"):
+        texto = extraer_texto_pdf(ruta_cv)
     
     if not texto:
         print("❌ No se pudo extraer texto del PDF.")
@@ -180,20 +353,64 @@ def procesar_cv(ruta_cv):
     # --- 3. Guardar en Caché ---
     if parametros:
         try:
-            os.makedirs(cache_dir, exist_ok=True)
-            cache_payload = {
-                "file_hash": current_hash,
-                "filters": parametros,
-                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_payload, f, indent=4, ensure_ascii=False)
+            _guardar_en_cache_cv(cache_file, clave, parametros, ruta_cv)
             print(f"💾 Filtros guardados en caché: {cache_file}")
         except Exception as e:
              print(f"⚠️ No se pudo guardar caché: {e}")
              
     return parametros
 
+def _leer_cache_cv(cache_file):
+    """
+    Devuelve {clave: {"filters", "file", "updated_at"}} en orden LRU (más viejo primero).
+    Los formatos anteriores (una sola entrada, o claves solo por hash) son de un
+    prompt viejo: nunca coincidirían con CV_PROMPT_VERSION, así que se descartan.
+    """
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        cache_data = json.load(f)
+    return {k: v for k, v in cache_data.get("entries", {}).items() if "|" in k}
+
+def _consultar_cache_cv(cache_file, clave):
+    """Devuelve los filtros cacheados (o None) y marca la entrada como usada recientemente."""
+    with _lock_cache:
+        entradas = _leer_cache_cv(cache_file)
+        entrada = entradas.get(clave)
+        if not entrada or not entrada.get("filters"):
+            return None
+        if next(reversed(entradas)) != clave: # Solo se reescribe si cambia el orden LRU
+            entradas[clave] = entradas.pop(clave) # Al final = más reciente
+            _escribir_json_atomico(cache_file, {"entries": entradas}, indent=4)
+        return entrada["filters"]
+
+def _guardar_en_cache_cv(cache_file, clave, filtros, ruta_cv):
+    """Agrega/actualiza la entrada sin pisar las de otros CVs; descarta las menos usadas si se excede CV_CACHE_MAX."""
+    with _lock_cache:
+        try:
+            entradas = _leer_cache_cv(cache_file)
+        except Exception:
+            entradas = {}
+        entradas.pop(clave, None)
+        entradas[clave] = {
+            "filters": filtros,
+            "file": os.path.basename(ruta_cv),
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        while len(entradas) > CV_CACHE_MAX:
+            del entradas[next(iter(entradas))]
+        _escribir_json_atomico(cache_file, {"entries": entradas}, indent=4)
+
+def procesar_cvs(rutas_cv, max_workers=CV_BATCH_WORKERS):
+    """
+    Analiza varios CVs en paralelo (modo batch). Las llamadas a Gemini comparten
+    el presupuesto por minuto del cliente LLM. Devuelve {ruta_cv: filtros} (None si falló).
+    """
+    if not rutas_cv:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(rutas_cv, executor.map(procesar_cv, rutas_cv)))
+
 # --- BLOQUE DE PRUEBA (Para correrlo solo) ---
 if __name__ == "__main__":
     print("🧪 MODO PRUEBA: Analizando CV local...")
@@ -1,4 +1,3 @@
-import requests
 import html
 import re
 import os
@@ -6,8 +5,16 @@ import json
 import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils import get_http_session
+import config
+import metrics
+import parallel_filter
+import source_cursors
+
 # --- CONFIGURACIÓN ---
 REMOTEOK_API_URL = "https://remoteok.com/api"
+REMOTEOK_TIMEOUT = config.valor("remoteok.timeout", 15)
 
 def limpiar_html(texto_html):
     """Limpia etiquetas HTML simples."""
@@ -15,92 +22,132 @@ def limpiar_html(texto_html):
     clean = re.compile('<.*?>')
     return re.sub(clean, ' ', texto_html)
 
-def buscar_ofertas_remoteok(filtros_json):
-    """
-    Consume la API oficial de RemoteOK.
-    """
-    print("\n📡 INICIANDO MOTOR REMOTE OK (Vía API)...")
-    
-    # 1. Preparar Keywords (Adapter Pattern)
-    lista_keywords = filtros_json.get("keyword_list", [])
-    if not lista_keywords:
-        # Fallback a limpiar el string si no hay lista
-        keywords_str = filtros_json.get("keywords", "").lower()
-        lista_keywords = [k.strip() for k in keywords_str.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
+# Red Flags específicos
+RED_FLAGS_REMOTEOK = [
+    "us citizen", "u.s. citizen", "citizenship required", 
+    "must reside in usa", "must reside in the us", 
+    "location: united states", "location: us"
+]
+RE_RED_FLAGS_REMOTEOK = re.compile("|".join(re.escape(f) for f in RED_FLAGS_REMOTEOK))
+FLAGS_UBICACION = ["united states", "usa only", "us only", "europe only", "uk only"]
+EXCEPCIONES_UBICACION = ["worldwide", "latam", "anywhere"]
 
-    # Red Flags específicos
-    red_flags = [
-        "us citizen", "u.s. citizen", "citizenship required", 
-        "must reside in usa", "must reside in the us", 
-        "location: united states", "location: us"
-    ]
+def compilar_keywords(lista_keywords):
+    """Keywords del candidato -> (regex sobre título/descripción, set para comparar tags exactos)."""
+    keywords = [k.lower() for k in lista_keywords if k]
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(k) for k in keywords)), set(keywords)
 
-    ofertas_encontradas = []
+def cumple_filtro_remoteok(job, keywords):
+    """Predicado del filtrado (picklable): ubicación, red flags y keywords del candidato."""
+    # 1. Filtro Ubicación (Red Flags en campo location)
+    location_api = (job.get('location') or '').lower()
+    if any(flag in location_api for flag in FLAGS_UBICACION):
+        # Si pide explicitamente US/EU y no dice "worldwide" ni "latam", descartar
+        if not any(ok in location_api for ok in EXCEPCIONES_UBICACION):
+            return False
+
+    # 2. Filtro Red Flags en descripción
+    texto_completo = f"{job.get('title') or ''} {job.get('description') or ''}".lower()
+    if RE_RED_FLAGS_REMOTEOK.search(texto_completo):
+        return False
+
+    # 3. Filtro Keywords (Universal): CUALQUIERA en titulo, descripcion O tags
+    if keywords:
+        re_keywords, set_keywords = keywords
+        if not re_keywords.search(texto_completo):
+            tags = {t.lower() for t in job.get('tags') or []}
+            if not tags & set_keywords:
+                return False # No hizo match con ninguna tecnologia del perfil
+
+    return True
+
+def instante_remoteok(job):
+    """Timestamp de publicación del job (campo epoch; si no viene, la fecha ISO)."""
+    if job.get('epoch'):
+        return int(job['epoch'])
+    try:
+        return datetime.fromisoformat(job['date']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
 
+def descargar_ofertas_remoteok():
+    """
+    Descarga la API completa y devuelve solo los jobs publicados después del
+    cursor de la corrida anterior (sin filtrar), o None si falló.
+    """
     try:
         # RemoteOK a veces pide User-Agent para no bloquear
         headers = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
         print(f"   🔌 Conectando a {REMOTEOK_API_URL}...")
         
-        resp = requests.get(REMOTEOK_API_URL, headers=headers, timeout=15)
+        with metrics.timer("fetch"):
+            resp = get_http_session().get(REMOTEOK_API_URL, headers=headers, timeout=REMOTEOK_TIMEOUT)
         if resp.status_code != 200:
             print(f"      ❌ Error API RemoteOK: Status {resp.status_code}")
-            return []
+            return None
             
-        data = resp.json()
+        with metrics.timer("parse"):
+            data = resp.json()
         print(f"      📥 Descargadas {len(data)} entradas crudas.") # data[0] suele ser legal text, el resto jobs
 
         # La primera entrada suele ser info legal, la ignoramos si no tiene 'title' o 'company'
         jobs_list = [item for item in data if 'title' in item and 'company' in item]
+        metrics.incr("ofertas_crudas", len(jobs_list))
+        return source_cursors.filtrar_nuevos("remoteok", jobs_list, instante_remoteok,
+                                             lambda job: job.get('id') or job.get('url'))
 
-        for job in jobs_list:
-            titulo = job.get('title', '')
-            empresa = job.get('company', '')
-            descripcion = job.get('description', '')
-            job_url = job.get('url', '')
-            tags = job.get('tags', []) # RemoteOK tiene tags, útil
-            location_api = job.get('location', '').lower()
-            
-            # --- FILTRADO (Python Logic) ---
-            
-            # 1. Filtro Ubicación (Red Flags en campo location)
-            if any(flag in location_api for flag in ["united states", "usa only", "us only", "europe only", "uk only"]):
-                # Si pide explicitamente US/EU y no dice "worldwide" ni "latam", descartar
-                if "worldwide" not in location_api and "latam" not in location_api and "anywhere" not in location_api:
-                    continue
-
-            # 2. Filtro Red Flags en descripción
-            texto_completo = (titulo + " " + descripcion).lower()
-            if any(flag in texto_completo for flag in red_flags):
-                continue
-                
-            # 3. Filtro Keywords (Universal)
-            # Verificamos si CUALQUIERA de las keywords está presente
-            match_keyword = False
-            if lista_keywords:
-                # Chequeamos en titulo, descripcion O tags
-                for k in lista_keywords:
-                    k_lower = k.lower()
-                    if k_lower in texto_completo or k_lower in [t.lower() for t in tags]:
-                        match_keyword = True
-                        break
-                
-                if not match_keyword:
-                    continue # No hizo match con ninguna tecnologia del perfil
-            
+    except Exception as e:
+        print(f"      ❌ Error procesando RemoteOK: {e}")
+        return None
+
+def filtrar_ofertas_remoteok(jobs_list, filtros_json):
+    """Aplica los filtros de ubicación, red flags y keywords del candidato."""
+    # 1. Preparar Keywords (Adapter Pattern)
+    lista_keywords = filtros_json.get("keyword_list", [])
+    if not lista_keywords:
+        # Fallback a limpiar el string si no hay lista
+        keywords_str = filtros_json.get("keywords", "").lower()
+        lista_keywords = [k.strip() for k in keywords_str.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
+
+    ofertas_encontradas = []
+
+    with metrics.timer("filter"):
+        # --- FILTRADO (Python Logic, en paralelo si el lote es grande) ---
+        keywords = compilar_keywords(lista_keywords)
+        campos = ("title", "description", "location", "tags")
+        for job in parallel_filter.filtrar(cumple_filtro_remoteok, jobs_list, (keywords,), campos):
             # Si pasa todos los filtros, es candidata
+            location_api = job.get('location', '').lower()
             ofertas_encontradas.append({
-                "title": titulo,
-                "company": empresa,
+                "title": job.get('title', ''),
+                "company": job.get('company', ''),
                 "location": f"Remote ({location_api or 'Worldwide'})",
-                "description": limpiar_html(descripcion),
-                "job_url": job_url,
+                "description": limpiar_html(job.get('description', '')),
+                "job_url": job.get('url', ''),
                 "source": "RemoteOK",
                 "date": job.get('date', datetime.now().isoformat())
             })
 
+    metrics.incr("ofertas_filtradas", len(ofertas_encontradas))
+    return ofertas_encontradas
+
+def buscar_ofertas_remoteok(filtros_json):
+    """
+    Consume la API oficial de RemoteOK.
+    """
+    print("\n📡 INICIANDO MOTOR REMOTE OK (Vía API)...")
+
+    jobs_list = descargar_ofertas_remoteok()
+    if jobs_list is None:
+        return []
+
+    try:
+        ofertas_encontradas = filtrar_ofertas_remoteok(jobs_list, filtros_json)
     except Exception as e:
         print(f"      ❌ Error procesando RemoteOK: {e}")
+        source_cursors.descartar() # Los jobs descargados no se procesaron: no se avanza el cursor
         return []
 
     print(f"   ✅ Se encontraron {len(ofertas_encontradas)} ofertas potenciales en RemoteOK.")
@@ -109,8 +156,8 @@ def buscar_ofertas_remoteok(filtros_json):
     # Usamos el gestor centralizado
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     try:
-        from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-        history = JobHistoryManager()
+        from utils import get_history_manager, filtrar_por_ubicacion_estricta
+        history = get_history_manager()
         
         # NUEVO: Filtro Estricto de Ubicación
         ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_encontradas)
@@ -0,0 +1,145 @@
+import os
+import re
+import glob
+
+import config
+import metrics
+import parallel_filter
+import response_archive
+import source_cursors
+import utils
+from utils import HISTORY_BASENAME, EXTENSIONES_HISTORIAL, filtrar_por_ubicacion_estricta, leer_en_offsets
+from history_index import indice_sincronizado
+from ranking import rankear_ofertas
+from sources import FUENTES, cargar_paso
+
+# --- REPLAY OFFLINE (SIN RED) ---
+# Cuando cambian los filtros del CV, vuelve a pasar por las etapas locales
+# (keywords -> geo -> compuerta semántica -> ranking) todo lo descargado antes:
+# 1. Las descargas crudas del archivo de respuestas (--archive): cada corrida
+#    archivada se reproduce con el paso `descargar` de cada fuente (sin red) y
+#    su paso `filtrar` con los filtros actuales. Así vuelven las ofertas que
+#    ningún perfil anterior aceptó (nunca llegaron al historial).
+# 2. Los historiales (principal + los de cada candidato del modo batch), que
+#    cubren lo guardado sin archivo. El índice invertido reduce las candidatas
+#    antes de aplicar los regex, así que no se recorre cada descripción.
+# No guarda ofertas, no mueve cursores ni breakers y no llama a Gemini: los pasos
+# `enriquecer` (detalles de YC, validación IA de LinkedIn) no se corren.
+ARCHIVO_MAX_CORRIDAS = config.valor("replay.archive_runs", 20) # Corridas archivadas más nuevas a reproducir (0 = todas)
+
+def rutas_historiales(directorio=None):
+    """Historial principal + los de cada candidato, en cualquier formato soportado."""
+    directorio = directorio or utils.HISTORY_DIR
+    extensiones = tuple(EXTENSIONES_HISTORIAL.values()) + (".json",)
+    return sorted(r for r in glob.glob(os.path.join(directorio, HISTORY_BASENAME + "*"))
+                  if r.endswith(extensiones) and not r.endswith((".index.json", ".stacks.ndjson")))
+
+def _compilar(terminos):
+    terminos = [str(t).strip().lower() for t in terminos if str(t).strip()]
+    if not terminos:
+        return None
+    return re.compile("|".join(re.escape(t) for t in terminos))
+
+def _ids_candidatos(indice, roles, skills):
+    """Ofertas con todas las palabras de algún rol y de alguna skill, según el índice."""
+    def union(terminos):
+        ids = set()
+        for termino in terminos:
+            ids |= indice.ids_termino(termino) or set()
+        return ids
+    candidatos = union(roles) if roles else set(indice.offsets)
+    if skills:
+        candidatos &= union(skills)
+    return sorted(candidatos)
+
+def cumple_perfil(oferta, re_roles, re_skills):
+    """Predicado (picklable) de la etapa de keywords."""
+    texto = f"{oferta.get('title', '')} {oferta.get('description', '')}".lower()
+    if re_roles and not re_roles.search(texto):
+        return False
+    return not (re_skills and not re_skills.search(texto))
+
+def filtrar_por_perfil(ofertas, filtros_json):
+    """Etapa de keywords: algún rol Y alguna skill del perfil en título/descripción."""
+    re_roles = _compilar(filtros_json.get('role_keywords', []))
+    re_skills = _compilar(filtros_json.get('keyword_list', []))
+    with metrics.timer("filter"):
+        return parallel_filter.filtrar(cumple_perfil, ofertas, (re_roles, re_skills), ("title", "description"))
+
+def _ofertas_historiales(filtros_json, directorio=None):
+    """Etapas keywords + geo sobre las ofertas de los historiales."""
+    roles = filtros_json.get('role_keywords', [])
+    skills = filtros_json.get('keyword_list', [])
+    candidatas = []
+    for ruta in rutas_historiales(directorio):
+        indice = indice_sincronizado(ruta)
+        candidatas.extend(leer_en_offsets(ruta, _ids_candidatos(indice, roles, skills)))
+    metrics.incr("ofertas_crudas", len(candidatas))
+    return filtrar_por_ubicacion_estricta(filtrar_por_perfil(candidatas, filtros_json))
+
+def _reproducir_corrida(filtros_json):
+    """Etapas keywords + geo (pasos de cada fuente) sobre las crudas de la corrida que se está reproduciendo."""
+    ofertas = []
+    for nombre in FUENTES:
+        if nombre not in response_archive.fuentes_reproducidas():
+            continue
+        fuente = FUENTES[nombre]
+        try:
+            descargar = cargar_paso(nombre, "reproducir" if fuente["descarga_por_filtros"] else "descargar")
+            filtrar = cargar_paso(nombre, "filtrar")
+        except ImportError as e:
+            print(f"   ⚠️ {fuente['etiqueta']}: no se puede reproducir ({e}).")
+            continue
+        if not descargar or not filtrar:
+            continue
+        # Los cursores que proponga la descarga se descartan: el replay no avanza nada
+        with metrics.fuente(nombre), source_cursors.corrida(nombre):
+            crudas = descargar() or []
+            source_cursors.descartar()
+            nuevas = filtrar(crudas, filtros_json)
+            if fuente["filtro_geo"]:
+                nuevas = filtrar_por_ubicacion_estricta(nuevas)
+        print(f"   📼 {fuente['etiqueta']}: {len(crudas)} crudas -> {len(nuevas)} con los filtros actuales.")
+        ofertas.extend(nuevas)
+    return ofertas
+
+def _ofertas_archivadas(filtros_json, corridas=None):
+    if response_archive.reproduciendo(): # --from-archive: solo la corrida que ya se está reproduciendo
+        return _reproducir_corrida(filtros_json)
+    if corridas is None:
+        corridas = response_archive.corridas()[-ARCHIVO_MAX_CORRIDAS:] # [-0:] = todas
+    ofertas = []
+    descarga_completa = source_cursors.ignorar() # Sin cursores: la corrida se reproduce entera
+    try:
+        for corrida in reversed(corridas): # Las más nuevas primero (ganan al deduplicar)
+            response_archive.activar_reproduccion(corrida)
+            ofertas.extend(_reproducir_corrida(filtros_json))
+    finally:
+        response_archive.desactivar_reproduccion()
+        source_cursors.ignorar(descarga_completa)
+    return ofertas
+
+def replay(filtros_json, directorio=None, top_k=None, corridas=None):
+    """
+    Devuelve las ofertas archivadas o guardadas que matchean el perfil actual, ordenadas
+    por relevancia. `corridas`: ids del archivo a reproducir (None = las últimas ARCHIVO_MAX_CORRIDAS).
+    """
+    from semantic import compuerta_semantica
+    print("⏪ Replay offline (archivo de respuestas + historial) con los filtros actuales...")
+
+    with metrics.fuente("replay"):
+        ofertas, vistas = [], set()
+        for oferta in _ofertas_archivadas(filtros_json, corridas) + _ofertas_historiales(filtros_json, directorio):
+            url = oferta.get('job_url')
+            if url:
+                if url in vistas:
+                    continue
+                vistas.add(url)
+            ofertas.append(oferta)
+
+        ofertas = compuerta_semantica(ofertas, filtros_json)
+        metrics.incr("ofertas_filtradas", len(ofertas))
+        ranking = rankear_ofertas(ofertas, filtros_json, top_k)
+
+    print(f"   ⏪ {len(ranking)} ofertas (archivadas o del historial) coinciden con el perfil actual.")
+    return ranking
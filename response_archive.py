@@ -0,0 +1,181 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import deque
+
+import requests
+
+import config
+import metrics
+from utils import HISTORY_DIR
+
+# --- ARCHIVO DE RESPUESTAS CRUDAS (GRABAR / REPRODUCIR SIN RED) ---
+# Con el archivo activo (--archive o AGENT_ARCHIVE=1) cada respuesta que llega
+# a los motores se guarda tal cual: items de HN, XML de WWR, JSON de RemoteOK,
+# HTML de YC/Wellfound (todo pasa por SesionProgramada), los registros de
+# jobspy (LinkedIn) y las respuestas de Gemini.
+# - blobs/ab/abcd....gz: el cuerpo comprimido, direccionado por su sha256
+#   (una respuesta idéntica en otra corrida no ocupa espacio extra).
+# - runs/<corrida>.ndjson: una línea por respuesta {ts, source, method, url,
+#   status, headers, encoding, sha256}: URL + timestamp -> contenido.
+# En modo reproducción (--from-archive [CORRIDA]) las peticiones se responden
+# desde una corrida archivada, en el mismo orden, y nada sale a la red: lo que
+# no está archivado falla como un error de conexión.
+ARCHIVE_DIR = config.ruta("storage.archive_dir", os.path.join(HISTORY_DIR, "raw_archive"))
+ENABLED = config.valor("archive.enabled", False)
+HEADERS_ARCHIVADOS = ("Content-Type", "Retry-After")
+PREFIJO_LLM = "llm://"
+PREFIJO_JOBSPY = "jobspy://"
+
+_lock = threading.Lock()
+_corrida = None       # Id de la corrida que se está grabando
+_reproduccion = None  # (method, url) -> deque de entradas de la corrida reproducida
+
+class SinArchivo(requests.exceptions.ConnectionError):
+    """Modo reproducción: la URL no está en la corrida archivada."""
+
+def habilitar(activo=True):
+    """Activa (o desactiva) la grabación de respuestas crudas."""
+    global ENABLED
+    ENABLED = activo
+
+def reproduciendo():
+    return _reproduccion is not None
+
+def _ruta_blob(sha):
+    return os.path.join(ARCHIVE_DIR, "blobs", sha[:2], sha + ".gz")
+
+def _guardar_blob(sha, contenido):
+    ruta = _ruta_blob(sha)
+    if os.path.exists(ruta):
+        return
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=sha[:8] + ".", suffix=".tmp", dir=directorio)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(gzip.compress(contenido, compresslevel=6))
+    os.replace(temp_file, ruta)
+
+def _leer_blob(sha):
+    with open(_ruta_blob(sha), 'rb') as f:
+        return gzip.decompress(f.read())
+
+def archivar(url, contenido, status=200, headers=None, encoding=None, method="GET"):
+    """Guarda una respuesta cruda (bytes o str) en la corrida actual. No lanza: solo avisa."""
+    global _corrida
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+    sha = hashlib.sha256(contenido).hexdigest()
+    entrada = {
+        "ts": time.time(), "source": metrics.fuente_actual(), "method": method.upper(), "url": url,
+        "status": status, "headers": {k: v for k, v in (headers or {}).items() if k in HEADERS_ARCHIVADOS},
+        "encoding": encoding, "sha256": sha,
+    }
+    try:
+        _guardar_blob(sha, contenido)
+        with _lock:
+            if _corrida is None:
+                _corrida = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+                print(f"🗄️ Archivando respuestas crudas en {ARCHIVE_DIR} (corrida {_corrida}).")
+            ruta = os.path.join(ARCHIVE_DIR, "runs", _corrida + ".ndjson")
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        metrics.incr("archivo_respuestas")
+    except Exception as e:
+        print(f"⚠️ No se pudo archivar la respuesta de {url}: {e}")
+
+def corridas():
+    """Ids de las corridas archivadas, de la más vieja a la más nueva."""
+    directorio = os.path.join(ARCHIVE_DIR, "runs")
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(n[:-len(".ndjson")] for n in os.listdir(directorio) if n.endswith(".ndjson"))
+
+def activar_reproduccion(corrida=None):
+    """Carga una corrida archivada (la última si no se indica) y corta el acceso a la red."""
+    global _reproduccion
+    disponibles = corridas()
+    if not disponibles:
+        raise ValueError(f"No hay corridas archivadas en {ARCHIVE_DIR} (grabar antes con --archive)")
+    corrida = corrida or disponibles[-1]
+    if corrida not in disponibles:
+        raise ValueError(f"Corrida archivada desconocida: {corrida} (disponibles: {', '.join(disponibles[-5:])})")
+
+    entradas = {}
+    with open(os.path.join(ARCHIVE_DIR, "runs", corrida + ".ndjson"), 'r', encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                entrada = json.loads(linea)
+                entradas.setdefault((entrada["method"], entrada["url"]), deque()).append(entrada)
+    with _lock:
+        _reproduccion = entradas
+    print(f"📼 Reproduciendo la corrida archivada {corrida} ({sum(map(len, entradas.values()))} respuestas), sin red.")
+    return corrida
+
+def desactivar_reproduccion():
+    """Vuelve a la red (el replay reproduce corridas y después sigue el daemon)."""
+    global _reproduccion
+    with _lock:
+        _reproduccion = None
+
+def fuentes_reproducidas():
+    """Fuentes que tienen respuestas en la corrida reproducida."""
+    with _lock:
+        return {entrada["source"] for cola in _reproduccion.values() for entrada in cola}
+
+def contenidos(prefijo):
+    """Cuerpos (bytes) de todas las respuestas de la corrida reproducida cuyo URL empieza con `prefijo`."""
+    with _lock:
+        entradas = [entrada for (_, url), cola in _reproduccion.items() if url.startswith(prefijo)
+                    for entrada in cola]
+    return [_leer_blob(entrada["sha256"]) for entrada in entradas]
+
+def _siguiente(url, method):
+    """La próxima respuesta archivada de `url` (la última se repite si se pide más veces)."""
+    with _lock:
+        cola = _reproduccion.get((method.upper(), url))
+        if not cola:
+            return None
+        return cola.popleft() if len(cola) > 1 else cola[0]
+
+def contenido(url, method="GET"):
+    """Cuerpo (bytes) archivado de `url` en la corrida reproducida, o None."""
+    entrada = _siguiente(url, method)
+    if entrada is None:
+        return None
+    metrics.incr("archivo_reproducidas")
+    return _leer_blob(entrada["sha256"])
+
+def reproducir(method, url):
+    """Arma un requests.Response con la respuesta archivada. Lanza SinArchivo si no está."""
+    entrada = _siguiente(url, method)
+    if entrada is None:
+        metrics.incr("archivo_faltantes")
+        raise SinArchivo(f"{url} no está en la corrida archivada")
+    resp = requests.Response()
+    resp.status_code = entrada["status"]
+    resp._content = _leer_blob(entrada["sha256"])
+    resp.headers.update(entrada["headers"])
+    resp.encoding = entrada["encoding"]
+    resp.url = url
+    metrics.incr("archivo_reproducidas")
+    return resp
+
+def clave_llm(prompt):
+    return PREFIJO_LLM + hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+def backend_llm():
+    """Backend de llm_client que contesta con las respuestas de Gemini archivadas (sin red)."""
+    from llm_client import BackendFalso
+
+    def responder(prompt):
+        texto = contenido(clave_llm(prompt))
+        if texto is None:
+            raise SinArchivo("respuesta LLM no archivada para este prompt")
+        return texto.decode('utf-8')
+    return BackendFalso(responder)
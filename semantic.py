@@ -0,0 +1,162 @@
+import os
+import zlib
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+import config
+import metrics
+from ranking import tokenizar
+from utils import ruta_estado, RE_GEO_RED
+
+# --- COMPUERTA SEMÁNTICA LOCAL (CPU, ZERO-TOKEN) ---
+# Cada oferta se representa con sus unigramas + bigramas hasheados a DIMENSIONES
+# (hashing trick, crc32 => estable entre procesos). El perfil del CV son los
+# vectores de cada rol y el de las skills; la similitud (0..1) combina la mejor
+# cobertura de un rol (una oferta es de un solo rol) con la cobertura de skills,
+# calculada para todo el lote con operaciones vectorizadas sobre los índices.
+#   similitud < UMBRAL_DESCARTE            -> se descarta sin llamar a Gemini
+#   similitud >= UMBRAL_ACEPTACION y sin
+#   red flags geográficas en la descripción -> se acepta sin llamar a Gemini
+#   resto (zona gris)                      -> analizar_viabilidad_oferta
+DIMENSIONES = 2 ** 18
+UMBRAL_DESCARTE = config.valor("semantic.discard_threshold", 0.35)
+UMBRAL_ACEPTACION = config.valor("semantic.accept_threshold", 0.5)
+PESO_ROL = 2.0
+PESO_SKILL = 1.0
+
+VECTORS_CACHE_FILE = None # None: <HISTORY_DIR>/semantic_vectors.npz (ver ruta_estado)
+VECTORS_CACHE_MAX = config.valor("cache.vectors_max", 20000) # Ofertas guardadas como máximo (se descartan las más viejas)
+
+_cache = None   # clave de contenido -> np.ndarray de índices (ordenado, sin repetidos)
+_cache_sucio = False
+_lock = threading.Lock()
+
+def _features(tokens):
+    bigramas = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return tokens + bigramas
+
+def _indice(feature):
+    return zlib.crc32(feature.encode('utf-8')) % DIMENSIONES
+
+def vectorizar_texto(texto):
+    """Índices hasheados (únicos, ordenados) de los unigramas y bigramas del texto."""
+    return np.unique(np.fromiter((_indice(f) for f in _features(tokenizar(texto))), dtype=np.int32))
+
+def vectores_perfil(filtros_json):
+    """
+    Perfil del CV: un vector por rol de role_keywords y uno con todas las skills
+    de keyword_list. Cada skill se vectoriza por separado (sin bigramas entre
+    skills vecinas, que ninguna oferta tendría) y se unen los índices.
+    """
+    roles = [vectorizar_texto(rol) for rol in filtros_json.get('role_keywords', []) if rol]
+    skills = np.array([], dtype=np.int32)
+    for skill in filtros_json.get('keyword_list', []):
+        if skill:
+            skills = np.union1d(skills, vectorizar_texto(str(skill)))
+    return [r for r in roles if r.size], skills
+
+def _clave_oferta(oferta):
+    texto = f"{oferta.get('title', '')}\n{oferta.get('description', '')}"
+    return hashlib.sha1(texto.encode('utf-8', 'replace')).hexdigest()
+
+def _cargar_cache(ruta=None):
+    global _cache
+    if _cache is not None:
+        return _cache
+    ruta = ruta or VECTORS_CACHE_FILE or ruta_estado("semantic_vectors.npz")
+    _cache = {}
+    if os.path.exists(ruta):
+        try:
+            with np.load(ruta) as data:
+                indices = np.split(data["indices"], data["cortes"])
+                _cache = dict(zip(data["claves"].tolist(), indices))
+        except Exception as e:
+            print(f"⚠️ No se pudo leer la caché de vectores: {e}")
+    return _cache
+
+def guardar_cache(ruta=None):
+    """Persiste los vectores nuevos (npz: claves + índices concatenados + cortes)."""
+    global _cache_sucio
+    with _lock:
+        if not _cache_sucio:
+            return
+        ruta = ruta or VECTORS_CACHE_FILE or ruta_estado("semantic_vectors.npz")
+        claves = list(_cache)[-VECTORS_CACHE_MAX:]
+        vectores = [_cache[c] for c in claves]
+        cortes = np.cumsum([len(v) for v in vectores])[:-1]
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            fd, temp_file = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(ruta))
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, claves=np.array(claves), cortes=cortes,
+                                    indices=np.concatenate(vectores) if vectores else np.array([], dtype=np.int32))
+            os.replace(temp_file, ruta)
+            _cache_sucio = False
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché de vectores: {e}")
+
+def vectores_ofertas(ofertas):
+    """Índices hasheados de cada oferta, reutilizando la caché persistida."""
+    global _cache_sucio
+    with _lock:
+        cache = _cargar_cache()
+        vectores = []
+        for oferta in ofertas:
+            clave = _clave_oferta(oferta)
+            vector = cache.get(clave)
+            if vector is None:
+                vector = vectorizar_texto(f"{oferta.get('title', '')} {oferta.get('description', '')}")
+                cache[clave] = vector
+                _cache_sucio = True
+            vectores.append(vector)
+    return vectores
+
+def _cobertura(indices, filas, n, vector):
+    """Fracción de `vector` presente en cada oferta (los índices de cada oferta son únicos)."""
+    presentes = np.isin(indices, vector)
+    return np.bincount(filas[presentes], minlength=n) / len(vector)
+
+def similitudes(ofertas, filtros_json):
+    """Similitud (0..1) de cada oferta con el perfil, vectorizada sobre todo el lote."""
+    n = len(ofertas)
+    roles, skills = vectores_perfil(filtros_json)
+    if not n or not (roles or skills.size):
+        return np.ones(n)
+    vectores = vectores_ofertas(ofertas)
+    filas = np.repeat(np.arange(n), [len(v) for v in vectores])
+    indices = np.concatenate(vectores)
+
+    score = np.zeros(n)
+    peso_total = 0.0
+    if roles:
+        score += PESO_ROL * np.max([_cobertura(indices, filas, n, r) for r in roles], axis=0)
+        peso_total += PESO_ROL
+    if skills.size:
+        score += PESO_SKILL * _cobertura(indices, filas, n, skills)
+        peso_total += PESO_SKILL
+    return score / peso_total
+
+def compuerta_semantica(ofertas, filtros_json):
+    """
+    Descarta localmente las ofertas lejanas al perfil y devuelve copias de las demás
+    con su `similitud`, para que el filtro IA decida cuáles escalar a Gemini.
+    """
+    with metrics.timer("semantic"):
+        scores = similitudes(ofertas, filtros_json)
+        guardar_cache()
+
+    resultado = [dict(oferta, similitud=round(float(s), 3))
+                 for oferta, s in zip(ofertas, scores) if s >= UMBRAL_DESCARTE]
+    descartadas = len(ofertas) - len(resultado)
+    metrics.incr("descartadas_semantica", descartadas)
+    print(f"   🧭 Compuerta semántica: {len(ofertas)} -> {len(resultado)} ({descartadas} lejanas al perfil)")
+    return resultado
+
+def es_aceptable_sin_ia(oferta):
+    """Muy cercana al perfil y sin red flags geográficas en la descripción: no hace falta Gemini."""
+    if oferta.get('similitud', 0) < UMBRAL_ACEPTACION:
+        return False
+    return not RE_GEO_RED.search(str(oferta.get('description', '')))
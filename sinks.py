@@ -0,0 +1,294 @@
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import deque
+
+import requests
+
+import config
+import metrics
+from utils import compactar_registro
+
+# --- SINKS DE SALIDA (OFERTAS NUEVAS EN VIVO) ---
+# Las ofertas nuevas se entregan a los sinks apenas termina cada fuente (o cada
+# candidato en modo batch), sin esperar al final de la corrida:
+#   jsonl[:RUTA]     una oferta por línea en un stream propio: RUTA (archivo, FIFO,
+#                    /dev/fd/3) o stdout si no se indica. Los prints de progreso
+#                    siguen en stdout: para un stream limpio, `--sink jsonl:/dev/fd/3 3>&1 1>&2`
+#   csv:RUTA         append a un CSV (encabezado si el archivo es nuevo)
+#   sqlite:RUTA      tabla `offers` (job_url + candidato únicos: re-emitir no duplica)
+#   webhook:URL      POST JSON {"offers": [...]} a un endpoint (local)
+# Cada sink junta las ofertas en un buffer y escribe por lotes: cuando llega a
+# `lote` ofertas o cuando la más vieja lleva `intervalo` segundos esperando.
+# Un hilo de fondo revisa los buffers cada PERIODO_VIGILANCIA (como máximo):
+# lo que venció se escribe aunque no lleguen más ofertas (ej: la última fuente).
+# vaciar() fuerza la escritura (fin de fuente en el daemon, fin de corrida).
+DESTINOS = config.valor("sinks.targets", []) # Sinks activos si la CLI no pide ninguno
+LOTE_POR_DEFECTO = config.valor("sinks.batch_sizes", {"jsonl": 1, "csv": 50, "sqlite": 100, "webhook": 20})
+INTERVALO_POR_DEFECTO = config.valor("sinks.flush", 5.0)
+CAMPOS_CSV = ("found_at", "candidate", "source_key", "source", "title", "company", "location", "date", "job_url", "description")
+WEBHOOK_TIMEOUT = config.valor("sinks.webhook_timeout", 10)
+WEBHOOK_REINTENTOS = config.valor("sinks.webhook_retries", 3)
+PERIODO_VIGILANCIA = 1.0
+
+class Sink:
+    """Buffer con vaciado por tamaño de lote o por antigüedad; las subclases implementan _escribir(lote)."""
+
+    def __init__(self, lote=1, intervalo=INTERVALO_POR_DEFECTO):
+        self.lote = max(1, lote)
+        self.intervalo = intervalo
+        self.escritas = 0
+        self._buffer = []
+        self._desde = None
+        self._cola = deque() # Lotes ya sacados del buffer, esperando escritura
+        self._lock = threading.Lock() # Buffer y cola
+        self._lock_escritura = threading.Lock() # Una escritura a la vez, en orden
+
+    def agregar(self, registros):
+        with self._lock:
+            if not self._buffer:
+                self._desde = time.monotonic()
+            self._buffer.extend(registros)
+            if time.monotonic() - self._desde >= self.intervalo:
+                self._tomar()
+            elif len(self._buffer) >= self.lote:
+                self._tomar(solo_completos=True)
+        self._escribir_pendientes()
+
+    def vaciar(self):
+        with self._lock:
+            self._tomar()
+        self._escribir_pendientes(esperar=True)
+
+    def vaciar_vencidos(self):
+        """Escribe el buffer si la oferta más vieja ya esperó `intervalo` segundos."""
+        with self._lock:
+            if self._buffer and time.monotonic() - self._desde >= self.intervalo:
+                self._tomar()
+        self._escribir_pendientes()
+
+    def _tomar(self, solo_completos=False):
+        """
+        Pasa el buffer a la cola de escritura en lotes de `lote` (se llama con
+        _lock tomado); con `solo_completos` el resto queda esperando.
+        """
+        if not self._buffer:
+            return
+        corte = len(self._buffer) - len(self._buffer) % self.lote if solo_completos else len(self._buffer)
+        pendientes, self._buffer = self._buffer[:corte], self._buffer[corte:]
+        if self._buffer:
+            self._desde = time.monotonic()
+        for i in range(0, len(pendientes), self.lote): # Nunca más de `lote` ofertas por escritura
+            self._cola.append(pendientes[i:i + self.lote])
+
+    def _escribir_pendientes(self, esperar=False):
+        """
+        Escribe la cola fuera de _lock: un webhook lento (timeout + reintentos) no
+        frena a agregar() ni al vigilante. _lock_escritura mantiene el orden de los
+        lotes y quien lo tiene escribe también lo que otros hilos encolan; sin
+        `esperar`, si otro hilo está escribiendo se vuelve enseguida (ese hilo
+        revisa la cola después de soltar el lock). vaciar() espera: al volver,
+        todo lo que tomó ya se escribió.
+        """
+        while esperar or self._cola:
+            if not self._lock_escritura.acquire(blocking=esperar):
+                return
+            try:
+                while True:
+                    with self._lock:
+                        if not self._cola:
+                            break
+                        lote = self._cola.popleft()
+                    self._escribir_lote(lote)
+            finally:
+                self._lock_escritura.release()
+            esperar = False
+
+    def _escribir_lote(self, lote):
+        try:
+            with metrics.timer("sink", fuente=f"sink:{self.nombre}"):
+                self._escribir(lote)
+            self.escritas += len(lote)
+            metrics.incr("sink_ofertas", len(lote), fuente=f"sink:{self.nombre}")
+        except Exception as e:
+            metrics.incr("sink_errores", fuente=f"sink:{self.nombre}")
+            print(f"⚠️ Sink {self.nombre}: no se pudieron escribir {len(lote)} ofertas: {e}")
+
+    def cerrar(self):
+        self.vaciar()
+
+class SinkJSONL(Sink):
+    nombre = "jsonl"
+
+    def __init__(self, ruta=None, **opciones):
+        super().__init__(**opciones)
+        self.ruta = ruta or "-"
+        self._salida = None
+
+    def _stream(self):
+        if self._salida is None:
+            if self.ruta == "-":
+                # Copia del descriptor de stdout: no depende de sys.stdout ni de su buffer
+                self._salida = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+            else:
+                os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+                self._salida = open(self.ruta, 'a', encoding='utf-8')
+        return self._salida
+
+    def _escribir(self, lote):
+        if self.ruta == "-":
+            sys.stdout.flush() # Que un print a medias no quede partido por una oferta
+        salida = self._stream()
+        salida.write("".join(json.dumps(r, ensure_ascii=False, allow_nan=False) + "\n" for r in lote))
+        salida.flush()
+
+    def cerrar(self):
+        super().cerrar()
+        if self._salida is not None:
+            self._salida.close()
+
+class SinkCSV(Sink):
+    nombre = "csv"
+
+    def __init__(self, ruta, **opciones):
+        super().__init__(**opciones)
+        self.ruta = ruta
+
+    def _escribir(self, lote):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        nuevo = not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0
+        with open(self.ruta, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CAMPOS_CSV, extrasaction='ignore')
+            if nuevo:
+                writer.writeheader()
+            writer.writerows(lote)
+
+class SinkSQLite(Sink):
+    nombre = "sqlite"
+
+    def __init__(self, ruta, **opciones):
+        super().__init__(**opciones)
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL") # Lectores en vivo sin bloquear la escritura
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS offers (
+                job_url TEXT, found_at TEXT, candidate TEXT, source_key TEXT, source TEXT,
+                title TEXT, company TEXT, location TEXT, date TEXT, description TEXT, data TEXT,
+                PRIMARY KEY (job_url, candidate))""")
+        self.conexion.commit()
+
+    def _escribir(self, lote):
+        filas = [(r.get("job_url"), r.get("found_at"), r.get("candidate") or "", r.get("source_key"), r.get("source"), r.get("title"),
+                  r.get("company"), r.get("location"), None if r.get("date") is None else str(r.get("date")),
+                  r.get("description"), json.dumps(r, ensure_ascii=False, allow_nan=False))
+                 for r in lote]
+        with self.conexion: # Una transacción por lote
+            self.conexion.executemany("INSERT OR IGNORE INTO offers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", filas)
+
+    def cerrar(self):
+        super().cerrar()
+        self.conexion.close()
+
+class SinkWebhook(Sink):
+    nombre = "webhook"
+
+    def __init__(self, url, **opciones):
+        super().__init__(**opciones)
+        self.url = url
+        self.sesion = requests.Session() # Propia: el webhook no pasa por el programador ni por el archivo
+
+    def _escribir(self, lote):
+        cuerpo = json.dumps({"offers": lote}, ensure_ascii=False, allow_nan=False).encode('utf-8')
+        for intento in range(WEBHOOK_REINTENTOS):
+            try:
+                resp = self.sesion.post(self.url, data=cuerpo, timeout=WEBHOOK_TIMEOUT,
+                                        headers={"Content-Type": "application/json"})
+            except requests.RequestException as e:
+                error = e
+            else:
+                if resp.status_code < 500:
+                    resp.raise_for_status() # 4xx: reintentar no sirve
+                    return
+                error = f"HTTP {resp.status_code}"
+            if intento < WEBHOOK_REINTENTOS - 1:
+                time.sleep(2 ** intento)
+        raise RuntimeError(f"{self.url} no respondió tras {WEBHOOK_REINTENTOS} intentos ({error})")
+
+_sinks = []
+_vigilante = None
+_detener = threading.Event()
+
+def _vigilar():
+    """Hilo de fondo: escribe los buffers vencidos aunque no lleguen ofertas nuevas."""
+    periodo = min([PERIODO_VIGILANCIA] + [max(0.05, s.intervalo / 2) for s in list(_sinks)])
+    while not _detener.wait(periodo):
+        for sink in list(_sinks):
+            sink.vaciar_vencidos()
+
+def crear_sink(especificacion, lote=None, intervalo=None):
+    """'jsonl[:RUTA]' | 'csv:RUTA' | 'sqlite:RUTA' | 'webhook:URL' -> Sink. Lanza ValueError si no se reconoce."""
+    tipo, _, destino = especificacion.partition(":")
+    tipo = tipo.strip().lower()
+    if tipo not in LOTE_POR_DEFECTO:
+        raise ValueError(f"Sink desconocido: '{especificacion}' (disponibles: {', '.join(LOTE_POR_DEFECTO)})")
+    if tipo != "jsonl" and not destino:
+        raise ValueError(f"El sink '{tipo}' necesita destino (ej: {tipo}:{'http://localhost:8080/ofertas' if tipo == 'webhook' else 'ofertas.' + tipo})")
+    opciones = {"lote": LOTE_POR_DEFECTO[tipo] if lote is None else lote,
+                "intervalo": INTERVALO_POR_DEFECTO if intervalo is None else intervalo}
+    clases = {"jsonl": SinkJSONL, "csv": SinkCSV, "sqlite": SinkSQLite, "webhook": SinkWebhook}
+    return clases[tipo](destino, **opciones)
+
+def configurar(especificaciones, lote=None, intervalo=None):
+    """
+    Activa los sinks pedidos (lista o string separado por comas) y el hilo que
+    escribe los buffers vencidos.
+    """
+    global _vigilante
+    if isinstance(especificaciones, str):
+        especificaciones = [e for e in especificaciones.split(",") if e.strip()]
+    nuevos = [crear_sink(e.strip(), lote, intervalo) for e in especificaciones or []]
+    _sinks.extend(nuevos)
+    if nuevos and _vigilante is None:
+        _detener.clear()
+        _vigilante = threading.Thread(target=_vigilar, name="sinks", daemon=True)
+        _vigilante.start()
+    return nuevos
+
+def activos():
+    return bool(_sinks)
+
+def emitir(ofertas, fuente=None, candidato=None):
+    """
+    Entrega ofertas nuevas a todos los sinks activos. Cada registro es la oferta
+    más found_at, source_key (nombre de la fuente en el registro) y candidate (modo batch),
+    normalizada con compactar_registro: los sinks serializan con allow_nan=False
+    (un NaN nativo no llega al default() de ningún encoder).
+    """
+    if not _sinks or not ofertas:
+        return
+    hallada = time.strftime("%Y-%m-%dT%H:%M:%S")
+    extra = {"found_at": hallada, "candidate": candidato} if candidato else {"found_at": hallada}
+    if fuente:
+        extra["source_key"] = fuente
+    registros = [compactar_registro(dict(oferta, **extra)) for oferta in ofertas]
+    for sink in _sinks:
+        sink.agregar(registros)
+
+def vaciar():
+    for sink in _sinks:
+        sink.vaciar()
+
+def cerrar():
+    """Escribe lo pendiente y cierra los sinks (fin de la corrida)."""
+    global _vigilante
+    if _vigilante is not None:
+        _detener.set()
+        _vigilante.join()
+        _vigilante = None
+    while _sinks:
+        _sinks.pop(0).cerrar()
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import config
+import metrics
+from utils import ruta_estado, bloqueo_archivo
+
+# --- CURSORES INCREMENTALES ("DESDE LA ÚLTIMA CORRIDA") POR FUENTE ---
+# Cada fuente recuerda lo más nuevo que ya procesó y en la siguiente corrida
+# solo descarga/parsea lo posterior:
+# - remoteok / wwr:<categoría>: fecha de publicación (timestamp) + los ids vistos
+#   justo en ese instante (frontera), para no perder ofertas del mismo segundo.
+# - yc: item id de HN más alto del listado (los ids son crecientes).
+# - hn: hilo del mes + comment id más alto ya descargado.
+# - linkedin:<consulta>: hora de la última búsqueda exitosa (define hours_old).
+# Los motores proponen el cursor nuevo con proponer(); se guarda recién cuando
+# la corrida de la fuente termina bien (corrida()), así un fallo a mitad de
+# camino no salta ofertas; tampoco si el historial no se pudo escribir
+# (save_offers llama a descartar()). Fuera de una corrida se guarda al instante.
+# Los cursores van por perfil (huella de los filtros): si el CV cambia se
+# empieza de cero, porque lo que el perfil anterior descartó nunca llegó al
+# historial. El modo batch (varios candidatos) usa la huella del conjunto.
+CURSORS_FILE = None # None: <HISTORY_DIR>/source_cursors.json (ver ruta_estado)
+PERFILES_MAX = config.valor("cache.cursor_profiles_max", 8) # Perfiles recordados (los usados hace más tiempo se olvidan)
+SIN_PERFIL = "default"
+
+_lock = threading.Lock()
+_cursores = None      # clave -> valor (dict) del perfil actual
+_perfil = SIN_PERFIL  # huella de los filtros de la corrida
+_pendientes = {}      # fuente -> {clave: valor} propuestos en la corrida en curso
+_ignorar = False
+
+def _ruta():
+    return CURSORS_FILE or ruta_estado("source_cursors.json")
+
+def _leer_archivo():
+    ruta = _ruta()
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f).get("profiles", {})
+    except Exception as e:
+        print(f"⚠️ Cursores de fuentes ilegibles, se reinician: {e}")
+        return {}
+
+def _cargar():
+    global _cursores
+    if _cursores is None:
+        _cursores = _leer_archivo().get(_perfil, {}).get("cursors", {})
+
+def _persistir(cambios):
+    """Mezcla `cambios` con lo que haya en disco (otro proceso pudo avanzar otras fuentes) y guarda."""
+    global _cursores
+    ruta = _ruta()
+    directorio = os.path.dirname(ruta) or "."
+    try:
+        with bloqueo_archivo(ruta):
+            perfiles = _leer_archivo()
+            cursores = perfiles.get(_perfil, {}).get("cursors", {})
+            cursores.update(cambios)
+            perfiles[_perfil] = {"updated": time.time(), "cursors": cursores}
+            recientes = sorted(perfiles.items(), key=lambda p: p[1].get("updated", 0))[-PERFILES_MAX:]
+            fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=".tmp", dir=directorio)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"profiles": dict(recientes)}, f, ensure_ascii=False)
+            os.replace(temp_file, ruta)
+        _cursores = cursores
+    except Exception as e:
+        print(f"⚠️ No se pudieron guardar los cursores de fuentes: {e}")
+
+def ignorar(activo=True):
+    """
+    Modo descarga completa (--full): se leen todos los items pero los cursores se siguen actualizando.
+    Devuelve el modo anterior (para restaurarlo).
+    """
+    global _ignorar
+    anterior, _ignorar = _ignorar, activo
+    return anterior
+
+def usar_perfil(filtros):
+    """Selecciona los cursores de estos filtros (perfil del CV o dict de candidatos)."""
+    global _perfil, _cursores
+    huella = hashlib.sha1(json.dumps(filtros, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    with _lock:
+        if huella == _perfil:
+            return
+        _perfil, _cursores = huella, None
+        _cargar()
+        if not _cursores:
+            print("🔁 Perfil sin cursores previos: descarga completa de cada fuente.")
+
+def leer(clave):
+    """Cursor guardado para `clave` (dict) o None si no hay / si se pidió descarga completa."""
+    with _lock:
+        _cargar()
+        if _ignorar:
+            return None
+        return _cursores.get(clave)
+
+def proponer(clave, valor):
+    """Cursor nuevo para `clave`: se guarda cuando termina bien la corrida de la fuente actual."""
+    with _lock:
+        pendientes = _pendientes.get(metrics.fuente_actual())
+        if pendientes is not None:
+            pendientes[clave] = valor
+            return
+        _cargar()
+        _persistir({clave: valor})
+
+def descartar():
+    """Olvida los cursores propuestos en la corrida actual (el motor o el guardado fallaron después de descargar)."""
+    with _lock:
+        pendientes = _pendientes.get(metrics.fuente_actual())
+        if pendientes:
+            pendientes.clear()
+
+@contextmanager
+def corrida(fuente):
+    """Junta los cursores que propone la fuente y los guarda solo si la corrida no lanzó excepción."""
+    with _lock:
+        _pendientes[fuente] = {}
+    try:
+        yield
+    except BaseException:
+        with _lock:
+            _pendientes.pop(fuente, None)
+        raise
+    with _lock:
+        cambios = _pendientes.pop(fuente, None)
+        if cambios:
+            _cargar()
+            _persistir(cambios)
+
+def filtrar_nuevos(clave, items, instante, identidad, avanzar=True):
+    """
+    Deja los items posteriores al cursor de `clave` (en el orden original) y
+    propone el cursor nuevo: el instante más reciente visto más las identidades
+    en ese mismo instante. `instante(item)` devuelve un número (timestamp o id
+    creciente) o None: los items sin instante pasan siempre (el historial los deduplica).
+    Con `avanzar=False` (descarga incompleta) solo filtra: el cursor no se mueve.
+    """
+    cursor = leer(clave)
+    hasta = cursor["hasta"] if cursor else None
+    frontera = set(cursor.get("frontera", ())) if cursor else set()
+
+    nuevos, maximo, en_maximo = [], hasta, set(frontera)
+    for item in items:
+        momento = instante(item)
+        if momento is None:
+            nuevos.append(item)
+            continue
+        if hasta is not None and (momento < hasta or (momento == hasta and identidad(item) in frontera)):
+            continue
+        nuevos.append(item)
+        if maximo is None or momento > maximo:
+            maximo, en_maximo = momento, set()
+        if momento == maximo:
+            en_maximo.add(identidad(item))
+
+    omitidos = len(items) - len(nuevos)
+    if omitidos:
+        metrics.incr("cursor_omitidas", omitidos)
+        print(f"      ⏩ {omitidos} entradas ya procesadas en corridas anteriores (cursor {clave}).")
+    if avanzar and maximo is not None and (maximo != hasta or en_maximo != frontera):
+        proponer(clave, {"hasta": maximo, "frontera": sorted(en_maximo, key=str)})
+    return nuevos
+
+def horas_desde_ultima(clave, horas_maximas, holgura=1):
+    """
+    Ventana (en horas, entera) desde la última corrida exitosa de `clave`, con
+    `holgura` extra y sin pasar de `horas_maximas`. Sin cursor: `horas_maximas`.
+    """
+    cursor = leer(clave)
+    if not cursor:
+        return horas_maximas
+    transcurridas = (time.time() - cursor["ultima_corrida"]) / 3600
+    return max(1, min(horas_maximas, int(transcurridas) + 1 + holgura))
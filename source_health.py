@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import config
+import metrics
+from utils import ruta_estado
+
+# --- SALUD DE LAS FUENTES (CIRCUIT BREAKER + CACHÉ NEGATIVA DE URLs) ---
+# Cada corrida de una fuente termina "fallida" si ninguna de sus peticiones HTTP
+# salió bien (todas fueron errores de red o status >= 400). Con
+# FALLOS_PARA_ABRIR corridas fallidas seguidas el breaker se ABRE y la fuente se
+# salta durante ENFRIAMIENTO segundos; después queda SEMIABIERTO: una corrida de
+# prueba la vuelve a CERRAR (si sale bien) o la reabre con el doble de
+# enfriamiento (hasta ENFRIAMIENTO_MAXIMO).
+# Las URLs que fallan quedan en una caché negativa por NEGATIVE_TTL segundos:
+# pedirlas de nuevo falla al instante, sin pagar otro timeout.
+# El estado se guarda en HEALTH_FILE: sobrevive entre corridas (cron, daemon).
+FALLOS_PARA_ABRIR = config.valor("health.failures_to_open", 3)
+ENFRIAMIENTO = config.valor("health.cooldown", 30 * 60)
+ENFRIAMIENTO_MAXIMO = config.valor("health.cooldown_max", 6 * 60 * 60)
+NEGATIVE_TTL = config.valor("cache.negative_ttl", 10 * 60)
+NEGATIVE_MAX = config.valor("cache.negative_max", 5000)
+HEALTH_FILE = None # None: <HISTORY_DIR>/source_health.json (ver ruta_estado)
+
+CERRADO, ABIERTO, SEMIABIERTO = "closed", "open", "half_open"
+
+_lock = threading.Lock()
+_estado = None      # fuente -> {"estado", "fallos_seguidos", "abierto_hasta", "enfriamiento", "ultimo_error"}
+_negativas = None   # url -> {"hasta": timestamp, "error": str}
+_corridas = {}      # fuente -> {"ok": n, "fallos": n, "error": str} de la corrida en curso
+
+def _ruta():
+    return HEALTH_FILE or ruta_estado("source_health.json")
+
+def _cargar():
+    global _estado, _negativas
+    if _estado is None:
+        _estado, _negativas = {}, {}
+        ruta = _ruta()
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                _estado = data.get("sources", {})
+                ahora = time.time()
+                _negativas = {u: n for u, n in data.get("negative_cache", {}).items() if n["hasta"] > ahora}
+            except Exception as e:
+                print(f"⚠️ Estado de salud de fuentes ilegible, se reinicia: {e}")
+
+def _guardar():
+    ahora = time.time()
+    vigentes = sorted(((u, n) for u, n in _negativas.items() if n["hasta"] > ahora), key=lambda x: x[1]["hasta"])
+    data = {"sources": _estado, "negative_cache": dict(vigentes[-NEGATIVE_MAX:])}
+    ruta = _ruta()
+    directorio = os.path.dirname(ruta) or "."
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=".tmp", dir=directorio)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_file, ruta)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el estado de salud de fuentes: {e}")
+
+def _breaker(fuente):
+    return _estado.setdefault(fuente, {"estado": CERRADO, "fallos_seguidos": 0, "abierto_hasta": 0,
+                                       "enfriamiento": ENFRIAMIENTO, "ultimo_error": None})
+
+def permitir(fuente):
+    """False si el breaker de la fuente está abierto y el enfriamiento no terminó."""
+    with _lock:
+        _cargar()
+        breaker = _breaker(fuente)
+        if breaker["estado"] == ABIERTO:
+            if time.time() < breaker["abierto_hasta"]:
+                return False
+            breaker["estado"] = SEMIABIERTO
+    return True
+
+@contextmanager
+def corrida(fuente):
+    """
+    Envuelve la consulta de una fuente: si el breaker está abierto no la corre
+    (yield False); al terminar evalúa el resultado y actualiza el breaker.
+    """
+    if not permitir(fuente):
+        with _lock:
+            breaker = dict(_breaker(fuente))
+        minutos = max(0, int((breaker["abierto_hasta"] - time.time()) // 60))
+        print(f"   ⛔ {fuente}: circuito abierto ({breaker['ultimo_error']}); se salta ~{minutos} min más.")
+        metrics.incr("breaker_saltos", fuente=fuente)
+        yield False
+        return
+    with _lock:
+        _corridas[fuente] = {"ok": 0, "fallos": 0, "error": None}
+    try:
+        yield True
+    finally:
+        _cerrar_corrida(fuente)
+
+def _cerrar_corrida(fuente):
+    with _lock:
+        resultado = _corridas.pop(fuente, None)
+        breaker = _breaker(fuente)
+        fallida = resultado is not None and resultado["fallos"] > 0 and resultado["ok"] == 0
+        if not fallida:
+            breaker.update(estado=CERRADO, fallos_seguidos=0, enfriamiento=ENFRIAMIENTO)
+        else:
+            breaker["fallos_seguidos"] += 1
+            breaker["ultimo_error"] = resultado["error"]
+            if breaker["estado"] == SEMIABIERTO or breaker["fallos_seguidos"] >= FALLOS_PARA_ABRIR:
+                if breaker["estado"] == SEMIABIERTO:
+                    breaker["enfriamiento"] = min(ENFRIAMIENTO_MAXIMO, breaker["enfriamiento"] * 2)
+                breaker["estado"] = ABIERTO
+                breaker["abierto_hasta"] = time.time() + breaker["enfriamiento"]
+                print(f"   ⛔ {fuente}: {breaker['fallos_seguidos']} corridas fallidas seguidas, "
+                      f"circuito abierto por {breaker['enfriamiento'] // 60} min.")
+        _guardar()
+
+def _fuente(fuente):
+    return fuente or metrics.fuente_actual()
+
+def registrar_exito(fuente=None):
+    with _lock:
+        corrida_actual = _corridas.get(_fuente(fuente))
+        if corrida_actual is not None:
+            corrida_actual["ok"] += 1
+
+def registrar_fallo(error, url=None, fuente=None):
+    """Cuenta un fallo de la corrida en curso y (si hay URL) la agrega a la caché negativa."""
+    with _lock:
+        _cargar()
+        corrida_actual = _corridas.get(_fuente(fuente))
+        if corrida_actual is not None:
+            corrida_actual["fallos"] += 1
+            corrida_actual["error"] = str(error)[:120]
+        if url:
+            _negativas[url] = {"hasta": time.time() + NEGATIVE_TTL, "error": str(error)[:120]}
+
+def fallo_reciente(url):
+    """El error cacheado de `url` si falló hace menos de NEGATIVE_TTL segundos (o None)."""
+    with _lock:
+        _cargar()
+        negativa = _negativas.get(url)
+        if negativa is None:
+            return None
+        if negativa["hasta"] <= time.time():
+            del _negativas[url]
+            return None
+        return negativa["error"]
+
+def estado():
+    """Estado de los breakers y tamaño de la caché negativa, para el reporte de la corrida."""
+    with _lock:
+        _cargar()
+        ahora = time.time()
+        fuentes = {}
+        for fuente, breaker in _estado.items():
+            fuentes[fuente] = {
+                "state": breaker["estado"],
+                "consecutive_failures": breaker["fallos_seguidos"],
+                "open_until": (time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(breaker["abierto_hasta"]))
+                               if breaker["estado"] == ABIERTO else None),
+                "last_error": breaker["ultimo_error"],
+            }
+        return {"sources": fuentes, "negative_cache_urls": sum(1 for n in _negativas.values() if n["hasta"] > ahora)}
+
+metrics.registrar_seccion("circuit_breakers", estado)
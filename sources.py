@@ -0,0 +1,111 @@
+import os
+import sys
+from importlib import import_module
+
+import config
+
+# --- REGISTRO DE FUENTES (MOTORES) ---
+# Cada motor declara su módulo, la función de búsqueda, sus capacidades y las
+# dependencias pesadas que arrastra. El módulo solo se importa si la fuente
+# está habilitada para la corrida (lazy import): una corrida "solo HN" no paga
+# el costo de cargar jobspy, pandas, feedparser ni google.generativeai.
+sys.path.append(os.path.dirname(os.path.abspath(__file__))) # Los módulos con guion se importan por nombre
+
+FUENTES = {}
+_modulos_cargados = {}
+
+def registrar_fuente(nombre, modulo, funcion, etiqueta, capacidades=(), dependencias=(),
+                     descargar=None, filtrar=None, enriquecer=None, reproducir=None,
+                     descarga_por_filtros=False, filtro_geo=True):
+    """
+    Agrega (o reemplaza) una fuente en el registro. El orden de registro es el orden de ejecución.
+
+    `descargar`, `filtrar` y `enriquecer` son los pasos sueltos que usa el modo batch
+    para descargar una sola vez y repartir las ofertas crudas entre candidatos:
+    - descargar() -> crudas  (o descargar(filtros, cache) si `descarga_por_filtros`)
+    - filtrar(crudas, filtros) -> ofertas estandarizadas
+    - enriquecer(ofertas_nuevas, cache) -> ofertas (opcional; ej: detalles, validación IA)
+    El replay reproduce las corridas archivadas con descargar(); si la descarga depende
+    de los filtros, `reproducir`() devuelve todas las crudas archivadas de la corrida.
+    """
+    FUENTES[nombre] = {
+        "nombre": nombre,
+        "modulo": modulo,
+        "funcion": funcion,
+        "etiqueta": etiqueta,
+        "capacidades": list(capacidades),
+        "dependencias": list(dependencias),
+        "descargar": descargar,
+        "filtrar": filtrar,
+        "enriquecer": enriquecer,
+        "reproducir": reproducir,
+        "descarga_por_filtros": descarga_por_filtros,
+        "filtro_geo": filtro_geo,
+    }
+
+registrar_fuente("hn", "hacker-news", "buscar_ofertas_hackernews", "Hacker News",
+                 capacidades=["api", "texto_libre", "batch"], dependencias=["requests"],
+                 descargar="descargar_ofertas_hackernews", filtrar="filtrar_ofertas_hackernews")
+registrar_fuente("wwr", "wwr", "buscar_ofertas_wwr", "We Work Remotely",
+                 capacidades=["rss", "batch"], dependencias=["feedparser", "requests"],
+                 descargar="descargar_ofertas_wwr", filtrar="filtrar_ofertas_wwr")
+registrar_fuente("remoteok", "remote-ok", "buscar_ofertas_remoteok", "RemoteOK",
+                 capacidades=["api", "batch"], dependencias=["requests"],
+                 descargar="descargar_ofertas_remoteok", filtrar="filtrar_ofertas_remoteok")
+registrar_fuente("yc", "ycombinator", "buscar_ofertas_yc", "Y Combinator Jobs",
+                 capacidades=["html", "paginacion", "batch"], dependencias=["requests"],
+                 descargar="descargar_listado_yc", filtrar="filtrar_ofertas_yc",
+                 enriquecer="completar_detalles_yc")
+registrar_fuente("wellfound", "wellfound", "buscar_ofertas_wellfound", "Wellfound",
+                 capacidades=["html", "batch"], dependencias=["requests"],
+                 descargar="descargar_ofertas_wellfound", filtrar="filtrar_ofertas_wellfound")
+registrar_fuente("linkedin", "linkedin_offers", "buscar_ofertas_desde_json", "LinkedIn",
+                 capacidades=["scraper", "llm", "batch"], dependencias=["jobspy", "pandas", "google.generativeai"],
+                 descargar="descargar_ofertas_linkedin", filtrar="filtrar_ofertas_linkedin",
+                 enriquecer="filtrar_con_ia", reproducir="descargar_archivadas_linkedin",
+                 descarga_por_filtros=True, filtro_geo=False)
+
+def resolver_fuentes(seleccion=None):
+    """
+    Devuelve la lista de nombres de fuentes habilitadas, en orden de registro.
+    `seleccion` puede ser una lista o un string separado por comas ("hn,wwr").
+    None usa sources.enabled de la configuración ($AGENT_SOURCES); "all" habilita todas. Lanza ValueError si se pide una fuente desconocida.
+    """
+    if seleccion is None:
+        seleccion = config.valor("sources.enabled", "all")
+    if isinstance(seleccion, str):
+        seleccion = [s.strip().lower() for s in seleccion.split(",") if s.strip()]
+
+    if not seleccion or "all" in seleccion:
+        return list(FUENTES)
+
+    desconocidas = [s for s in seleccion if s not in FUENTES]
+    if desconocidas:
+        raise ValueError(f"Fuentes desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(FUENTES)})")
+
+    return [nombre for nombre in FUENTES if nombre in seleccion]
+
+def _cargar_modulo(nombre):
+    fuente = FUENTES[nombre]
+    modulo = _modulos_cargados.get(fuente["modulo"])
+    if modulo is None:
+        modulo = import_module(fuente["modulo"])
+        _modulos_cargados[fuente["modulo"]] = modulo
+    return modulo
+
+def cargar_fuente(nombre):
+    """Importa (una sola vez) el módulo del motor y devuelve su función de búsqueda."""
+    return getattr(_cargar_modulo(nombre), FUENTES[nombre]["funcion"])
+
+def cargar_paso(nombre, paso):
+    """Devuelve la función de un paso suelto ('descargar', 'filtrar', 'enriquecer', 'reproducir') o None."""
+    nombre_funcion = FUENTES[nombre].get(paso)
+    if not nombre_funcion:
+        return None
+    return getattr(_cargar_modulo(nombre), nombre_funcion)
+
+def listar_fuentes():
+    """Imprime las fuentes registradas con sus capacidades y dependencias."""
+    for fuente in FUENTES.values():
+        print(f"- {fuente['nombre']:<10} {fuente['etiqueta']:<20} "
+              f"capacidades: {', '.join(fuente['capacidades'])} | deps: {', '.join(fuente['dependencias'])}")
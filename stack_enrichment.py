@@ -0,0 +1,166 @@
+import os
+import json
+import queue
+import tempfile
+import threading
+
+import config
+import metrics
+from utils import ruta_estado, clave_contenido
+from llm_client import get_client, ErrorLLM
+from prompt_prep import limpiar_texto, recortar_a_tokens
+
+# --- ENRIQUECIMIENTO DE STACK (IA, EN SEGUNDO PLANO) ---
+# Versión "de producción" de poc_ofertas.py: después de guardar ofertas nuevas
+# (de cualquier motor) se encolan aquí. Un hilo de fondo:
+# 1. Busca cada oferta en la caché por hash de contenido (título + descripción).
+# 2. Agrupa las que faltan en lotes de STACK_LOTE ofertas por prompt.
+# 3. Manda los lotes en paralelo por el cliente LLM compartido (cuota/reintentos).
+# 4. Agrega el `stack` (lista de tecnologías) al archivo lateral del historial
+#    (append-only, ver utils.ruta_stacks) y lo indexa ("stack:python").
+# El descubrimiento nunca espera: main/batch llaman a esperar() solo al terminar.
+# Apagado por defecto: cada oferta guardada cuesta llamadas a Gemini (stack.enabled).
+HABILITADO = config.valor("stack.enabled", False)
+STACK_MODEL_NAME = 'gemini-flash-latest'
+STACK_LOTE = config.valor("llm.stack_batch", 10)               # Ofertas por prompt
+STACK_MAX_TOKENS_OFERTA = 300 # Extracto de cada descripción dentro del prompt
+STACK_CACHE_FILE = None # None: <HISTORY_DIR>/stack_cache.json (ver ruta_estado)
+STACK_CACHE_MAX = config.valor("cache.stack_max", 20000)
+
+_cola = queue.Queue()
+_hilo = None
+_lock = threading.Lock()
+_cache = None
+
+def ruta_cache():
+    return STACK_CACHE_FILE or ruta_estado("stack_cache.json")
+
+def _cargar_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(ruta_cache()):
+            try:
+                with open(ruta_cache(), 'r', encoding='utf-8') as f:
+                    _cache = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Caché de stack ilegible, se reinicia: {e}")
+    return _cache
+
+def _guardar_cache():
+    cache = _cargar_cache()
+    claves = list(cache)[-STACK_CACHE_MAX:]
+    ruta = ruta_cache()
+    directorio = os.path.dirname(ruta)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({c: cache[c] for c in claves}, f, ensure_ascii=False)
+        os.replace(temp_file, ruta)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la caché de stack: {e}")
+
+def _prompt_lote(ofertas):
+    bloques = []
+    for i, oferta in enumerate(ofertas, 1):
+        descripcion = recortar_a_tokens(limpiar_texto(oferta.get('description', '')), STACK_MAX_TOKENS_OFERTA)
+        bloques.append(f"[{i}] Título: {oferta.get('title', '')}\n{descripcion}")
+    separador = "\n\n"
+    return f"""
+    Actúa como un reclutador experto. Para CADA oferta numerada extrae SOLO las tecnologías requeridas (Lenguajes, Frameworks, Cloud, Bases de datos).
+    Devuelve SOLO un JSON: {{"1": ["Python", "AWS"], "2": [], ...}} con una entrada por oferta.
+
+    OFERTAS:
+    {separador.join(bloques)}
+    """
+
+def _parsear_lote(texto, n):
+    """{"1": [...]} -> lista de n stacks (None si la oferta no vino en la respuesta)."""
+    try:
+        data = json.loads(texto.replace("```json", "").replace("```", "").strip())
+    except (json.JSONDecodeError, AttributeError):
+        return [None] * n
+    if isinstance(data, list): # Algunos modelos devuelven una lista simple para un lote de 1
+        data = {"1": data}
+    stacks = []
+    for i in range(1, n + 1):
+        valor = data.get(str(i)) if isinstance(data, dict) else None
+        stacks.append([str(t).strip() for t in valor if str(t).strip()] if isinstance(valor, list) else None)
+    return stacks
+
+def _extraer_lote(ofertas):
+    try:
+        response = get_client().generar(_prompt_lote(ofertas), STACK_MODEL_NAME)
+        return _parsear_lote(response.text, len(ofertas))
+    except ErrorLLM as e:
+        print(f"⚠️ Stack: lote de {len(ofertas)} ofertas sin analizar ({e})")
+        return [None] * len(ofertas)
+
+def extraer_stacks(ofertas):
+    """
+    Devuelve {clave_contenido: [tecnologías]} para las ofertas, usando la caché y
+    mandando a la IA solo las que faltan (agrupadas en lotes).
+    """
+    with _lock:
+        cache = _cargar_cache()
+        pendientes = {}
+        for oferta in ofertas:
+            clave = clave_contenido(oferta)
+            if clave not in cache:
+                pendientes.setdefault(clave, oferta)
+
+    if pendientes:
+        claves = list(pendientes)
+        lotes = [claves[i:i + STACK_LOTE] for i in range(0, len(claves), STACK_LOTE)]
+        with metrics.fuente("stack"):
+            resultados = get_client().mapear(lambda lote: _extraer_lote([pendientes[c] for c in lote]), lotes)
+        with _lock:
+            for lote, stacks in zip(lotes, resultados):
+                for clave, stack in zip(lote, stacks):
+                    if stack is not None:
+                        cache[clave] = stack
+            _guardar_cache()
+        metrics.incr("stack_extraidos", sum(s is not None for r in resultados for s in r), fuente="stack")
+
+    return {clave: cache[clave] for clave in map(clave_contenido, ofertas) if clave in cache}
+
+def enriquecer_historial(manager, ofertas, docs):
+    """Extrae el stack de `ofertas` (ids `docs` en el índice) y lo guarda junto al historial de `manager`."""
+    stacks = extraer_stacks(ofertas)
+    registros = []
+    for doc, oferta in zip(docs, ofertas):
+        clave = clave_contenido(oferta)
+        if clave in stacks:
+            registros.append({"doc": doc, "key": clave, "stack": stacks[clave]})
+    if not registros:
+        return
+    manager.save_stacks(registros) # También actualiza el índice
+    print(f"🧩 Stack agregado a {len(registros)} ofertas del historial.")
+
+def _trabajar():
+    while True:
+        manager, ofertas, docs = _cola.get()
+        try:
+            enriquecer_historial(manager, ofertas, docs)
+        except Exception as e:
+            print(f"❌ Error enriqueciendo stack: {e}")
+        finally:
+            _cola.task_done()
+
+def encolar(manager, ofertas, docs):
+    """Programa el enriquecimiento de ofertas recién guardadas (no bloquea)."""
+    global _hilo
+    if not HABILITADO or not ofertas:
+        return
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_trabajar, name="stack-enrichment", daemon=True)
+            _hilo.start()
+    _cola.put((manager, list(ofertas), list(docs)))
+
+def esperar():
+    """Bloquea hasta vaciar la cola (al final de una corrida única; el daemon no lo necesita)."""
+    if _hilo is not None and _cola.unfinished_tasks:
+        print("🧩 Terminando enriquecimiento de stack en segundo plano...")
+        _cola.join()
@@ -1,117 +1,504 @@
+import contextlib
+import gzip
+import hashlib
+import io
 import json
+import math
 import os
 import re
+import tempfile
+import threading
 from datetime import datetime, date
 
+try:
+    import fcntl # Locks entre procesos del historial (Unix)
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+import config
+import metrics
+
+# Por defecto bajo XDG_DATA_HOME (~/.local/share/agent-offers); storage.dir / $AGENT_STORAGE_DIR lo cambia
+HISTORY_DIR = config.ruta("storage.dir", os.path.join(os.getenv("XDG_DATA_HOME") or "~/.local/share", "agent-offers"))
+
+# --- FORMATO DEL HISTORIAL ---
+# NDJSON compacto: una oferta por línea, sin indentación y sin campos nulos
+# (los registros de LinkedIn traen decenas de columnas de jobspy en None/NaN).
+# Guardar ofertas nuevas es un append real (no se reescribe el archivo).
+# Con compresión, cada append es un bloque gzip/zstd nuevo (ambos formatos
+# admiten bloques concatenados). El formato viejo (.json con una lista e
+# indent=4) se sigue leyendo y se migra solo la primera vez.
+HISTORY_BASENAME = config.valor("storage.history_basename", "offers_history")
+HISTORY_COMPRESSION = config.valor("storage.history_compression", None) # None, "gzip" o "zstd" (requiere el paquete zstandard)
+EXTENSIONES_HISTORIAL = {None: ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+
 # --- FILTROS DE UBICACIÓN STRICTOS (ZERO-TOKEN) ---
+# PATRONES DE EXCLUSIÓN (RED FLAGS)
+# Si aparecen estos, es probable que no sirvan
+PATRONES_RED = [
+    r"\bUS only\b", r"\bUSA only\b", r"\bUnited States only\b",
+    r"\bNorth America only\b", r"\bEurope only\b", r"\bUK only\b",
+    r"\bCanada only\b", r"\bEU only\b", r"\bUS citizen\b",
+    r"\bcitizenship\b", r"\bmust reside in\b", r"\bmust be located in\b",
+    r"\bU\.S\.\b", r"\bUnited States\b" # Cuidado con este, puede ser la empresa
+]
+
+# PATRONES DE SALVACIÓN (GREEN FLAGS)
+# Si aparecen estos, ignoramos los Red Flags (ej: "US Company hiring Worldwide")
+PATRONES_GREEN = [
+    r"\bLATAM\b", r"\bLatin America\b", r"\bSouth America\b",
+    r"\bWorldwide\b", r"\bGlobal\b", r"\bAnywhere\b",
+    r"\bRemote\s?Worker\b", r"\bRemote\s?Global\b"
+]
+
+# Compilados una sola vez (una alternancia por grupo) y reutilizados en cada llamada
+RE_GEO_RED = re.compile("|".join(PATRONES_RED), re.IGNORECASE)
+RE_GEO_GREEN = re.compile("|".join(PATRONES_GREEN), re.IGNORECASE)
+
 def filtrar_por_ubicacion_estricta(ofertas):
     """
     Filtra ofertas que requieren residencia física específica (USA, EU, UK)
     a menos que mencionen explícitamente LATAM/Worldwide.
     """
     print("🌍 Validando restricciones geográficas estrictas...")
-    
-    # PATRONES DE EXCLUSIÓN (RED FLAGS)
-    # Si aparecen estos, es probable que no sirvan
-    patrones_red = [
-        r"\bUS only\b", r"\bUSA only\b", r"\bUnited States only\b",
-        r"\bNorth America only\b", r"\bEurope only\b", r"\bUK only\b",
-        r"\bCanada only\b", r"\bEU only\b", r"\bUS citizen\b",
-        r"\bcitizenship\b", r"\bmust reside in\b", r"\bmust be located in\b",
-        r"\bU\.S\.\b", r"\bUnited States\b" # Cuidado con este, puede ser la empresa
-    ]
-    
-    # PATRONES DE SALVACIÓN (GREEN FLAGS)
-    # Si aparecen estos, ignoramos los Red Flags (ej: "US Company hiring Worldwide")
-    patrones_green = [
-        r"\bLATAM\b", r"\bLatin America\b", r"\bSouth America\b",
-        r"\bWorldwide\b", r"\bGlobal\b", r"\bAnywhere\b",
-        r"\bRemote\s?Worker\b", r"\bRemote\s?Global\b"
-    ]
-
-    ofertas_validas = []
-    descartadas = 0
-
-    for oferta in ofertas:
-        # Combinamos campos clave para análisis
-        titulo = str(oferta.get('title', '')).lower()
-        ubicacion = str(oferta.get('location', '')).lower()
-        # Descripción corta si existe (a veces el titulo lo es todo)
-        # Nota: No usamos descripción completa aquí para ser rápidos y no filtrar de más por menciones circunstanciales.
-        texto_analisis = f"{titulo} {ubicacion}"
-        
-        es_segura = False
-        
-        # 1. Chequeo Green Flags (Prioridad)
-        for p in patrones_green:
-            if re.search(p, texto_analisis, re.IGNORECASE):
-                es_segura = True
-                break
-        
-        if es_segura:
-            ofertas_validas.append(oferta)
-            continue
-
-        # 2. Chequeo Red Flags
-        tiene_red_flag = False
-        for p in patrones_red:
-            if re.search(p, texto_analisis, re.IGNORECASE):
-                tiene_red_flag = True
-                # print(f"   🗑️ Descartada por geo: {titulo} ({ubicacion})") 
-                break
-        
-        if tiene_red_flag:
-            descartadas += 1
-            continue
 
-        # Si no es Green ni Red, pasa (Permisivo por defecto)
-        ofertas_validas.append(oferta)
+    with metrics.timer("geo"):
+        ofertas_validas, descartadas = _aplicar_filtro_geo(ofertas)
 
+    metrics.incr("descartadas_geo", descartadas)
     print(f"   🛡️ Filtro Geo: {len(ofertas)} -> {len(ofertas_validas)} ({descartadas} descartadas por restricción país)")
     return ofertas_validas
 
+def pasa_filtro_geo(oferta):
+    """Predicado (picklable) del filtro geo para una oferta."""
+    # Combinamos campos clave para análisis
+    titulo = str(oferta.get('title', '')).lower()
+    ubicacion = str(oferta.get('location', '')).lower()
+    # Nota: No usamos descripción completa aquí para ser rápidos y no filtrar de más por menciones circunstanciales.
+    texto_analisis = f"{titulo} {ubicacion}"
+
+    # 1. Chequeo Green Flags (Prioridad)
+    if RE_GEO_GREEN.search(texto_analisis):
+        return True
+
+    # 2. Chequeo Red Flags. Si no es Green ni Red, pasa (Permisivo por defecto)
+    return not RE_GEO_RED.search(texto_analisis)
+
+def _aplicar_filtro_geo(ofertas):
+    # En paralelo si el lote es grande (replay, pulls grandes); solo viajan título y ubicación
+    from parallel_filter import filtrar
+    ofertas_validas = filtrar(pasa_filtro_geo, ofertas, campos=("title", "location"))
+    return ofertas_validas, len(ofertas) - len(ofertas_validas)
+
+# --- RECURSOS COMPARTIDOS (se mantienen "calientes" entre corridas del daemon) ---
+_http_session = None
+_history_managers = {}
+
+def get_http_session():
+    """
+    Devuelve una requests.Session compartida (pool de conexiones keep-alive).
+    Cada petición pasa por el programador por host (ritmo, en vuelo, frenado en 429/403).
+    """
+    global _http_session
+    if _http_session is None:
+        import requests
+        from http_scheduler import SesionProgramada
+        _http_session = SesionProgramada()
+        # Pool amplio: HN descarga comentarios con 20 hilos contra el mismo host
+        adapter = requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=32)
+        _http_session.mount("https://", adapter)
+        _http_session.mount("http://", adapter)
+    return _http_session
+
+def get_history_manager(history_file_path=None):
+    """
+    Devuelve un JobHistoryManager compartido por archivo de historial.
+    Evita recargar el JSON completo en cada motor / en cada ciclo del daemon.
+    """
+    manager = _history_managers.get(history_file_path)
+    if manager is None:
+        manager = JobHistoryManager(history_file_path)
+        _history_managers[history_file_path] = manager
+    return manager
+
 # --- ENCODER PERSONALIZADO PARA JSON ---
 class CustomJSONEncoder(json.JSONEncoder):
     """
-    Encoder robusto que maneja:
+    Encoder de respaldo para objetos que no pasaron por normalizar_registros:
     - Fechas (datetime/date) -> ISO format string
-    - NaNs / Infinite -> null (Estándar JSON)
+    - NaT / escalares de numpy -> null / nativos
     - Sets -> Listas
+    Ojo: los float NaN nativos no llegan a default() (el encoder los escribe como
+    NaN); por eso el historial se normaliza antes de serializar y no usa este encoder.
     """
     def default(self, obj):
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        if isinstance(obj, set):
-            return list(obj)
-        # Pandas NaNs y NaTs
-        try:
-            import pandas as pd
-            if pd.isna(obj):
-                return None
-        except ImportError:
-            pass
-            
-        # Standard float NaN handling handled by json.dump usually via allow_nan=True but 
-        # we want strict JSON (null) not NaN
-        if isinstance(obj, float):
-             import math
-             if math.isnan(obj) or math.isinf(obj):
-                 return None
-                 
+        if isinstance(obj, (datetime, date, set, frozenset)) or hasattr(obj, "item") or obj != obj:
+            return _valor_compacto(obj)
         return super().default(obj)
 
+# --- LECTURA / ESCRITURA DEL HISTORIAL ---
+def ruta_historial(nombre=HISTORY_BASENAME, directorio=None, compresion=None):
+    """Ruta del historial `nombre` con la extensión del formato configurado."""
+    compresion = HISTORY_COMPRESSION if compresion is None else compresion
+    return os.path.join(directorio or HISTORY_DIR, nombre + EXTENSIONES_HISTORIAL[compresion])
+
+def ruta_estado(nombre):
+    """
+    Archivo de estado o caché dentro de HISTORY_DIR, resuelto al usarse: si
+    HISTORY_DIR cambia en runtime (--from-archive) los módulos lo siguen.
+    """
+    return os.path.join(HISTORY_DIR, nombre)
+
+def base_historial(ruta):
+    """offers_history.ndjson.gz -> offers_history (sirve para archivos derivados: índice, legacy)."""
+    for extension in sorted(EXTENSIONES_HISTORIAL.values(), key=len, reverse=True) + [".json"]:
+        if ruta.endswith(extension):
+            return ruta[:-len(extension)]
+    return os.path.splitext(ruta)[0]
+
+def es_historial_legacy(ruta):
+    return ruta.endswith(".json")
+
+def _valor_compacto(valor):
+    """Normaliza un valor a tipos JSON nativos (None = se descarta)."""
+    tipo = type(valor)
+    if tipo is str or tipo is bool or tipo is int:
+        return valor
+    if valor is None:
+        return None
+    if tipo is float:
+        return None if math.isnan(valor) or math.isinf(valor) else valor
+    if isinstance(valor, dict):
+        return compactar_registro(valor)
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return [_valor_compacto(v) for v in valor]
+    try:
+        if valor != valor: # NaN / NaT de numpy/pandas
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if hasattr(valor, "item"): # Escalares de numpy
+        return _valor_compacto(valor.item())
+    return str(valor)
+
+def compactar_registro(registro):
+    """Copia de la oferta sin campos nulos/NaN y con valores JSON nativos."""
+    compacto = {}
+    for clave, valor in registro.items():
+        valor = _valor_compacto(valor)
+        if valor is not None:
+            compacto[clave] = valor
+    return compacto
+
+def normalizar_registros(registros):
+    """Normaliza una vez, al ingresar, ofertas que vienen como dicts (ver compactar_registro)."""
+    return [compactar_registro(r) for r in registros]
+
+def _a_iso(valor):
+    return valor.isoformat() if isinstance(valor, (datetime, date)) else valor
+
+def normalizar_dataframe(df):
+    """
+    DataFrame de jobspy -> ofertas con tipos JSON nativos, trabajando por columna
+    (no valor por valor en el encoder):
+    - datetime64 -> ISO; columnas de date/datetime de Python -> ISO
+    - columnas con sets -> listas
+    - NaN / NaT / None -> el campo se omite (las columnas vacías ni se recorren)
+    - escalares de numpy -> int/float/bool de Python (astype(object) + tolist)
+    Se evita to_dict(orient='records'), que encajona valor por valor.
+    """
+    import pandas as pd
+    nombres, columnas = [], []
+    for nombre in df.columns[df.notna().any()]:
+        serie = df[nombre]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            serie = serie.map(lambda v: v.isoformat(), na_action='ignore')
+        elif serie.dtype == object:
+            tipo = pd.api.types.infer_dtype(serie, skipna=True)
+            if tipo in ("date", "datetime"):
+                serie = serie.map(_a_iso, na_action='ignore')
+            elif tipo == "mixed" and serie.map(type).isin((set, frozenset)).any():
+                serie = serie.map(lambda v: list(v) if isinstance(v, (set, frozenset)) else v)
+        serie = serie.astype(object)
+        nombres.append(nombre)
+        columnas.append(serie.where(serie.notna(), None).tolist())
+    return [{clave: valor for clave, valor in zip(nombres, fila) if valor is not None}
+            for fila in zip(*columnas)]
+
+def _serializar_ndjson(ofertas, normalizadas=False):
+    # Sin cls=CustomJSONEncoder: los registros ya son nativos, así se usa el encoder en C
+    if not normalizadas:
+        ofertas = normalizar_registros(ofertas)
+    return "".join(json.dumps(o, ensure_ascii=False, separators=(',', ':')) + "\n"
+                   for o in ofertas).encode('utf-8')
+
+def _comprimir(ruta, data):
+    if ruta.endswith(".gz"):
+        return gzip.compress(data, compresslevel=6)
+    if ruta.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+def _abrir_binario(ruta, desde=0):
+    # Cada append es un bloque completo (miembro gzip / frame zstd), así que se
+    # puede empezar a leer en cualquier offset donde terminó un append anterior
+    crudo = open(ruta, 'rb')
+    crudo.seek(desde)
+    if ruta.endswith(".gz"):
+        return gzip.GzipFile(fileobj=crudo, mode='rb')
+    if ruta.endswith(".zst"):
+        import zstandard
+        lector = zstandard.ZstdDecompressor().stream_reader(crudo, read_across_frames=True, closefd=True)
+        return io.BufferedReader(lector) # El lector zstd no se puede iterar por líneas
+    return crudo
+
+def _abrir_lectura(ruta, desde=0):
+    return io.TextIOWrapper(_abrir_binario(ruta, desde), encoding='utf-8')
+
+def leer_historial(ruta, desde=0):
+    """
+    Lista de ofertas del historial (NDJSON, NDJSON comprimido o el .json viejo).
+    `desde` (offset en bytes, solo NDJSON) lee únicamente lo agregado después.
+    """
+    if not os.path.exists(ruta):
+        return []
+    if es_historial_legacy(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+    ofertas = []
+    try:
+        with _abrir_lectura(ruta, desde) as f:
+            for linea in f:
+                if linea.strip():
+                    try:
+                        ofertas.append(json.loads(linea))
+                    except json.JSONDecodeError:
+                        print(f"⚠️ Línea corrupta ignorada en {os.path.basename(ruta)}")
+    except (EOFError, OSError) as e:
+        # Un append interrumpido deja el último bloque comprimido truncado
+        print(f"⚠️ Historial truncado ({e}); se usan las {len(ofertas)} ofertas legibles.")
+    return ofertas
+
+def recorrer_historial(ruta, desde=0, base=0):
+    """
+    Genera (doc, oferta) de cada línea legible, sin cargar el historial en memoria.
+    doc = `base` + offset de la línea en el NDJSON descomprimido leído desde el
+    byte `desde` del archivo (en el .json viejo, la posición en la lista).
+    Es el id del índice invertido: leer_en_offsets() vuelve a la línea sin releer el resto.
+    Al terminar devuelve (valor de `yield from`) el offset donde seguirá el próximo append.
+    """
+    if not os.path.exists(ruta):
+        return base
+    if es_historial_legacy(ruta):
+        historial = leer_historial(ruta)
+        yield from enumerate(historial)
+        return len(historial)
+    offset = base
+    try:
+        with _abrir_binario(ruta, desde) as f:
+            for linea in f:
+                doc, offset = offset, offset + len(linea)
+                if linea.strip():
+                    try:
+                        yield doc, json.loads(linea)
+                    except json.JSONDecodeError:
+                        print(f"⚠️ Línea corrupta ignorada en {os.path.basename(ruta)}")
+    except (EOFError, OSError) as e:
+        print(f"⚠️ Historial truncado ({e}); se usan las ofertas legibles.")
+    return offset
+
+def leer_en_offsets(ruta, docs):
+    """
+    Ofertas en los ids `docs` de recorrer_historial(), en orden creciente, parseando
+    solo esas líneas. En NDJSON plano es un seek por oferta; comprimido, el seek
+    descomprime hasta el offset (pero tampoco parsea las demás líneas).
+    """
+    if es_historial_legacy(ruta):
+        historial = leer_historial(ruta)
+        return [historial[doc] for doc in sorted(docs) if doc < len(historial)]
+    ofertas = []
+    with _abrir_binario(ruta) as f:
+        posicion = 0
+        for doc in sorted(docs):
+            if f.seekable():
+                f.seek(doc)
+            else: # zstd: solo se avanza leyendo
+                while posicion < doc:
+                    salto = f.read(min(doc - posicion, 1 << 20))
+                    if not salto:
+                        break
+                    posicion += len(salto)
+            linea = f.readline()
+            posicion = doc + len(linea)
+            try:
+                ofertas.append(json.loads(linea))
+            except json.JSONDecodeError:
+                print(f"⚠️ Oferta ilegible en el offset {doc} de {os.path.basename(ruta)} (¿índice desactualizado?)")
+    return ofertas
+
+def escribir_historial(ruta, ofertas, normalizadas=False):
+    """
+    Reescribe el historial completo de forma atómica (temporal único + rename).
+    `normalizadas=True` evita repetir la normalización de registros ya nativos.
+    """
+    directorio = os.path.dirname(ruta) or "."
+    os.makedirs(directorio, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=os.path.basename(ruta) + ".", suffix=".tmp", dir=directorio)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if es_historial_legacy(ruta):
+                if not normalizadas:
+                    ofertas = normalizar_registros(ofertas)
+                f.write(json.dumps(ofertas, indent=4, ensure_ascii=False).encode('utf-8'))
+            else:
+                f.write(_comprimir(ruta, _serializar_ndjson(ofertas, normalizadas)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, ruta)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def agregar_historial(ruta, ofertas, normalizadas=False):
+    """Agrega ofertas al final: append real en NDJSON; el .json viejo se reescribe completo."""
+    if not normalizadas:
+        ofertas = normalizar_registros(ofertas)
+    if es_historial_legacy(ruta):
+        escribir_historial(ruta, leer_historial(ruta) + ofertas, normalizadas=True)
+        return
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, 'ab') as f:
+        f.write(_comprimir(ruta, _serializar_ndjson(ofertas, normalizadas=True)))
+        f.flush()
+        os.fsync(f.fileno())
+
+@contextlib.contextmanager
+def bloqueo_archivo(ruta):
+    """
+    Lock advisory exclusivo entre procesos sobre `ruta` + ".lock" (fcntl.flock;
+    msvcrt en Windows). Se libera solo si el proceso muere. No es reentrante.
+    """
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta + ".lock", 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# --- STACKS EXTRAÍDOS (ARCHIVO LATERAL, APPEND-ONLY) ---
+# El stack que extrae la IA no se escribe dentro del historial (eso obligaría a
+# reescribirlo y recomprimirlo entero por cada lote): va a un NDJSON aparte,
+# offers_history.stacks.ndjson, una línea por oferta {"doc", "key", "stack"}
+# (doc = id en el índice, key = clave_contenido). Se fusiona al leer/indexar.
+def ruta_stacks(history_file):
+    return base_historial(history_file) + ".stacks.ndjson"
+
+def clave_contenido(oferta):
+    """Hash de título + descripción (clave de la caché de stack y del archivo lateral)."""
+    texto = f"{oferta.get('title', '')}\n{oferta.get('description', '')}"
+    return hashlib.sha1(texto.encode('utf-8', 'replace')).hexdigest()
+
+def agregar_stacks(history_file, registros):
+    ruta = ruta_stacks(history_file)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, 'ab') as f:
+        f.write(_serializar_ndjson(registros, normalizadas=True))
+        f.flush()
+        os.fsync(f.fileno())
+
+def leer_stacks(history_file, desde=0):
+    """
+    (registros, offset final) del archivo lateral desde el offset `desde`.
+    Una última línea incompleta (append en curso de otro proceso) se deja para la próxima lectura.
+    """
+    ruta = ruta_stacks(history_file)
+    if not os.path.exists(ruta):
+        return [], 0
+    registros = []
+    with open(ruta, 'rb') as f:
+        f.seek(desde)
+        for linea in f:
+            if not linea.endswith(b"\n"):
+                break
+            desde += len(linea)
+            try:
+                registros.append(json.loads(linea))
+            except json.JSONDecodeError:
+                print(f"⚠️ Línea corrupta ignorada en {os.path.basename(ruta)}")
+    return registros, desde
+
+def stacks_por_clave(history_file):
+    return {r['key']: r['stack'] for r in leer_stacks(history_file)[0] if 'key' in r}
+
+def fusionar_stacks(ofertas, stacks):
+    """Agrega el campo `stack` ({clave_contenido: stack}) a las ofertas que lo tengan extraído."""
+    if stacks:
+        for oferta in ofertas:
+            stack = stacks.get(clave_contenido(oferta))
+            if stack is not None:
+                oferta['stack'] = stack
+    return ofertas
+
+def exportar_parquet(ruta, destino):
+    """Exporta el historial a Parquet (columnar) para análisis con pandas/duckdb."""
+    import pandas as pd
+    df = pd.DataFrame(fusionar_stacks(leer_historial(ruta), stacks_por_clave(ruta)))
+    if 'stack' in df.columns: # Listas -> texto para no depender de tipos anidados
+        df['stack'] = df['stack'].map(lambda s: ", ".join(s) if isinstance(s, list) else s)
+    df.to_parquet(destino, index=False)
+    print(f"📦 {len(df)} ofertas exportadas a {destino}")
+
 class JobHistoryManager:
     def __init__(self, history_file_path=None):
         if history_file_path is None:
             # Ruta por defecto
-            base_dir = "/Users/josemiguelrozobaez/documents/develop/agent-offers"
-            os.makedirs(base_dir, exist_ok=True)
-            self.history_file = os.path.join(base_dir, "offers_history.json")
+            os.makedirs(HISTORY_DIR, exist_ok=True)
+            self.history_file = ruta_historial()
         else:
             self.history_file = history_file_path
             
         self.seen_urls = set()
-        self._load_history()
+        self.seen_item_ids = set() # item_id de HN de las ofertas guardadas (corta la paginación de YC)
+        self.total = 0 # Ofertas en el archivo
+        self._firma = None # (inode, bytes) del archivo la última vez que lo leímos/escribimos
+        self._lock = threading.Lock() # Serializa guardados y enriquecimientos en segundo plano
+        self._pendientes = [] # Lotes esperando el próximo commit de grupo
+        self._lock_pendientes = threading.Lock()
+        self.lock_file = base_historial(self.history_file)
+        with bloqueo_archivo(self.lock_file):
+            self._migrate_legacy()
+            self._load_history()
+
+    def _migrate_legacy(self):
+        """Convierte una sola vez el offers_history.json (lista con indent=4) al formato compacto."""
+        legacy = base_historial(self.history_file) + ".json"
+        if es_historial_legacy(self.history_file) or os.path.exists(self.history_file) or not os.path.exists(legacy):
+            return
+        try:
+            history = leer_historial(legacy)
+            escribir_historial(self.history_file, history)
+            os.replace(legacy, legacy + ".migrated")
+            print(f"🗜️ Historial migrado a {os.path.basename(self.history_file)}: "
+                  f"{os.path.getsize(legacy + '.migrated') // 1024} KB -> {os.path.getsize(self.history_file) // 1024} KB")
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar el historial viejo: {e}")
 
     def _load_history(self):
         """Carga los URLs existentes para chequeo rápido (O(1))."""
@@ -119,61 +506,161 @@ class JobHistoryManager:
             return
 
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                # Handle empty file or bad JSON
-                try:
-                    history = json.load(f)
-                except json.JSONDecodeError:
-                    history = []
-                
-                for offer in history:
-                    url = offer.get('job_url')
-                    if url:
-                        self.seen_urls.add(url)
+            self._sincronizar_con_disco()
             print(f"📚 Historia cargada: {len(self.seen_urls)} ofertas previas.")
         except Exception as e:
             print(f"⚠️ Error cargando historia: {e} (Se creará un archivo nuevo)")
 
+    def _firma_actual(self):
+        try:
+            st = os.stat(self.history_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size)
+
+    def _sincronizar_con_disco(self):
+        """
+        Con el lock de archivo tomado: incorpora lo que otros procesos escribieron
+        desde la última vez. Si solo hubo appends se lee desde el último offset
+        conocido; si el archivo se reescribió (otro inode, más chico) se relee completo.
+        Devuelve los URLs que aparecieron en el archivo.
+        """
+        firma = self._firma_actual()
+        if firma == self._firma:
+            return set()
+        if firma is None:
+            ajenas, self.total = [], 0
+        elif (self._firma is None or es_historial_legacy(self.history_file)
+              or firma[0] != self._firma[0] or firma[1] < self._firma[1]):
+            ajenas = leer_historial(self.history_file)
+            self.total = len(ajenas)
+        else:
+            ajenas = leer_historial(self.history_file, desde=self._firma[1])
+            self.total += len(ajenas)
+        self._firma = firma
+        urls = {o.get('job_url') for o in ajenas if o.get('job_url')}
+        self.seen_urls |= urls
+        self.seen_item_ids.update(o['item_id'] for o in ajenas if o.get('item_id') is not None)
+        return urls
+
     def filter_new_offers(self, offers_list):
         """Retorna solo las ofertas que NO están en el historial."""
         new_offers = []
-        for offer in offers_list:
-            url = offer.get('job_url')
-            if url and url not in self.seen_urls:
-                new_offers.append(offer)
-                self.seen_urls.add(url) # Marcamos como vista para esta misma ejecución
+        with metrics.timer("dedupe"):
+            for offer in offers_list:
+                url = offer.get('job_url')
+                if url and url not in self.seen_urls:
+                    new_offers.append(offer)
+                    self.seen_urls.add(url) # Marcamos como vista para esta misma ejecución
+        metrics.incr("ofertas_nuevas", len(new_offers))
         return new_offers
 
     def save_offers(self, new_offers):
         """
-        Guarda las nuevas ofertas en el archivo maestro de forma ATÓMICA.
-        Evita corrupciones si se interrumpe la escritura.
+        Guarda las nuevas ofertas en el archivo maestro: append de líneas NDJSON
+        (el .json viejo se reescribe completo de forma ATÓMICA).
+        Seguro con varios hilos y varios procesos sobre el mismo archivo:
+        - Commit de grupo: los lotes que llegan mientras otro hilo escribe se
+          encolan y el siguiente en tomar el lock los escribe todos juntos
+          (un solo append + fsync + actualización del índice).
+        - Lock de archivo entre procesos; antes de escribir se leen los appends
+          de otros procesos y se descartan las ofertas que ellos ya guardaron.
+        Devuelve False si el historial no se pudo escribir: en ese caso se
+        descartan los cursores propuestos por la fuente en curso, para que la
+        próxima corrida vuelva a traer estas ofertas en vez de saltearlas.
         """
         if not new_offers:
-            return
+            return True
 
-        # 1. Leemos todo el archivo actual
-        current_history = []
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    current_history = json.load(f)
-            except:
-                current_history = []
-        
-        # 2. Agregamos lo nuevo
-        current_history.extend(new_offers)
-        
-        # 3. Escritura Atómica (Write .tmp -> Rename)
-        temp_file = self.history_file + ".tmp"
+        # Una sola normalización: la misma lista se escribe, se indexa y se enriquece
+        with metrics.timer("normalize"):
+            new_offers = normalizar_registros(new_offers)
+
+        lote = {"ofertas": new_offers, "guardadas": None, "docs": [], "fallo": False}
+        with self._lock_pendientes:
+            self._pendientes.append(lote)
+        with metrics.timer("persist"), self._lock:
+            if lote["guardadas"] is None: # Nadie lo escribió todavía: este hilo hace el commit
+                with self._lock_pendientes:
+                    grupo, self._pendientes = self._pendientes, []
+                try:
+                    self._commit_grupo(grupo)
+                except BaseException:
+                    # Este hilo propaga la excepción; los lotes de otros hilos se marcan fallidos
+                    self._firma = None
+                    for otro in grupo:
+                        otro["guardadas"], otro["docs"], otro["fallo"] = [], [], True
+                    raise
+
+        if lote["fallo"]:
+            # Desde el hilo del llamador: descartar() mira la fuente de su contexto
+            import source_cursors
+            source_cursors.descartar()
+            metrics.incr("historial_errores")
+            return False
+
+        # Enriquecimiento de stack en segundo plano: no frena el descubrimiento
+        if lote["guardadas"]:
+            from stack_enrichment import encolar
+            encolar(self, lote["guardadas"], lote["docs"])
+        return True
+
+    def _commit_grupo(self, grupo):
+        with bloqueo_archivo(self.lock_file):
+            ajenas = self._sincronizar_con_disco()
+            todas, urls = [], set(ajenas)
+            for lote in grupo:
+                lote["guardadas"], lote["docs"] = [], []
+                for oferta in lote["ofertas"]:
+                    url = oferta.get('job_url')
+                    if url in urls:
+                        continue # Ya la guardó otro proceso (u otro lote del grupo)
+                    if url:
+                        urls.add(url)
+                    lote["guardadas"].append(oferta)
+                todas.extend(lote["guardadas"])
+            if len(grupo) > 1:
+                metrics.incr("historial_commits_agrupados", len(grupo) - 1)
+            if not todas:
+                return
+            docs = self._save_offers(todas)
+            for lote in grupo:
+                if docs is None:
+                    lote["guardadas"], lote["fallo"] = [], True
+                else: # Ids en el índice de cada oferta guardada (el enriquecimiento los usa)
+                    lote["docs"], docs = docs[:len(lote["guardadas"])], docs[len(lote["guardadas"]):]
+
+    def _save_offers(self, new_offers):
+        # 1. Append de lo nuevo (el archivo existente no se relee ni se reescribe)
         try:
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                # Usamos el Encoder personalizado para sanar NaNs y Fechas
-                json.dump(current_history, f, indent=4, ensure_ascii=False, cls=CustomJSONEncoder)
-            
-            os.replace(temp_file, self.history_file)
-            print(f"💾 {len(new_offers)} nuevas ofertas guardadas SEGURO (Total: {len(current_history)}).")
+            agregar_historial(self.history_file, new_offers, normalizadas=True)
         except Exception as e:
             print(f"❌ Error CRÍTICO guardando historial: {e}")
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            self._firma = None # Estado del archivo incierto: releer completo la próxima vez
+            return None
+        self.total += len(new_offers)
+        self.seen_item_ids.update(o['item_id'] for o in new_offers if o.get('item_id') is not None)
+        self._firma = self._firma_actual()
+        print(f"💾 {len(new_offers)} nuevas ofertas guardadas SEGURO (Total: {self.total}).")
+
+        # 2. Índice invertido incremental (lee solo lo agregado); da los ids de las nuevas
+        try:
+            from history_index import indexar_nuevas
+            return indexar_nuevas(self.history_file, len(new_offers))
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el índice del historial: {e}")
+            return [None] * len(new_offers)
+
+    def save_stacks(self, registros):
+        """
+        Guarda stacks extraídos ([{"doc", "key", "stack"}]) en el archivo lateral
+        append-only: el historial no se reescribe. Se fusionan al leer (ver fusionar_stacks)
+        y el índice invertido los incorpora desde ese archivo.
+        """
+        with metrics.timer("persist"), bloqueo_archivo(self.lock_file):
+            agregar_stacks(self.history_file, registros)
+            try:
+                from history_index import indexar_stacks
+                indexar_stacks(self.history_file)
+            except Exception as e:
+                print(f"⚠️ No se pudo actualizar el índice del historial: {e}")
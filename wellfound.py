@@ -1,4 +1,3 @@
-import requests
 import re
 import os
 import sys
@@ -6,11 +5,17 @@ import json
 import time
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils import get_http_session
+import config
+import metrics
+
 # --- CONFIGURACIÓN ---
 # Wellfound es difícil de scrapear directamente por URL de búsqueda sin JS.
 # Usaremos una estrategia de búsqueda en paths públicos que a veces exponen datos en JSON incrustado o HTML simple.
 # URL objetivo: Búsqueda general de Software Engineer
 WELLFOUND_URL = "https://wellfound.com/role/l/software-engineer"
+WELLFOUND_TIMEOUT = config.valor("wellfound.timeout", 15)
 
 def limpiar_html(texto_html):
     if not texto_html: return ""
@@ -67,17 +72,8 @@ def extract_jobs_from_html(html_content):
         
     return ofertas
 
-def buscar_ofertas_wellfound(filtros_json):
-    print("\n✌️  INICIANDO MOTOR WELLFOUND (ANGELLIST)...")
-    
-    # 1. Preparar Keywords
-    lista_keywords = filtros_json.get("keyword_list", [])
-    if not lista_keywords:
-        keywords = filtros_json.get("keywords", "").lower()
-        lista_keywords = [k.strip() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
-
-    ofertas_encontradas = []
-
+def descargar_ofertas_wellfound():
+    """Descarga la página de Wellfound y extrae los trabajos (sin filtrar)."""
     # Headers para parecer un navegador real (Chrome Mac)
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -89,38 +85,15 @@ def buscar_ofertas_wellfound(filtros_json):
     try:
         print(f"   🔌 Conectando a {WELLFOUND_URL}...")
         # Nota: Si Wellfound detecta bot, devolverá 403 o Captcha.
-        resp = requests.get(WELLFOUND_URL, headers=headers, timeout=15)
+        with metrics.timer("fetch"):
+            resp = get_http_session().get(WELLFOUND_URL, headers=headers, timeout=WELLFOUND_TIMEOUT)
         
         if resp.status_code == 200:
-            raw_jobs = extract_jobs_from_html(resp.text)
+            with metrics.timer("parse"):
+                raw_jobs = extract_jobs_from_html(resp.text)
+            metrics.incr("ofertas_crudas", len(raw_jobs))
             print(f"      Source descargado. Analizando {len(raw_jobs)} posibles candidatos...")
-
-            for job in raw_jobs:
-                titulo = job['title']
-                url = job['url']
-                
-                # --- FILTRADO POR KEYWORDS ---
-                match_keyword = False
-                texto_check = titulo.lower()
-                
-                # Wellfound suele mostrar "Senior Software Engineer" etc.
-                if lista_keywords:
-                    for k in lista_keywords:
-                        if k.lower() in texto_check:
-                            match_keyword = True
-                            break
-                    if not match_keyword:
-                        continue
-
-                ofertas_encontradas.append({
-                    "title": titulo,
-                    "company": job['company'],
-                    "location": "Startup (Remote check required)",
-                    "description": job['description'],
-                    "job_url": url,
-                    "source": "Wellfound",
-                    "date": datetime.now().isoformat()
-                })
+            return raw_jobs
         elif resp.status_code == 403:
              print("      🔒 Wellfound bloqueó la conexión (Cloudflare 403). Se requiere navegador completo.")
         else:
@@ -129,13 +102,61 @@ def buscar_ofertas_wellfound(filtros_json):
     except Exception as e:
         print(f"      ❌ Error inesperado Wellfound: {e}")
 
+    return []
+
+def filtrar_ofertas_wellfound(raw_jobs, filtros_json):
+    """Filtra los trabajos descargados por las keywords del candidato."""
+    # 1. Preparar Keywords
+    lista_keywords = filtros_json.get("keyword_list", [])
+    if not lista_keywords:
+        keywords = filtros_json.get("keywords", "").lower()
+        lista_keywords = [k.strip() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
+
+    ofertas_encontradas = []
+
+    with metrics.timer("filter"):
+        for job in raw_jobs:
+            titulo = job['title']
+            url = job['url']
+        
+            # --- FILTRADO POR KEYWORDS ---
+            match_keyword = False
+            texto_check = titulo.lower()
+        
+            # Wellfound suele mostrar "Senior Software Engineer" etc.
+            if lista_keywords:
+                for k in lista_keywords:
+                    if k.lower() in texto_check:
+                        match_keyword = True
+                        break
+                if not match_keyword:
+                    continue
+
+            ofertas_encontradas.append({
+                "title": titulo,
+                "company": job['company'],
+                "location": "Startup (Remote check required)",
+                "description": job['description'],
+                "job_url": url,
+                "source": "Wellfound",
+                "date": datetime.now().isoformat()
+            })
+
+    metrics.incr("ofertas_filtradas", len(ofertas_encontradas))
+    return ofertas_encontradas
+
+def buscar_ofertas_wellfound(filtros_json):
+    print("\n✌️  INICIANDO MOTOR WELLFOUND (ANGELLIST)...")
+
+    raw_jobs = descargar_ofertas_wellfound()
+    ofertas_encontradas = filtrar_ofertas_wellfound(raw_jobs, filtros_json)
     print(f"   ✅ Se encontraron {len(ofertas_encontradas)} ofertas potenciales en Wellfound.")
     
     # --- DEDUPLICACIÓN Y GUARDADO ---
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     try:
-        from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-        history = JobHistoryManager()
+        from utils import get_history_manager, filtrar_por_ubicacion_estricta
+        history = get_history_manager()
         
         # NUEVO: Filtro Estricto de Ubicación
         ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_encontradas)
@@ -3,90 +3,135 @@ import time
 import re
 import os
 import sys
-import json
-import requests
-from datetime import datetime
+import calendar
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils import get_http_session
+import config
+import metrics
+import parallel_filter
+import source_cursors
 
 # --- CONFIGURACIÓN DE FUENTES WWR ---
 # WWR divide sus ofertas por categorías en RSS separados.
 # Seleccionamos las que encajan con tu perfil (Backend, Full Stack, DevOps)
-WWR_FEEDS = [
+WWR_FEEDS = config.valor("wwr.feeds", [
     "https://weworkremotely.com/categories/remote-back-end-programming-jobs.rss",
     "https://weworkremotely.com/categories/remote-full-stack-programming-jobs.rss",
     "https://weworkremotely.com/categories/remote-devops-sysadmin-jobs.rss" # Por tu background en Linux/Servidores
-]
+])
+WWR_TIMEOUT = config.valor("wwr.timeout", 15)
 
 def limpiar_html(texto_html):
     """Limpia etiquetas HTML simples de la descripción para el análisis."""
     clean = re.compile('<.*?>')
     return re.sub(clean, '', texto_html)
 
-def buscar_ofertas_wwr(filtros_json):
+def instante_wwr(entry):
+    """Timestamp (UTC) del campo published de una entrada del feed, o None."""
+    publicado = entry.get('published_parsed')
+    return calendar.timegm(publicado) if publicado else None
+
+def descargar_ofertas_wwr():
     """
-    Consume los RSS oficiales de WeWorkRemotely.
-    No requiere selenium ni proxies.
+    Descarga y parsea todos los feeds (sin filtrar). Devuelve una lista de entradas
+    {title, company, summary, link, published}, reutilizable entre candidatos.
+    Cada categoría tiene su cursor: solo vuelven las entradas publicadas después
+    de la corrida anterior.
     """
-    print("\n📡 INICIANDO MOTOR WE WORK REMOTELY (Vía RSS)...")
-    
-    # ADAPTER: Usamos la lista limpia si existe (Mejor práctica)
-    lista_keywords = filtros_json.get("keyword_list", [])
-    
-    # Fallback: Si no hay lista, intentamos limpiar el string antiguo
-    if not lista_keywords:
-        keywords = filtros_json.get("keywords", "").lower()
-        lista_keywords = [k.strip() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
-    
-    ofertas_encontradas = []
+    entradas = []
 
     for url_feed in WWR_FEEDS:
-        print(f"   🔌 Conectando a feed: {url_feed.split('/')[-1]}...")
+        categoria = url_feed.split('/')[-1]
+        print(f"   🔌 Conectando a feed: {categoria}...")
         
         try:
-            # feedparser se encarga de descargar y parsear el XML
-            feed = feedparser.parse(url_feed)
+            # Descargamos con la sesión compartida (keep-alive) y feedparser solo parsea el XML
+            with metrics.timer("fetch"):
+                resp = get_http_session().get(url_feed, timeout=WWR_TIMEOUT)
             
-            if feed.status != 200 and feed.status != 301:
-                print(f"      ⚠️ Error conectando al feed (Status {feed.status})")
+            if resp.status_code != 200:
+                print(f"      ⚠️ Error conectando al feed (Status {resp.status_code})")
                 continue
-                
-            print(f"      📥 Descargadas {len(feed.entries)} entradas.")
 
-            for entry in feed.entries:
-                titulo = entry.title
-                empresa = entry.get('author', 'Unknown Company') # WWR pone la empresa en 'author'
-                descripcion = entry.summary # En RSS 'summary' o 'description' es el cuerpo
-                link = entry.link
-                publicado = entry.published
+            with metrics.timer("parse"):
+                feed = feedparser.parse(resp.content)
+                nuevas = source_cursors.filtrar_nuevos(f"wwr:{categoria.removesuffix('.rss')}", feed.entries,
+                                                       instante_wwr, lambda entry: entry.get('link'))
+                for entry in nuevas:
+                    entradas.append({
+                        "title": entry.title,
+                        "company": entry.get('author', 'Unknown Company'), # WWR pone la empresa en 'author'
+                        "summary": entry.summary, # En RSS 'summary' o 'description' es el cuerpo
+                        "link": entry.link,
+                        "published": entry.get('published'),
+                    })
+            metrics.incr("ofertas_crudas", len(feed.entries))
                 
-                # --- FILTRO RÁPIDO (Python) ---
-                # Como WWR es 100% remoto, filtramos por Tecnología.
-                texto_completo = (titulo + " " + descripcion).lower()
-                
-                # Si definiste keywords, verificamos que tenga al menos una
-                if lista_keywords:
-                    if not any(k in texto_completo for k in lista_keywords):
-                        continue
-                
-                # Empaquetamos para que sea idéntico a los otros motores
-                ofertas_encontradas.append({
-                    "title": titulo,
-                    "company": empresa,
-                    "location": "Remote (WWR)", # WWR es remoto por defecto
-                    "description": limpiar_html(descripcion),
-                    "job_url": link,
-                    "source": "WeWorkRemotely",
-                    "date": publicado
-                })
+            print(f"      📥 Descargadas {len(feed.entries)} entradas.")
                 
         except Exception as e:
             print(f"      ❌ Error procesando feed: {e}")
 
+    return entradas
+
+def cumple_keywords_wwr(entry, re_keywords):
+    """Predicado del filtrado (picklable): al menos una keyword en título o cuerpo."""
+    texto_completo = (entry['title'] + " " + entry['summary']).lower()
+    return re_keywords.search(texto_completo) is not None
+
+def filtrar_ofertas_wwr(entradas, filtros_json):
+    """Filtra las entradas descargadas con las keywords del candidato."""
+    # ADAPTER: Usamos la lista limpia si existe (Mejor práctica)
+    lista_keywords = filtros_json.get("keyword_list", [])
+    
+    # Fallback: Si no hay lista, intentamos limpiar el string antiguo
+    if not lista_keywords:
+        keywords = filtros_json.get("keywords", "").lower()
+        lista_keywords = [k.strip() for k in keywords.replace("(", "").replace(")", "").replace("OR", "").replace("AND", "").split() if len(k) > 2]
+    
+    ofertas_encontradas = []
+
+    with metrics.timer("filter"):
+        # --- FILTRO RÁPIDO (Python) ---
+        # Como WWR es 100% remoto, filtramos por Tecnología.
+        # Si definiste keywords, verificamos que tenga al menos una (en minúsculas,
+        # igual que el texto: antes "Python" de keyword_list nunca matcheaba).
+        keywords = [k.strip().lower() for k in lista_keywords if k.strip()]
+        if keywords:
+            re_keywords = re.compile("|".join(re.escape(k) for k in keywords))
+            entradas = parallel_filter.filtrar(cumple_keywords_wwr, entradas, (re_keywords,), ("title", "summary"))
+
+        for entry in entradas:
+            # Empaquetamos para que sea idéntico a los otros motores
+            ofertas_encontradas.append({
+                "title": entry['title'],
+                "company": entry['company'],
+                "location": "Remote (WWR)", # WWR es remoto por defecto
+                "description": limpiar_html(entry['summary']),
+                "job_url": entry['link'],
+                "source": "WeWorkRemotely",
+                "date": entry['published']
+            })
+
+    metrics.incr("ofertas_filtradas", len(ofertas_encontradas))
+    return ofertas_encontradas
+
+def buscar_ofertas_wwr(filtros_json):
+    """
+    Consume los RSS oficiales de WeWorkRemotely.
+    No requiere selenium ni proxies.
+    """
+    print("\n📡 INICIANDO MOTOR WE WORK REMOTELY (Vía RSS)...")
+
+    entradas = descargar_ofertas_wwr()
+    ofertas_encontradas = filtrar_ofertas_wwr(entradas, filtros_json)
     print(f"   ✅ Se encontraron {len(ofertas_encontradas)} ofertas potenciales en WWR.")
     
     # 3. Deduplicación Histórica y Guardado
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-    history = JobHistoryManager()
+    from utils import get_history_manager, filtrar_por_ubicacion_estricta
+    history = get_history_manager()
     
     # NUEVO: Filtro Estricto de Ubicación
     ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_encontradas)
@@ -101,25 +146,6 @@ def buscar_ofertas_wwr(filtros_json):
     
     return ofertas_nuevas
 
-def guardar_en_archivo(ofertas):
-    if not ofertas:
-        return
-
-    # Ruta consistente
-    ruta_base = "/Users/josemiguelrozobaez/documents/develop/agent-offers/"
-    os.makedirs(ruta_base, exist_ok=True)
-    
-    # Prefijo WWR
-    nombre_archivo = "WWR_" + datetime.now().strftime("%d%b%H%M") + ".json"
-    ruta_completa = os.path.join(ruta_base, nombre_archivo)
-    
-    try:
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            json.dump(ofertas, f, indent=4, ensure_ascii=False)
-        print(f"\n💾 ARCHIVO WWR GUARDADO: {ruta_completa}")
-    except Exception as e:
-        print(f"❌ Error guardando WWR: {e}")
-
 # --- TEST ---
 if __name__ == "__main__":
     filtros_test = {
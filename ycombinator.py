@@ -1,11 +1,34 @@
-import requests
 import re
 import os
 import sys
+import html
+import contextvars
+import concurrent.futures
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils import get_http_session, get_history_manager, filtrar_por_ubicacion_estricta
+import config
+import metrics
+import source_cursors
+
 # --- CONFIGURACIÓN ---
-YC_JOBS_URL = "https://news.ycombinator.com/jobs"
+YC_BASE_URL = "https://news.ycombinator.com/"
+YC_JOBS_URL = YC_BASE_URL + "jobs"
+YC_MAX_PAGES = config.valor("yc.max_pages", 5) # Tope de seguridad para la paginación "More"
+YC_DETAIL_WORKERS = config.valor("yc.detail_workers", 8) # Hilos para descargar los detalles de las ofertas
+YC_TIMEOUT = config.valor("yc.timeout", 10)
+
+# Estructura de cada fila del listado de HN Jobs:
+# <tr class="athing submission" id="123"> ...titleline... </tr>
+# <tr> ...subtext con la edad ("3 hours ago")... </tr>
+ROW_PATTERN = re.compile(r'<tr class="athing[^"]*" id="(\d+)"[^>]*>(.*?)</tr>\s*<tr[^>]*>(.*?)</tr>', re.S)
+TITLE_PATTERN = re.compile(r'<span class="titleline"><a href="([^"]+)"[^>]*>(.*?)</a>', re.S)
+AGE_PATTERN = re.compile(r'<span class="age"(?: title="([^"]*)")?[^>]*><a[^>]*>([^<]+)</a>')
+MORE_PATTERN = re.compile(r'<a href="([^"]+)"[^>]*class="morelink"')
+# "Acme (YC S21) Is Hiring a Senior Engineer" -> "Acme"
+COMPANY_PATTERN = re.compile(r'^(.+?)\s*(?:\(YC [^)]*\)|\bis hiring\b|\bhiring\b)', re.I)
+TOPTEXT_PATTERN = re.compile(r'<div class="toptext">(.*?)</div>', re.S)
 
 def limpiar_html(texto_html):
     """Limpia etiquetas HTML simples."""
@@ -13,46 +36,120 @@ def limpiar_html(texto_html):
     clean = re.compile('<.*?>')
     return re.sub(clean, ' ', texto_html)
 
-def extract_links_with_regex(html_content):
+def extraer_empresa(titulo):
+    """Deduce la empresa del título ('Acme (YC S21) Is Hiring...')."""
+    match = COMPANY_PATTERN.match(titulo)
+    if match:
+        return match.group(1).strip(" -–,:")
+    return "Y Combinator Startup"
+
+def extract_jobs_from_listing(html_content):
     """
-    Extrae (url, titulo) del HTML de YC Jobs usando regex simple para no depender de BS4.
-    Busca patrones de links en la tabla principal.
+    Parsea las filas estructuradas del listado de YC Jobs.
+    Devuelve (ofertas, url_siguiente_pagina). url_siguiente_pagina es None si no hay "More".
     """
     ofertas = []
-    # Patrón para encontrar filas de jobs (aproximación simple)
-    # YC usa HTML muy básico. <a href="...">Title</a>
-    # Buscamos links que no sean 'ycombinator.com' (o si son, que sean de jobs)
-    
-    # Regex para capturar href y texto del link
-    # <a href="https://..." ...>Title...</a>
-    pattern = re.compile(r'<a href="([^"]+)"[^>]*>([^<]+)</a>')
-    
-    matches = pattern.findall(html_content)
-    
-    for url, titulo in matches:
-        # Filtros básicos de limpieza de links irrelevantes del footer/header
-        if "ycombinator.com" in url and "jobs" not in url and "item" not in url:
+
+    for item_id, fila_titulo, fila_sub in ROW_PATTERN.findall(html_content):
+        match_titulo = TITLE_PATTERN.search(fila_titulo)
+        if not match_titulo:
             continue
-        if url.startswith("item?id="): # Es un link interno (Job post dentro de HN)
-            url = f"https://news.ycombinator.com/{url}"
-        if url == "https://news.ycombinator.com/news": continue
-        if "security" in url or "legal" in url: continue
-        
-        # YC Jobs suele tener el formato "Company Is Hiring..."
-        if len(titulo) < 10: continue
+
+        url, titulo = match_titulo.groups()
+        titulo = html.unescape(limpiar_html(titulo)).strip()
+        url = html.unescape(url)
+        if not url.startswith("http"): # Link interno (Job post dentro de HN)
+            url = YC_BASE_URL + url
+
+        posted_at, edad = None, ""
+        match_edad = AGE_PATTERN.search(fila_sub)
+        if match_edad:
+            # El atributo title trae "2024-08-20T17:00:54 1724173254", nos quedamos con la fecha ISO
+            posted_at = (match_edad.group(1) or "").split(" ")[0] or None
+            edad = match_edad.group(2).strip()
 
         ofertas.append({
-            "url": url,
+            "item_id": int(item_id),
             "title": titulo,
+            "company": extraer_empresa(titulo),
+            "age": edad,
+            "posted_at": posted_at,
+            "url": url,
         })
-    return ofertas
 
-def buscar_ofertas_yc(filtros_json):
+    siguiente = None
+    match_more = MORE_PATTERN.search(html_content)
+    if match_more:
+        siguiente = YC_BASE_URL + html.unescape(match_more.group(1)).lstrip("/")
+
+    return ofertas, siguiente
+
+def fetch_job_detail(url):
     """
-    Scrapea la página de Y Combinator Jobs.
+    Descarga la página de detalle de una oferta y la devuelve como texto plano.
+    Si es un post interno de HN, nos quedamos solo con el cuerpo (toptext).
     """
-    print("\n🍊 INICIANDO MOTOR Y COMBINATOR JOBS...")
-    
+    try:
+        # Corre dentro del ThreadPool: la fuente se indica explícitamente
+        with metrics.timer("fetch", fuente="yc"):
+            resp = get_http_session().get(url, timeout=YC_TIMEOUT)
+        if resp.status_code != 200:
+            return None
+
+        contenido = resp.text
+        match = TOPTEXT_PATTERN.search(contenido)
+        if match:
+            contenido = match.group(1)
+        else:
+            contenido = re.sub(r'<(script|style)[^>]*>.*?</\1>', ' ', contenido, flags=re.S | re.I)
+
+        texto = html.unescape(limpiar_html(contenido))
+        return re.sub(r'\s+', ' ', texto).strip() or None
+    except Exception:
+        return None
+
+def descargar_listado_yc(ids_conocidos=(), max_paginas=YC_MAX_PAGES):
+    """
+    Recorre el listado siguiendo el link "More" hasta llegar a item ids ya
+    conocidos (historial) o al cursor de la corrida anterior (o hasta agotar
+    max_paginas). Devuelve solo las filas con item id posterior al cursor.
+    """
+    cursor = source_cursors.leer("yc")
+    hasta = cursor["hasta"] if cursor else None
+    todas = []
+    url = YC_JOBS_URL
+    completo = True # False si una página falla antes de llegar al cursor: no se avanza
+
+    for pagina in range(1, max_paginas + 1):
+        print(f"   🔌 Conectando a {url}...")
+        with metrics.timer("fetch"):
+            resp = get_http_session().get(url, timeout=YC_TIMEOUT)
+        if resp.status_code != 200:
+            print(f"      ❌ Error YC Jobs: Status {resp.status_code}")
+            completo = False
+            break
+
+        with metrics.timer("parse"):
+            ofertas, siguiente = extract_jobs_from_listing(resp.text)
+        metrics.incr("ofertas_crudas", len(ofertas))
+        print(f"      📥 Página {pagina}: {len(ofertas)} ofertas en el listado.")
+        todas.extend(ofertas)
+
+        # Si ya vemos ofertas del historial o del cursor, las páginas siguientes son más viejas: paramos.
+        if hasta is not None and any(o['item_id'] <= hasta for o in ofertas):
+            print("      ⏹️ Alcanzamos el cursor de la corrida anterior, no seguimos paginando.")
+            break
+        if any(o['item_id'] in ids_conocidos for o in ofertas):
+            print("      ⏹️ Alcanzamos ofertas ya conocidas, no seguimos paginando.")
+            break
+        if not siguiente:
+            break
+        url = siguiente
+
+    return source_cursors.filtrar_nuevos("yc", todas, lambda o: o['item_id'], lambda o: o['item_id'], completo)
+
+def filtrar_ofertas_yc(raw_jobs, filtros_json):
+    """Filtra las filas del listado por ubicación y keywords del candidato."""
     # 1. Preparar Keywords (Adapter Pattern)
     lista_keywords = filtros_json.get("keyword_list", [])
     if not lista_keywords:
@@ -61,25 +158,15 @@ def buscar_ofertas_yc(filtros_json):
 
     ofertas_encontradas = []
 
-    try:
-        print(f"   🔌 Conectando a {YC_JOBS_URL}...")
-        resp = requests.get(YC_JOBS_URL, timeout=10)
-        if resp.status_code != 200:
-            print(f"      ❌ Error YC Jobs: Status {resp.status_code}")
-            return []
-            
-        # Extracción simple
-        raw_jobs = extract_links_with_regex(resp.text)
-        print(f"      📥 Analizando {len(raw_jobs)} links encontrados.")
-
+    with metrics.timer("filter"):
         for job in raw_jobs:
             titulo = job['title']
             url = job['url']
-            
+        
             # --- FILTRADO (Python Logic) ---
             # En YC Jobs, el título suele tener toda la info: "Company (YC W21) is hiring a Senior Eng..."
             texto_completo = titulo.lower()
-            
+        
             # Filtro Ubicación (Simple check si menciona lugar)
             # Si dice "San Francisco" y nuestro perfil es Remote, cuidado.
             # Pero YC suele ser flexible. Si no dice "Onsite only", lo consideramos.
@@ -95,48 +182,83 @@ def buscar_ofertas_yc(filtros_json):
                     if k.lower() in texto_completo:
                         match_keyword = True
                         break
-                
+            
                 if not match_keyword:
                     continue 
 
             ofertas_encontradas.append({
                 "title": titulo,
-                "company": "Y Combinator Startup", # Dificil extraer clean sin NLP
+                "company": job['company'],
                 "location": "Startup (See Description)",
-                "description": titulo, # En YC Jobs el titulo es la descripción corta
+                "description": titulo, # Se reemplaza por el detalle real en completar_detalles_yc
                 "job_url": url,
                 "source": "YC Jobs",
-                "date": datetime.now().isoformat()
+                "item_id": job['item_id'],
+                "age": job['age'],
+                "date": job['posted_at'] or datetime.now().isoformat()
             })
 
+    metrics.incr("ofertas_filtradas", len(ofertas_encontradas))
+    return ofertas_encontradas
+
+def completar_detalles_yc(ofertas, cache=None):
+    """
+    Descarga en paralelo el detalle de cada oferta y lo pone en 'description'.
+    `cache` (dict url -> texto) evita repetir descargas entre candidatos en modo batch.
+    """
+    if not ofertas:
+        return ofertas
+    cache = {} if cache is None else cache
+    pendientes = [o['job_url'] for o in ofertas if o['job_url'] not in cache]
+
+    if pendientes:
+        print(f"   🚀 Descargando {len(pendientes)} detalles en paralelo...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=YC_DETAIL_WORKERS) as executor:
+            # Cada tarea conserva el contexto (fuente actual) para métricas y salud de la fuente
+            tareas = [executor.submit(contextvars.copy_context().run, fetch_job_detail, url) for url in pendientes]
+            for url, detalle in zip(pendientes, (t.result() for t in tareas)):
+                cache[url] = detalle
+
+    for oferta in ofertas:
+        if cache.get(oferta['job_url']):
+            oferta['description'] = cache[oferta['job_url']]
+    return ofertas
+
+def buscar_ofertas_yc(filtros_json):
+    """
+    Scrapea la página de Y Combinator Jobs.
+    """
+    print("\n🍊 INICIANDO MOTOR Y COMBINATOR JOBS...")
+
+    # El historial se carga antes de scrapear: sus item ids cortan la paginación
+    history = get_history_manager()
+
+    try:
+        raw_jobs = descargar_listado_yc(history.seen_item_ids)
+        print(f"      📥 Analizando {len(raw_jobs)} ofertas del listado.")
+        ofertas_encontradas = filtrar_ofertas_yc(raw_jobs, filtros_json)
     except Exception as e:
         print(f"      ❌ Error procesando YC Jobs: {e}")
+        source_cursors.descartar()
         return []
 
     print(f"   ✅ Se encontraron {len(ofertas_encontradas)} ofertas potenciales en YC Jobs.")
     
     # --- DEDUPLICACIÓN Y GUARDADO ---
-    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    try:
-        from utils import JobHistoryManager, filtrar_por_ubicacion_estricta
-        history = JobHistoryManager()
-        
-        # NUEVO: Filtro Estricto de Ubicación
-        ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_encontradas)
-        
-        ofertas_nuevas = history.filter_new_offers(ofertas_geo_validas)
-        print(f"   🤏 De {len(ofertas_geo_validas)} candidatas geo-validas, {len(ofertas_nuevas)} son NUEVAS en el historial.")
-        
-        if ofertas_nuevas:
-            history.save_offers(ofertas_nuevas)
-        else:
-            print("🤷‍♂️ No hay ofertas nuevas de YC.")
-            
-        return ofertas_nuevas
+    # NUEVO: Filtro Estricto de Ubicación
+    ofertas_geo_validas = filtrar_por_ubicacion_estricta(ofertas_encontradas)
+    
+    ofertas_nuevas = history.filter_new_offers(ofertas_geo_validas)
+    print(f"   🤏 De {len(ofertas_geo_validas)} candidatas geo-validas, {len(ofertas_nuevas)} son NUEVAS en el historial.")
+
+    # Detalles en paralelo, solo para las nuevas (las viejas ya están en el historial)
+    if ofertas_nuevas:
+        completar_detalles_yc(ofertas_nuevas)
+        history.save_offers(ofertas_nuevas)
+    else:
+        print("🤷‍♂️ No hay ofertas nuevas de YC.")
         
-    except ImportError:
-        print("⚠️ Advertencia: utils.py no encontrado.")
-        return ofertas_encontradas
+    return ofertas_nuevas
 
 # --- TEST ---
 if __name__ == "__main__":